@@ -1,15 +1,27 @@
 import dearpygui.dearpygui as dpg
 import random
 import time
-import pandas as pd
+from openpyxl import Workbook, load_workbook
 import os
 import sys
 
+# Moves and outcomes come from the shared rules engine in ../../RPS; point
+# RULES at rules_utils.RPSLS or another Rules to play a different variant
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'RPS'))
+from rules_utils import RPS
+
+RULES = RPS
+RESULT_TEXT = {'ties': "Draw!", 'wins': "You win!", 'losses': "Computer wins!"}
+
 # Initialize DearPyGUI
 dpg.create_context()
 
 # Game constants
-CHOICES = ["Rock", "Paper", "Scissors"]
+CHOICES = [move.capitalize() for move in RULES.moves]
+
+# Computer moves come from one RNG; set RPS_SEED to reproduce a session
+seed = int(os.environ['RPS_SEED']) if os.environ.get('RPS_SEED') else None
+rng = random.Random(seed)
 
 # Excel file path
 EXCEL_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "rps_data.xlsx")
@@ -106,22 +118,28 @@ def save_to_excel():
                 "Result": "Error parsing entry"
             })
     
-    df_history = pd.DataFrame(history_data)
+    history_columns = ["Round", "Timestamp", "Player Choice", "Computer Choice", "Result"]
     
-    # Create stats DataFrame
+    # Create stats rows
     stats_data = {
         "Statistic": ["Player Score", "Computer Score", "Total Rounds", "Win Rate", "Draw Rate"],
         "Value": [player_score, computer_score, total_rounds, 
                  f"{win_percentage:.1f}%" if total_rounds > 0 else "0%", 
                  f"{draw_percentage:.1f}%" if total_rounds > 0 else "0%"]
     }
-    df_stats = pd.DataFrame(stats_data)
     
-    # Save to Excel with multiple sheets
+    # Save to Excel with multiple sheets, streaming rows in write-only mode
     try:
-        with pd.ExcelWriter(EXCEL_FILE, engine='openpyxl') as writer:
-            df_history.to_excel(writer, sheet_name='Game History', index=False)
-            df_stats.to_excel(writer, sheet_name='Statistics', index=False)
+        workbook = Workbook(write_only=True)
+        history_sheet = workbook.create_sheet('Game History')
+        history_sheet.append(history_columns)
+        for entry in history_data:
+            history_sheet.append([entry[column] for column in history_columns])
+        stats_sheet = workbook.create_sheet('Statistics')
+        stats_sheet.append(["Statistic", "Value"])
+        for statistic, value in zip(stats_data["Statistic"], stats_data["Value"]):
+            stats_sheet.append([statistic, value])
+        workbook.save(EXCEL_FILE)
         dpg.configure_item("status_text", default_value=f"Data saved to {EXCEL_FILE}", color=COLORS["win"])
     except Exception as e:
         dpg.configure_item("status_text", default_value=f"Error saving data: {str(e)}", color=COLORS["lose"])
@@ -135,20 +153,25 @@ def load_from_excel():
         return False
     
     try:
-        # Read history sheet
-        df_history = pd.read_excel(EXCEL_FILE, sheet_name='Game History')
-        
-        # Convert history data back to our format
-        game_history = []
-        for _, row in df_history.iterrows():
-            entry = f"Round {row['Round']} [{row['Timestamp']}]: You: {row['Player Choice']}, PC: {row['Computer Choice']} - {row['Result']}"
-            game_history.append(entry)
-        
-        # Read stats sheet
-        df_stats = pd.read_excel(EXCEL_FILE, sheet_name='Statistics')
-        
-        # Extract stats
-        stats_dict = dict(zip(df_stats['Statistic'], df_stats['Value']))
+        # Stream both sheets in read-only mode instead of building DataFrames
+        workbook = load_workbook(EXCEL_FILE, read_only=True, data_only=True)
+        try:
+            # Read history sheet and convert it back to our format
+            history_rows = workbook['Game History'].iter_rows(values_only=True)
+            header = next(history_rows, ())
+            game_history = []
+            for values in history_rows:
+                row = dict(zip(header, values))
+                entry = f"Round {row['Round']} [{row['Timestamp']}]: You: {row['Player Choice']}, PC: {row['Computer Choice']} - {row['Result']}"
+                game_history.append(entry)
+            
+            # Read stats sheet
+            stats_dict = {
+                statistic: value
+                for statistic, value in workbook['Statistics'].iter_rows(min_row=2, max_col=2, values_only=True)
+            }
+        finally:
+            workbook.close()
         player_score = int(stats_dict.get('Player Score', 0))
         computer_score = int(stats_dict.get('Computer Score', 0))
         total_rounds = int(stats_dict.get('Total Rounds', 0))
@@ -222,16 +245,9 @@ def reset_game():
         except:
             print("Could not update status text")
 
-# Function to determine winner
+# Function to determine winner from the rules' outcome table
 def determine_winner(player, computer):
-    if player == computer:
-        return "Draw!"
-    elif (player == "Rock" and computer == "Scissors") or \
-         (player == "Paper" and computer == "Rock") or \
-         (player == "Scissors" and computer == "Paper"):
-        return "You win!"
-    else:
-        return "Computer wins!"
+    return RESULT_TEXT[RULES.resolve(player, computer)]
 
 # Function to make a choice and play a round
 def play_round(sender, app_data, user_data):
@@ -239,7 +255,7 @@ def play_round(sender, app_data, user_data):
     
     # Get player choice and generate computer choice
     player_choice = user_data
-    computer_choice = random.choice(CHOICES)
+    computer_choice = rng.choice(CHOICES)
     
     # Determine the winner
     result = determine_winner(player_choice, computer_choice)
@@ -373,7 +389,7 @@ def update_statistics_view():
         
         # Calculate favorite choice if there's history
         if game_history:
-            choices_count = {"Rock": 0, "Paper": 0, "Scissors": 0}
+            choices_count = {choice: 0 for choice in CHOICES}
             # Only process the last 50 games for performance
             for entry in game_history[-50:]:
                 for choice in CHOICES:
@@ -476,7 +492,7 @@ with dpg.window(label="Rock Paper Scissors Dashboard", tag="primary_window", no_
                             # Choice buttons with icons
                             for choice in CHOICES:
                                 with dpg.group(horizontal=True):
-                                    dpg.add_button(label=f"{ICONS[choice]} {choice}", callback=play_round, 
+                                    dpg.add_button(label=f"{ICONS.get(choice, '')} {choice}", callback=play_round, 
                                                   user_data=choice, width=350, height=70)
                                 dpg.add_spacer(height=10)
                             
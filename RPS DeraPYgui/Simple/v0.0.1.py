@@ -1,6 +1,16 @@
 import dearpygui.dearpygui as dpg
 import random
 import time
+import os
+import sys
+
+# Moves and outcomes come from the shared rules engine in ../../RPS; point
+# RULES at rules_utils.RPSLS or another Rules to play a different variant
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'RPS'))
+from rules_utils import RPS
+
+RULES = RPS
+RESULT_TEXT = {'ties': "Draw!", 'wins': "You win!", 'losses': "Computer wins!"}
 
 # Initialize DearPyGUI
 dpg.create_context()
@@ -8,7 +18,11 @@ dpg.create_context()
 # Game constants
 WINDOW_WIDTH = 800
 WINDOW_HEIGHT = 600
-CHOICES = ["Rock", "Paper", "Scissors"]
+CHOICES = [move.capitalize() for move in RULES.moves]
+
+# Computer moves come from one RNG; set RPS_SEED to reproduce a session
+seed = int(os.environ['RPS_SEED']) if os.environ.get('RPS_SEED') else None
+rng = random.Random(seed)
 
 # Color theme
 COLORS = {
@@ -50,16 +64,9 @@ def reset_game():
     dpg.configure_item("win_percentage", default_value="Win Rate: 0%")
     dpg.configure_item("draw_percentage", default_value="Draw Rate: 0%")
 
-# Function to determine winner
+# Function to determine winner from the rules' outcome table
 def determine_winner(player, computer):
-    if player == computer:
-        return "Draw!"
-    elif (player == "Rock" and computer == "Scissors") or \
-         (player == "Paper" and computer == "Rock") or \
-         (player == "Scissors" and computer == "Paper"):
-        return "You win!"
-    else:
-        return "Computer wins!"
+    return RESULT_TEXT[RULES.resolve(player, computer)]
 
 # Function to make a choice and play a round
 def play_round(sender, app_data, user_data):
@@ -67,7 +74,7 @@ def play_round(sender, app_data, user_data):
     
     # Get player choice and generate computer choice
     player_choice = user_data
-    computer_choice = random.choice(CHOICES)
+    computer_choice = rng.choice(CHOICES)
     
     # Determine the winner
     result = determine_winner(player_choice, computer_choice)
@@ -167,7 +174,7 @@ with dpg.window(label="Rock Paper Scissors Dashboard", tag="primary_window", no_
                 # Choice buttons with icons
                 for choice in CHOICES:
                     with dpg.group(horizontal=True):
-                        dpg.add_button(label=f"{ICONS[choice]} {choice}", callback=play_round, 
+                        dpg.add_button(label=f"{ICONS.get(choice, '')} {choice}", callback=play_round, 
                                       user_data=choice, width=200, height=50)
                     dpg.add_spacer(height=5)
                 
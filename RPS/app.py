@@ -2,6 +2,10 @@ import customtkinter as ctk
 from datetime import datetime
 from data_utils import create_charts
 from game_utils import RPSGame
+from history_utils import game_datetime
+from retention_utils import RetentionPolicy
+from metrics_utils import CHART_REDRAW_SECONDS, MetricsServer, register_game
+from timing_utils import timed
 import os
 
 # Force dark mode only
@@ -70,8 +74,47 @@ subtitle_label = ctk.CTkLabel(sidebar_frame, text="Rock Paper Scissors",
                              text_color=COLORS['text_secondary'])
 subtitle_label.grid(row=1, column=0, padx=20, pady=(0, 30))
 
-# Initialize game
-game = RPSGame()
+# Computer strategy behind each difficulty level in Settings. The game
+# starts on Easy, so the computer plays randomly until a harder level is
+# picked.
+DIFFICULTY_STRATEGIES = {
+    "Easy": "random",
+    "Medium": "frequency",
+    "Hard": "markov",
+    "Expert": "pattern"
+}
+difficulty = "Easy"
+
+# Initialize game (rounds are journaled on a background thread and
+# compacted into Excel when the last open window exits, so several windows
+# can share the history). Set RPS_SEED to make the computer's moves
+# reproducible; the seed is stored with the history either way.
+seed = int(os.environ['RPS_SEED']) if os.environ.get('RPS_SEED') else None
+
+# Optional retention: set RPS_RETENTION_DAYS and/or RPS_RETENTION_ROUNDS to
+# keep only that much history in full detail. Older rounds are archived as
+# daily totals in the background after startup; stats and trend still
+# count them.
+retention = None
+if os.environ.get('RPS_RETENTION_DAYS') or os.environ.get('RPS_RETENTION_ROUNDS'):
+    try:
+        retention = RetentionPolicy(
+            days=int(os.environ['RPS_RETENTION_DAYS']) if os.environ.get('RPS_RETENTION_DAYS') else None,
+            rounds=int(os.environ['RPS_RETENTION_ROUNDS']) if os.environ.get('RPS_RETENTION_ROUNDS') else None
+        )
+    except ValueError as e:
+        print(f"Error reading retention settings: {e}")
+game = RPSGame(shared=True, background=True, strategy=DIFFICULTY_STRATEGIES[difficulty], seed=seed, retention=retention)
+
+# Optional Prometheus endpoint for unattended stations: set RPS_METRICS_PORT
+# to serve http://127.0.0.1:<port>/metrics from a background thread
+metrics_server = None
+if os.environ.get('RPS_METRICS_PORT'):
+    register_game(game)
+    try:
+        metrics_server = MetricsServer(int(os.environ['RPS_METRICS_PORT'])).start()
+    except (OSError, ValueError) as e:
+        print(f"Error starting metrics endpoint: {e}")
 
 # Navigation button styling
 button_style = {
@@ -87,7 +130,8 @@ button_style = {
 nav_buttons = [
     ("🏠  Dashboard", "dashboard"),
     ("🎮  Play Game", "game"),
-    ("📊  Statistics", "history")
+    ("📊  Statistics", "history"),
+    ("⚙️  Settings", "settings")
 ]
 
 def show_frame(frame_name):
@@ -207,7 +251,7 @@ charts_title = ctk.CTkLabel(charts_frame,
 charts_title.pack(anchor="w", padx=20, pady=(15, 0))
 
 # Create and add charts
-charts_widget = create_charts(charts_frame)
+charts_widget = create_charts(charts_frame, max_trend_points=500)
 charts_widget.pack(fill="both", expand=True, padx=10, pady=10)
 
 # Tips and tricks section
@@ -281,7 +325,7 @@ def update_recent_games():
     recent_scroll.pack(fill="both", expand=True, padx=10, pady=(0, 10))
     
     # Get last 5 games from history
-    games = game.game_history[-5:] if len(game.game_history) > 0 else []
+    games = game.get_recent_games(5)
     
     if not games:
         no_games = ctk.CTkLabel(recent_scroll,
@@ -298,7 +342,7 @@ def update_recent_games():
         entry_frame.pack(fill="x", padx=5, pady=5)
         
         # Format date
-        date_str = record['datetime']
+        date_str = game_datetime(record)
         
         # Result icon and color
         if record['result'] == 'wins':
@@ -352,10 +396,21 @@ def update_stats_display():
         ("📈", stats['win_rate'], "Win Rate", COLORS['warning'])
     ]
     
-    # Add cards to frame
+    # Second row from the incrementally maintained rolling stats
+    rolling = game.get_rolling_stats()
+    streak = rolling['current_streak']
+    streak_text = f"{streak['length']} {streak['result']}" if streak['result'] else "-"
+    window = min(rolling['windows'])
+    cards_data += [
+        ("🔥", streak_text, "Current Streak", COLORS['danger']),
+        ("⭐", str(rolling['longest_streaks']['wins']), "Best Win Streak", COLORS['accent']),
+        ("🎯", f"{rolling['windows'][window]['wins']:.1f}%", f"Last {window} Win Rate", COLORS['primary'])
+    ]
+    
+    # Add cards to frame, 3 per row
     for idx, (icon, value, title, color) in enumerate(cards_data):
         card, _ = create_stat_card(stats_frame, icon, value, title, color)
-        card.grid(row=0, column=idx, padx=10, pady=5, sticky="ew")
+        card.grid(row=idx // 3, column=idx % 3, padx=10, pady=5, sticky="ew")
     
     # Update progress bar
     wins = stats['wins']
@@ -366,14 +421,24 @@ def update_stats_display():
     progress_text.configure(text=f"{wins}/{target} wins ({progress_percent}%)")
     
     # Update recent games
-    update_recent_games()
+    with timed(game.timer, 'recent_games'):
+        update_recent_games()
     
     # Update charts
-    analytics_data = {
-        'moves': game.get_move_distribution(),
-        'trend': game.get_winrate_trend()
-    }
-    charts_widget.update_charts(analytics_data)
+    with timed(game.timer, 'charts'), CHART_REDRAW_SECONDS.time():
+        analytics_data = {'moves': game.get_move_distribution()}
+        if charts_widget.max_trend_points:
+            trend_x, trend = game.get_winrate_trend_downsampled(charts_widget.max_trend_points)
+            analytics_data.update(trend_x=trend_x, trend=trend)
+        else:
+            analytics_data['trend'] = game.get_winrate_trend()
+        charts_widget.update_charts(analytics_data)
+
+# History browser state: a page of rounds from the indexed query API
+HISTORY_PAGE_SIZE = 100
+HISTORY_FILTERS = {"All": None, "Wins": 'wins', "Losses": 'losses', "Ties": 'ties'}
+history_page = 0
+history_filter = "All"
 
 # History/stats display
 def update_history_display():
@@ -407,9 +472,10 @@ def update_history_display():
                               text_color=COLORS['text'])
     stats_title.grid(row=0, column=0, columnspan=3, padx=20, pady=(15, 15), sticky="w")
     
-    # Calculate losses and ties
-    losses = stats['total_games'] - stats['wins']
-    ties = sum(1 for g in game.game_history if g['result'] == 'ties')
+    # Get losses and ties from the storage backend's counters
+    result_counts = game.get_result_counts()
+    losses = result_counts['losses']
+    ties = result_counts['ties']
     
     # Create detailed stat cards
     cards_data = [
@@ -421,6 +487,12 @@ def update_history_display():
         ("⏱️", str(len(game.game_history)), "Games Recorded", COLORS['accent'])
     ]
     
+    # Win rate with each move, from the rolling stats
+    for move, rate in game.get_rolling_stats()['move_win_rates'].items():
+        value = f"{rate:.1f}%" if rate is not None else "-"
+        cards_data.append(("✊" if move == 'rock' else "✋" if move == 'paper' else "✌️",
+                           value, f"Win Rate with {move.capitalize()}", COLORS['warning']))
+    
     # Add cards to frame, 3 per row
     for idx, (icon, value, title, color) in enumerate(cards_data):
         row = idx // 3 + 1
@@ -428,17 +500,71 @@ def update_history_display():
         card, _ = create_stat_card(stats_panel, icon, value, title, color)
         card.grid(row=row, column=col, padx=10, pady=10, sticky="ew")
     
+    # Per-day summary from the materialized rollups
+    daily_panel = ctk.CTkFrame(history_frame, fg_color=COLORS['secondary'], corner_radius=15)
+    daily_panel.grid(row=2, column=0, sticky="ew", pady=(0, 20))
+    daily_panel.grid_columnconfigure((0, 1, 2, 3), weight=1)
+    
+    daily_title = ctk.CTkLabel(daily_panel,
+                              text="Last 7 Days",
+                              font=ctk.CTkFont(family="Helvetica", size=18, weight="bold"),
+                              text_color=COLORS['text'])
+    daily_title.grid(row=0, column=0, columnspan=4, padx=20, pady=(15, 10), sticky="w")
+    
+    for i, header in enumerate(["Date", "Games", "W / L / T", "Win Rate"]):
+        ctk.CTkLabel(daily_panel, text=header, font=ctk.CTkFont(weight="bold"),
+                     text_color=COLORS['text_secondary']).grid(row=1, column=i, padx=15, pady=5, sticky="w")
+    
+    for row, day in enumerate(reversed(game.get_rollups('day', limit=7)), 2):
+        win_rate = day['wins'] / day['games'] * 100 if day['games'] else 0.0
+        values = [day['start'][:10], str(day['games']),
+                  f"{day['wins']} / {day['losses']} / {day['ties']}", f"{win_rate:.1f}%"]
+        for i, value in enumerate(values):
+            ctk.CTkLabel(daily_panel, text=value, font=ctk.CTkFont(size=13),
+                         text_color=COLORS['text']).grid(row=row, column=i, padx=15, pady=2, sticky="w")
+    
     # Create scrollable frame for game history
     history_container = ctk.CTkFrame(history_frame, fg_color=COLORS['secondary'], corner_radius=15)
-    history_container.grid(row=2, column=0, sticky="nsew", pady=(0, 20))
+    history_container.grid(row=3, column=0, sticky="nsew", pady=(0, 20))
     history_container.grid_rowconfigure(1, weight=1)
     history_container.grid_columnconfigure(0, weight=1)
     
-    history_title = ctk.CTkLabel(history_container, 
+    # Fetch only the rounds on the current page
+    page = game.query_history(result=HISTORY_FILTERS[history_filter],
+                              offset=history_page * HISTORY_PAGE_SIZE, limit=HISTORY_PAGE_SIZE)
+    page_count = max(1, -(-page['total'] // HISTORY_PAGE_SIZE))
+    
+    history_header = ctk.CTkFrame(history_container, fg_color="transparent")
+    history_header.grid(row=0, column=0, padx=10, pady=(15, 10), sticky="ew")
+    history_header.grid_columnconfigure(1, weight=1)
+    
+    history_title = ctk.CTkLabel(history_header, 
                                 text="Complete Game History",
                                 font=ctk.CTkFont(family="Helvetica", size=18, weight="bold"),
                                 text_color=COLORS['text'])
-    history_title.grid(row=0, column=0, padx=20, pady=(15, 10), sticky="w")
+    history_title.grid(row=0, column=0, padx=10, sticky="w")
+    
+    def set_filter(value):
+        global history_page, history_filter
+        history_filter = value
+        history_page = 0
+        update_history_display()
+    
+    def turn_page(step):
+        global history_page
+        history_page = min(max(history_page + step, 0), page_count - 1)
+        update_history_display()
+    
+    filter_button = ctk.CTkSegmentedButton(history_header, values=list(HISTORY_FILTERS), command=set_filter)
+    filter_button.set(history_filter)
+    filter_button.grid(row=0, column=1, padx=10, sticky="e")
+    
+    ctk.CTkButton(history_header, text="◀", width=36, command=lambda: turn_page(-1),
+                  fg_color=COLORS['secondary_alt']).grid(row=0, column=2, padx=(10, 2))
+    ctk.CTkLabel(history_header, text=f"Page {history_page + 1} of {page_count}",
+                 text_color=COLORS['text_secondary']).grid(row=0, column=3, padx=8)
+    ctk.CTkButton(history_header, text="▶", width=36, command=lambda: turn_page(1),
+                  fg_color=COLORS['secondary_alt']).grid(row=0, column=4, padx=(2, 10))
     
     # Create scrollable frame for the history
     scroll_frame = ctk.CTkScrollableFrame(history_container, fg_color="transparent")
@@ -464,7 +590,7 @@ def update_history_display():
     header_frame.columnconfigure(3, weight=1)
     
     # If no games
-    if not game.game_history:
+    if not page['games']:
         no_games = ctk.CTkLabel(scroll_frame,
                                text="No games played yet. Start playing!",
                                font=ctk.CTkFont(family="Arial", size=14),
@@ -472,7 +598,7 @@ def update_history_display():
         no_games.grid(row=1, column=0, pady=20)
     else:
         # Add history entries
-        for i, record in enumerate(reversed(game.game_history), 1):
+        for i, record in enumerate(page['games'], 1):
             # Alternate row colors
             bg_color = COLORS['secondary_alt'] if i % 2 == 0 else "transparent"
             
@@ -487,7 +613,7 @@ def update_history_display():
             
             # Date
             date_label = ctk.CTkLabel(row_frame, 
-                                     text=record['datetime'],
+                                     text=game_datetime(record),
                                      font=ctk.CTkFont(size=13),
                                      text_color=COLORS['text'])
             date_label.grid(row=0, column=0, padx=15, pady=10, sticky="w")
@@ -578,7 +704,7 @@ def create_game_interface():
     result_label.pack(pady=30)
     
     # Game logic
-    def play_game(choice):
+    def play_round(choice):
         computer_choice, result = game.play(choice)
         
         # Determine result styling
@@ -607,8 +733,18 @@ def create_game_interface():
         score_label.configure(text=score_text)
         
         # Update dashboard if it's visible
-        update_stats_display()
-        update_recent_games()
+        with timed(game.timer, 'dashboard'):
+            update_stats_display()
+        with timed(game.timer, 'recent_games'):
+            update_recent_games()
+    
+    def play_game(choice):
+        # With debug timing on, game.play() opens a round in the timer and
+        # the UI phases of this callback are added to it
+        with timed(game.timer, 'callback'):
+            play_round(choice)
+        if game.timer is not None:
+            game.timer.end_round()
     
     # Choice buttons
     button_frame = ctk.CTkFrame(game_container, fg_color="transparent")
@@ -673,9 +809,33 @@ create_game_interface()
 # Show frame initially
 show_frame('dashboard')
 
-# Run the application
-if __name__ == "__main__":
-    app.mainloop()
+# Merge rounds played in other windows into the stats every couple of seconds
+SYNC_INTERVAL_MS = 2000
+
+def sync_shared_history():
+    if game.sync():
+        update_stats_display()
+    # Apply the retention compaction once its background job is done
+    if game.finish_compaction():
+        print(f"Archived {game.compaction.cut} old rounds")
+        update_stats_display()
+    app.after(SYNC_INTERVAL_MS, sync_shared_history)
+
+def report_compaction(done, total):
+    # Called from the compaction thread, so it only prints
+    print(f"Archiving old rounds: {done}/{total} ({done * 100 // total}%)")
+
+game.start_compaction(progress=report_compaction)
+app.after(SYNC_INTERVAL_MS, sync_shared_history)
+
+# Compact the game journal into Excel before the window closes
+def on_close():
+    if metrics_server is not None:
+        metrics_server.close()
+    game.close()
+    app.destroy()
+
+app.protocol("WM_DELETE_WINDOW", on_close)
 
 # Achievements display
 def update_achievements_display():
@@ -869,10 +1029,16 @@ def update_settings_display():
                                   text_color=COLORS['text'])
     difficulty_label.grid(row=4, column=0, padx=20, pady=10, sticky="w")
     
+    def change_difficulty(value):
+        global difficulty
+        difficulty = value
+        game.set_strategy(DIFFICULTY_STRATEGIES[value])
+    
     difficulty_options = ctk.CTkSegmentedButton(settings_container, 
-                                             values=["Easy", "Medium", "Hard"])
+                                             values=list(DIFFICULTY_STRATEGIES),
+                                             command=change_difficulty)
     difficulty_options.grid(row=4, column=1, padx=20, pady=10, sticky="w")
-    difficulty_options.set("Medium")  # Default to medium
+    difficulty_options.set(difficulty)
     
     # Clear history
     clear_history_label = ctk.CTkLabel(settings_container,
@@ -895,6 +1061,64 @@ def update_settings_display():
                               hover_color="#2AB",
                               width=150)
     save_button.grid(row=6, column=0, columnspan=2, padx=20, pady=25)
+    
+    # Debug timing panel
+    debug_section = ctk.CTkLabel(settings_container, 
+                               text="Performance",
+                               font=ctk.CTkFont(family="Helvetica", size=18, weight="bold"),
+                               text_color=COLORS['text'])
+    debug_section.grid(row=7, column=0, columnspan=2, padx=20, pady=(25, 15), sticky="w")
+    
+    timing_label = ctk.CTkLabel(settings_container,
+                              text="Round Timing:",
+                              font=ctk.CTkFont(size=14),
+                              text_color=COLORS['text'])
+    timing_label.grid(row=8, column=0, padx=20, pady=10, sticky="w")
+    
+    timing_text = ctk.CTkTextbox(settings_container, height=160,
+                               font=ctk.CTkFont(family="Courier", size=12))
+    timing_text.grid(row=9, column=0, columnspan=2, padx=20, pady=10, sticky="ew")
+    
+    def refresh_timing():
+        timing_text.configure(state="normal")
+        timing_text.delete("1.0", "end")
+        if game.timer is None:
+            timing_text.insert("1.0", "Timing is off. Turn it on and play a few rounds.")
+        else:
+            timing_text.insert("1.0", game.timer.format_summary())
+        timing_text.configure(state="disabled")
+    
+    def toggle_timing():
+        if timing_switch.get():
+            game.enable_timing()
+        else:
+            game.disable_timing()
+        refresh_timing()
+    
+    def dump_timing():
+        if game.timer is None:
+            return
+        dump_path = os.path.join(os.path.dirname(__file__), 'rps_timing.json')
+        game.timer.dump(dump_path)
+        timing_text.configure(state="normal")
+        timing_text.insert("end", f"\n\nSaved to {dump_path}")
+        timing_text.configure(state="disabled")
+    
+    timing_switch = ctk.CTkSwitch(settings_container, text="", width=50, command=toggle_timing)
+    timing_switch.grid(row=8, column=1, padx=20, pady=10, sticky="w")
+    if game.timer is not None:
+        timing_switch.select()
+    
+    timing_buttons = ctk.CTkFrame(settings_container, fg_color="transparent")
+    timing_buttons.grid(row=10, column=0, columnspan=2, padx=20, pady=(0, 20), sticky="w")
+    
+    refresh_button = ctk.CTkButton(timing_buttons, text="Refresh", width=120, command=refresh_timing)
+    refresh_button.grid(row=0, column=0, padx=(0, 10))
+    
+    dump_button = ctk.CTkButton(timing_buttons, text="Dump JSON", width=120, command=dump_timing)
+    dump_button.grid(row=0, column=1)
+    
+    refresh_timing()
 
 # Help display
 def update_help_display():
@@ -1029,3 +1253,7 @@ def update_help_display():
                              justify="left",
                              wraplength=600)
     about_label.grid(row=16, column=0, padx=20, pady=(0, 30), sticky="w")
+
+# Run the application once every page's display function is defined
+if __name__ == "__main__":
+    app.mainloop()
@@ -0,0 +1,239 @@
+import argparse
+import json
+import os
+import struct
+import zlib
+import numpy as np
+from history_utils import CompactHistory
+from retention_utils import ARCHIVE_COLUMNS, DailyArchive
+from storage_utils import ExcelStorage, history_stats
+
+# Compact binary archive of game history (.rpsa).
+#
+# A round is stored as its two moves, 2 bits each, packed two rounds to a
+# byte, its result in a second 2-bit stream packed four to a byte, and the
+# milliseconds since the previous round as a zigzag varint (three bytes for
+# anything under half an hour). Results are kept rather than derived from the
+# moves because older workbooks have rounds whose recorded result doesn't
+# follow from them. Rounds are grouped in blocks that
+# each start from an absolute timestamp, and every block is zlib-compressed,
+# which removes the long runs of identical deltas a kiosk produces.
+#
+# Layout:
+#   header    magic, version, block_size, round count, block count
+#   index     per block: file offset, compressed size, first timestamp
+#   blocks    zlib(packed moves + packed results + varint deltas of rounds 1..n-1)
+#   archived  zlib(JSON list of DailyArchive rows), only if a retention
+#             policy has archived rounds ahead of the first block
+#
+# The index sits in front of the blocks, so reading round i only touches
+# the header, the index and block i // block_size.
+
+MAGIC = b'RPSA'
+VERSION = 1
+HEADER = struct.Struct('<4sBxxxIqI')
+INDEX_DTYPE = np.dtype([('offset', '<u8'), ('size', '<u4'), ('first_timestamp', '<i8')])
+DEFAULT_BLOCK_SIZE = 65536
+
+def encode_varints(values):
+    # Unsigned LEB128 for an array of non-negative ints, vectorized
+    values = np.asarray(values, dtype=np.uint64)
+    lengths = np.ones(len(values), dtype=np.int64)
+    for k in range(1, 10):
+        lengths += values >= np.uint64(1 << (7 * k))
+    starts = np.cumsum(lengths) - lengths
+    owner = np.repeat(np.arange(len(values)), lengths)
+    position = np.arange(int(lengths.sum())) - starts[owner]
+    data = (values[owner] >> (np.uint64(7) * position.astype(np.uint64))) & np.uint64(0x7f)
+    data |= (position < lengths[owner] - 1).astype(np.uint64) << np.uint64(7)
+    return data.astype(np.uint8).tobytes()
+
+def decode_varints(data, count):
+    # Inverse of encode_varints for `count` values at the start of data
+    data = np.frombuffer(data, dtype=np.uint8)
+    ends = np.flatnonzero(data < 0x80)[:count]
+    if len(ends) < count:
+        raise ValueError('truncated varint data')
+    if count == 0:
+        return np.zeros(0, dtype=np.uint64)
+    data = data[:ends[-1] + 1]
+    starts = np.concatenate([[0], ends[:-1] + 1])
+    owner = np.repeat(np.arange(count), ends - starts + 1)
+    position = np.arange(len(data)) - starts[owner]
+    parts = (data & 0x7f).astype(np.uint64) << (np.uint64(7) * position.astype(np.uint64))
+    # The 7-bit groups don't overlap, so adding them is the same as or-ing
+    return np.add.reduceat(parts, starts)
+
+def zigzag(deltas):
+    deltas = np.asarray(deltas, dtype=np.int64)
+    return ((deltas << 1) ^ (deltas >> 63)).astype(np.uint64)
+
+def unzigzag(values):
+    values = np.asarray(values, dtype=np.uint64)
+    return (values >> np.uint64(1)).astype(np.int64) ^ -(values & np.uint64(1)).astype(np.int64)
+
+def pack_bits(codes, bits):
+    # Pack small unsigned codes `bits` wide, lowest bits first
+    per_byte = 8 // bits
+    codes = np.asarray(codes, dtype=np.uint8)
+    padded = np.zeros(-(-len(codes) // per_byte) * per_byte, dtype=np.uint8)
+    padded[:len(codes)] = codes
+    padded = padded.reshape(-1, per_byte)
+    packed = np.zeros(len(padded), dtype=np.uint8)
+    for i in range(per_byte):
+        packed |= padded[:, i] << np.uint8(i * bits)
+    return packed.tobytes()
+
+def unpack_bits(data, count, bits):
+    per_byte = 8 // bits
+    packed = np.frombuffer(data, dtype=np.uint8, count=-(-count // per_byte))
+    shifts = np.arange(per_byte, dtype=np.uint8) * np.uint8(bits)
+    codes = (packed[:, None] >> shifts) & np.uint8((1 << bits) - 1)
+    return codes.reshape(-1)[:count]
+
+def _encode_block(timestamps, players, computers, results):
+    moves = (players.astype(np.uint8) << 2) | computers.astype(np.uint8)
+    return zlib.compress(
+        pack_bits(moves, 4) + pack_bits(results, 2) + encode_varints(zigzag(np.diff(timestamps)))
+    )
+
+def _decode_block(data, count, first_timestamp):
+    data = zlib.decompress(data)
+    moves_size, results_size = -(-count // 2), -(-count // 4)
+    moves = unpack_bits(data, count, 4)
+    results = unpack_bits(data[moves_size:], count, 2)
+
+    timestamps = np.empty(count, dtype=np.int64)
+    timestamps[0] = first_timestamp
+    deltas = unzigzag(decode_varints(data[moves_size + results_size:], count - 1))
+    np.cumsum(deltas, out=timestamps[1:])
+    timestamps[1:] += first_timestamp
+    return timestamps, moves >> 2, moves & 0x03, results
+
+def write_archive(history, path, block_size=DEFAULT_BLOCK_SIZE, archived=None):
+    # Write a CompactHistory to `path`, after the rounds of a DailyArchive
+    # if given; returns the archive size in bytes
+    length = len(history)
+    blocks = [
+        _encode_block(*(column[start:start + block_size] for column in
+                        (history.timestamps, history.players, history.computers, history.results)))
+        for start in range(0, length, block_size)
+    ]
+    index = np.zeros(len(blocks), dtype=INDEX_DTYPE)
+    index['size'] = [len(block) for block in blocks]
+    index['offset'] = HEADER.size + index.nbytes + np.cumsum(index['size']) - index['size']
+    index['first_timestamp'] = history.timestamps[::block_size]
+
+    # Written next to the target and swapped in once complete
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as archive_file:
+        archive_file.write(HEADER.pack(MAGIC, VERSION, block_size, length, len(blocks)))
+        archive_file.write(index.tobytes())
+        for block in blocks:
+            archive_file.write(block)
+        if archived is not None and len(archived):
+            archive_file.write(zlib.compress(json.dumps(archived.to_rows()).encode('utf-8')))
+    os.replace(tmp_path, path)
+    return os.path.getsize(path)
+
+
+class ArchiveReader:
+    # Random access to an archive; only the blocks a read covers are
+    # decompressed
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as archive_file:
+            magic, version, self.block_size, self.length, block_count = HEADER.unpack(archive_file.read(HEADER.size))
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"{path} is not an RPS history archive")
+            self.index = np.frombuffer(archive_file.read(block_count * INDEX_DTYPE.itemsize), dtype=INDEX_DTYPE)
+        # The archived days, if any, follow the last block
+        self.archived_offset = HEADER.size + self.index.nbytes + int(self.index['size'].sum())
+
+    def __len__(self):
+        return self.length
+
+    def read(self, start=0, stop=None):
+        # Rounds [start, stop) as a CompactHistory
+        start, stop, _ = slice(start, stop).indices(self.length)
+        stop = max(start, stop)
+        history = CompactHistory(capacity=max(1024, stop - start))
+        if start == stop:
+            return history
+
+        first_block = start // self.block_size
+        last_block = (stop - 1) // self.block_size
+        with open(self.path, 'rb') as archive_file:
+            for block in range(first_block, last_block + 1):
+                entry = self.index[block]
+                archive_file.seek(int(entry['offset']))
+                block_start = block * self.block_size
+                count = min(self.block_size, self.length - block_start)
+                columns = _decode_block(archive_file.read(int(entry['size'])), count,
+                                        int(entry['first_timestamp']))
+
+                rows = slice(max(start, block_start) - block_start, min(stop, block_start + count) - block_start)
+                history._write(len(history), *(column[rows] for column in columns))
+                history._length += rows.stop - rows.start
+        return history
+
+    def load(self):
+        return self.read()
+
+    def archived(self):
+        # DailyArchive of the rounds archived before the first one stored
+        with open(self.path, 'rb') as archive_file:
+            archive_file.seek(self.archived_offset)
+            data = archive_file.read()
+        if not data:
+            return DailyArchive()
+        rows = json.loads(zlib.decompress(data))
+        return DailyArchive(dict(zip(ARCHIVE_COLUMNS, row)) for row in rows)
+
+
+def export_excel(excel_path, archive_path, block_size=DEFAULT_BLOCK_SIZE):
+    # Archive the history of a workbook, including journaled rounds
+    storage = ExcelStorage(excel_path, journal=True)
+    history, _ = storage.load()
+    storage.journal.close()
+    archived = storage.archived()
+    return archived.rounds + len(history), write_archive(history, archive_path, block_size, archived)
+
+def import_archive(archive_path, excel_path):
+    # Rebuild a workbook from an archive, archived days included. Sessions
+    # are not archived, so the workbook has none and its rounds cannot be
+    # replayed.
+    reader = ArchiveReader(archive_path)
+    storage = ExcelStorage(excel_path)
+    storage.history = reader.load()
+    storage.archive = reader.archived()
+    storage.stats = history_stats(storage.history)
+    for row in storage.archive.rows:
+        storage.stats['total_games'] += row['games']
+        for column in ('wins', 'losses', 'ties', 'rock_count', 'paper_count', 'scissors_count'):
+            storage.stats[column] += row[column]
+    storage.save_to_excel()
+    return storage.archive.rounds + len(storage.history)
+
+def main():
+    parser = argparse.ArgumentParser(description='Convert RPS history between xlsx and the binary archive format')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    export_parser = subparsers.add_parser('export', help='xlsx -> archive')
+    export_parser.add_argument('excel_path')
+    export_parser.add_argument('archive_path')
+    export_parser.add_argument('--block-size', type=int, default=DEFAULT_BLOCK_SIZE)
+    import_parser = subparsers.add_parser('import', help='archive -> xlsx')
+    import_parser.add_argument('archive_path')
+    import_parser.add_argument('excel_path')
+    args = parser.parse_args()
+
+    if args.command == 'export':
+        rounds, size = export_excel(args.excel_path, args.archive_path, args.block_size)
+        excel_size = os.path.getsize(args.excel_path)
+        print(f"Archived {rounds} rounds: {excel_size} -> {size} bytes ({excel_size / max(size, 1):.0f}x smaller)")
+    else:
+        rounds = import_archive(args.archive_path, args.excel_path)
+        print(f"Wrote {rounds} rounds to {args.excel_path}")
+
+if __name__ == '__main__':
+    main()
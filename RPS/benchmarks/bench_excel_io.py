@@ -0,0 +1,118 @@
+# Compare the streaming openpyxl Excel path in ExcelStorage against the
+# original pandas -> polars path, for load and save of a synthetic history.
+#
+#   python benchmarks/bench_excel_io.py --rows 500000
+#
+# Each case runs in its own spawned process so peak memory is measured
+# separately (spawned rather than forked, since polars' thread pool does not
+# survive a fork).
+import argparse
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import polars as pl
+from history_utils import CompactHistory
+from storage_utils import ExcelStorage, empty_stats
+
+
+def make_history(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    players = rng.integers(0, 3, rows, dtype=np.uint8)
+    computers = rng.integers(0, 3, rows, dtype=np.uint8)
+    results = ((players.astype(np.int16) - computers) % 3).astype(np.uint8)
+    timestamps = 1_700_000_000_000 + np.cumsum(rng.integers(1000, 30000, rows))
+    return CompactHistory.from_arrays(timestamps, players, computers, results)
+
+
+def make_workbook(path, rows):
+    storage = ExcelStorage(path)
+    storage.history = make_history(rows)
+    stats = empty_stats()
+    counts = np.bincount(storage.history.results, minlength=3)
+    moves = np.bincount(storage.history.players, minlength=3)
+    stats.update(
+        total_games=rows, ties=int(counts[0]), wins=int(counts[1]), losses=int(counts[2]),
+        rock_count=int(moves[0]), paper_count=int(moves[1]), scissors_count=int(moves[2])
+    )
+    storage.stats = stats
+    storage.save_to_excel()
+
+
+# The pre-streaming implementation, kept here as the baseline
+
+def legacy_load(path):
+    import pandas as pd
+    history_df = pl.from_pandas(pd.read_excel(path, sheet_name='History'))
+    stats_df = pl.from_pandas(pd.read_excel(path, sheet_name='Stats'))
+    return history_df.to_dicts(), stats_df.row(0, named=True)
+
+
+def legacy_save(path, game_history, stats):
+    import pandas as pd
+    history_df = pl.DataFrame(game_history)
+    stats_df = pl.DataFrame({column: [value] for column, value in stats.items()})
+    with pd.ExcelWriter(path) as writer:
+        history_df.to_pandas().to_excel(writer, sheet_name='History', index=False)
+        stats_df.to_pandas().to_excel(writer, sheet_name='Stats', index=False)
+
+
+def peak_rss_mb():
+    # ru_maxrss is kilobytes on Linux and bytes on macOS
+    scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+
+def run_case(case, path):
+    if case == 'legacy_save':
+        game_history, stats = legacy_load(path)
+    elif case == 'streaming_save':
+        storage = ExcelStorage(path)
+        storage.load_history_from_excel()
+
+    before = peak_rss_mb()
+    start = time.perf_counter()
+    if case == 'legacy_load':
+        legacy_load(path)
+    elif case == 'streaming_load':
+        ExcelStorage(path).load_history_from_excel()
+    elif case == 'legacy_save':
+        legacy_save(path + '.legacy.xlsx', game_history, stats)
+    elif case == 'streaming_save':
+        storage.excel_path = path + '.streaming.xlsx'
+        storage.save_to_excel()
+    elapsed = time.perf_counter() - start
+    return elapsed, max(0.0, peak_rss_mb() - before)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark Excel history load/save')
+    parser.add_argument('--rows', type=int, default=500000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'game_history.xlsx')
+        print(f"Generating {args.rows} rounds...", flush=True)
+        make_workbook(path, args.rows)
+
+        results = {}
+        for case in ('legacy_load', 'streaming_load', 'legacy_save', 'streaming_save'):
+            with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as pool:
+                results[case] = pool.submit(run_case, case, path).result()
+            elapsed, memory = results[case]
+            print(f"{case:<16} {elapsed:8.2f} s  {args.rows / elapsed:10.0f} rows/s  +{memory:7.1f} MB peak", flush=True)
+
+        for operation in ('load', 'save'):
+            legacy, streaming = results[f'legacy_{operation}'][0], results[f'streaming_{operation}'][0]
+            print(f"{operation}: streaming is {legacy / streaming:.1f}x faster")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+# Per-move latency of the computer strategies as the history they have
+# learned from grows, plus their win rate against a few scripted players.
+#
+#   python benchmarks/bench_strategies.py --sizes 1000 10000 100000 1000000
+#
+# Latency is one next_move() + update() pair, which is what RPSGame.play()
+# adds per round; it should stay flat across history sizes.
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from history_utils import RESULT_CODES
+from rules_utils import OUTCOMES
+from strategy_utils import STRATEGIES, make_strategy
+
+# Scripted players: move code for round i
+PLAYERS = {
+    'random': lambda i, rng: rng.randrange(3),
+    'biased': lambda i, rng: 0 if rng.random() < 0.5 else rng.randrange(3),
+    'cycle': lambda i, rng: i % 3,
+    'repeat-pairs': lambda i, rng: (i // 2) % 3,
+}
+
+
+def train(strategy, rounds, rng):
+    for _ in range(rounds):
+        strategy.update(rng.randrange(3), rng.randrange(3))
+
+
+def measure_latency(name, history, samples, seed):
+    rng = random.Random(seed)
+    strategy = make_strategy(name, rng=random.Random(seed))
+    train(strategy, history, rng)
+
+    timings = np.empty(samples, dtype=np.float64)
+    clock = time.perf_counter_ns
+    for i in range(samples):
+        player = rng.randrange(3)
+        start = clock()
+        computer = strategy.next_move()
+        strategy.update(player, computer)
+        timings[i] = clock() - start
+    return timings / 1000
+
+
+def measure_win_rate(name, player, rounds, seed):
+    rng = random.Random(seed)
+    # The player gets its own stream so it doesn't mirror the computer
+    strategy = make_strategy(name, rng=random.Random(seed + 1))
+    computer_wins = 0
+    for i in range(rounds):
+        computer = strategy.next_move()
+        move = PLAYERS[player](i, rng)
+        if OUTCOMES[move, computer] == RESULT_CODES['losses']:
+            computer_wins += 1
+        strategy.update(move, computer)
+    return computer_wins * 100 / rounds
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark computer strategies')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000, 1000000])
+    parser.add_argument('--samples', type=int, default=20000)
+    parser.add_argument('--rounds', type=int, default=5000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    print("Per-move latency (next_move + update), microseconds")
+    print(f"{'strategy':<10} {'history':>9} {'mean':>8} {'p50':>8} {'p99':>8}")
+    for name in STRATEGIES:
+        for size in args.sizes:
+            timings = measure_latency(name, size, args.samples, args.seed)
+            p50, p99 = np.percentile(timings, [50, 99])
+            print(f"{name:<10} {size:>9} {timings.mean():8.2f} {p50:8.2f} {p99:8.2f}", flush=True)
+
+    print()
+    print(f"Computer win rate (%) over {args.rounds} rounds")
+    print(f"{'strategy':<10} " + " ".join(f"{player:>12}" for player in PLAYERS))
+    for name in STRATEGIES:
+        rates = [measure_win_rate(name, player, args.rounds, args.seed) for player in PLAYERS]
+        print(f"{name:<10} " + " ".join(f"{rate:12.1f}" for rate in rates))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,205 @@
+# Benchmark suite for RPSGame across history sizes.
+#
+#   python benchmarks/bench_suite.py                      # compare with baseline
+#   python benchmarks/bench_suite.py --save-baseline      # record a new baseline
+#   python benchmarks/bench_suite.py --sizes 1000 10000   # quicker run
+#
+# For each size a synthetic game_history.xlsx is written to a temp
+# directory, then every operation runs in its own spawned process so its
+# peak memory is measured on its own. Results are ops/sec and the peak RSS
+# growth during the timed section (on Linux the high-water mark is reset
+# after setup; elsewhere it falls back to the process-wide ru_maxrss).
+# The timed section is repeated (up to REPEATS times, while it takes less
+# than REPEAT_BUDGET seconds in all) and the fastest run kept, so a small
+# history isn't judged on one noisy run. They are compared against the
+# baseline JSON, and any operation that got slower by more than
+# --tolerance is reported as a regression (exit 1).
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import re
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_excel_io import make_workbook, peak_rss_mb
+from game_utils import RPSGame
+from storage_utils import ExcelStorage
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+REPEATS = 10
+REPEAT_BUDGET = 1.0
+
+# Operation name -> (setup(path) -> state, run(state) -> operations performed)
+
+def setup_storage(path):
+    return ExcelStorage(path)
+
+def setup_loaded_storage(path):
+    storage = ExcelStorage(path)
+    storage.load_history_from_excel()
+    storage.excel_path = path + '.saved.xlsx'
+    return storage
+
+def setup_game(path):
+    # Journal mode, as the app runs it, so play() doesn't rewrite the workbook
+    return RPSGame(storage=ExcelStorage(path, journal=True))
+
+def run_load(storage):
+    storage.load_history_from_excel()
+    return 1
+
+def run_save(storage):
+    storage.save_to_excel()
+    return 1
+
+def run_play(game, rounds=2000):
+    for i in range(rounds):
+        game.play(('rock', 'paper', 'scissors')[i % 3])
+    return rounds
+
+def run_trend(game, repeats=20):
+    for _ in range(repeats):
+        game._generate_trend_from_history()
+    return repeats
+
+def run_stats(game, repeats=100000):
+    for _ in range(repeats):
+        game.get_stats()
+    return repeats
+
+OPERATIONS = {
+    'load_history_from_excel': (setup_storage, run_load),
+    'save_to_excel': (setup_loaded_storage, run_save),
+    'play': (setup_game, run_play),
+    'generate_trend': (setup_game, run_trend),
+    'get_stats': (setup_game, run_stats),
+}
+
+
+def read_status_mb(field):
+    # VmRSS / VmHWM from /proc, or None where it isn't available
+    try:
+        with open('/proc/self/status') as f:
+            match = re.search(rf'^{field}:\s+(\d+) kB', f.read(), re.MULTILINE)
+    except OSError:
+        return None
+    return int(match.group(1)) / 1024 if match else None
+
+
+def reset_peak_memory():
+    # Reset VmHWM to the current RSS so setup allocations don't count.
+    # Returns the baseline to measure from.
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        return peak_rss_mb()
+    return read_status_mb('VmRSS')
+
+
+def current_peak_memory():
+    peak = read_status_mb('VmHWM')
+    return peak_rss_mb() if peak is None else peak
+
+
+def run_operation(name, path):
+    setup, run = OPERATIONS[name]
+    state = setup(path)
+    before = reset_peak_memory()
+    count, elapsed, spent = None, None, 0.0
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        runs = run(state)
+        seconds = time.perf_counter() - start
+        spent += seconds
+        if count is None or seconds / runs < elapsed / count:
+            count, elapsed = runs, seconds
+        if spent >= REPEAT_BUDGET:
+            break
+    return {
+        'ops_per_sec': count / elapsed,
+        'seconds_per_op': elapsed / count,
+        'peak_memory_mb': max(0.0, current_peak_memory() - before)
+    }
+
+
+def run_suite(sizes, operations):
+    results = {}
+    context = multiprocessing.get_context('spawn')
+    for size in sizes:
+        results[str(size)] = {}
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'game_history.xlsx')
+            print(f"Generating {size} rounds...", flush=True)
+            make_workbook(path, size)
+            for name in operations:
+                # A fresh spawned process per operation (polars' thread pool
+                # does not survive a fork)
+                with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                    result = pool.submit(run_operation, name, path).result()
+                results[str(size)][name] = result
+                print(f"  {name:<24} {result['ops_per_sec']:14.2f} ops/s  "
+                      f"+{result['peak_memory_mb']:8.1f} MB peak", flush=True)
+    return results
+
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    for size, operations in results.items():
+        for name, result in operations.items():
+            previous = baseline.get('results', {}).get(size, {}).get(name)
+            if previous is None:
+                continue
+            ratio = result['ops_per_sec'] / previous['ops_per_sec']
+            if ratio < 1 - tolerance:
+                regressions.append((size, name, ratio))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark RPSGame operations across history sizes')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000, 1000000])
+    parser.add_argument('--operations', nargs='+', choices=list(OPERATIONS), default=list(OPERATIONS))
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--save-baseline', action='store_true', help='write the results as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed slowdown before flagging (0.2 = 20%%)')
+    args = parser.parse_args()
+
+    results = run_suite(args.sizes, args.operations)
+    report = {
+        'created': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': results
+    }
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline written to {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline to create one")
+        return
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.tolerance)
+    for size, name, ratio in regressions:
+        print(f"REGRESSION {name} @ {size} rounds: {ratio * 100:.0f}% of baseline ops/s")
+    if regressions:
+        sys.exit(1)
+    print(f"No regressions against baseline from {baseline.get('created', 'unknown date')}")
+
+
+if __name__ == '__main__':
+    main()
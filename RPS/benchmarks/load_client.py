@@ -0,0 +1,95 @@
+# Load generator for server_utils.GameServer.
+#
+#   python server_utils.py &                                   # then
+#   python benchmarks/load_client.py --clients 100 --rounds 1000
+#
+#   python benchmarks/load_client.py --serve                   # self-contained run
+#
+# Each client opens its own session and plays --rounds rounds, keeping up
+# to --pipeline requests in flight. Reports overall rounds/sec and the
+# request latency percentiles.
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from history_utils import MOVES
+from server_utils import GameServer
+from storage_utils import SQLiteStorage
+
+
+async def run_client(host, port, rounds, pipeline, latencies, seed):
+    rng = random.Random(seed)
+    reader, writer = await asyncio.open_connection(host, port)
+    await reader.readline()  # session greeting
+
+    for first in range(0, rounds, pipeline):
+        batch = min(pipeline, rounds - first)
+        start = time.perf_counter()
+        writer.write(b''.join(
+            json.dumps({'op': 'play', 'move': rng.choice(MOVES)}).encode() + b'\n' for _ in range(batch)
+        ))
+        await writer.drain()
+        for _ in range(batch):
+            reply = json.loads(await reader.readline())
+            if 'error' in reply:
+                raise RuntimeError(reply['error'])
+        # Every request in the batch waited for the whole batch
+        latencies.extend([(time.perf_counter() - start) * 1000] * batch)
+
+    writer.write(b'{"op": "quit"}\n')
+    await writer.drain()
+    writer.close()
+
+
+async def run_load(args):
+    server = None
+    tmp_dir = None
+    host, port = args.host, args.port
+    if args.serve:
+        tmp_dir = tempfile.TemporaryDirectory()
+        server = GameServer(SQLiteStorage(os.path.join(tmp_dir.name, 'load.db')), strategy=args.strategy)
+        port = await server.start(host, 0)
+
+    latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        run_client(host, port, args.rounds, args.pipeline, latencies, seed)
+        for seed in range(args.clients)
+    ))
+    elapsed = time.perf_counter() - start
+
+    if server is not None:
+        await server.close()
+
+    total = args.clients * args.rounds
+    p50, p99 = np.percentile(latencies, [50, 99])
+    print(f"{total} rounds from {args.clients} clients in {elapsed:.2f} s: {total / elapsed:.0f} rounds/s")
+    print(f"latency p50 {p50:.2f} ms  p99 {p99:.2f} ms  (pipeline {args.pipeline})")
+    if server is not None:
+        print(f"server recorded {server.stats['total_games']} rounds")
+        tmp_dir.cleanup()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load generator for the RPS game server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--clients', type=int, default=100)
+    parser.add_argument('--rounds', type=int, default=1000)
+    parser.add_argument('--pipeline', type=int, default=1, help='requests in flight per client')
+    parser.add_argument('--serve', action='store_true', help='run a server in this process on a temp database')
+    parser.add_argument('--strategy', default='frequency', help='strategy for --serve')
+    args = parser.parse_args()
+    asyncio.run(run_load(args))
+
+
+if __name__ == '__main__':
+    main()
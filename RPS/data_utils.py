@@ -2,7 +2,7 @@ import matplotlib.pyplot as plt
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 import numpy as np
 
-def create_charts(parent_frame):
+def create_charts(parent_frame, max_trend_points=None):
     # Create a figure with a dark background
     fig = plt.figure(figsize=(12, 4), facecolor='#1E1E2E')
     
@@ -65,8 +65,10 @@ def create_charts(parent_frame):
         
         moves_ax.set_title('Move Distribution', color=chart_colors['text'], fontsize=12, pad=20)
         
-        # Update win rate trend with enhanced styling
+        # Update win rate trend with enhanced styling; a downsampled trend
+        # comes with its own x positions in 'trend_x'
         trend = game_data['trend']
+        trend_x = game_data.get('trend_x')
         
         if len(trend) <= 1:
             trend_ax.text(0.5, 0.5, 'Not enough games played', 
@@ -76,7 +78,7 @@ def create_charts(parent_frame):
                          color=chart_colors['text'], fontsize=12)
         else:
             # Create x values for smooth plotting
-            x = np.arange(len(trend))
+            x = np.arange(len(trend)) if trend_x is None else trend_x
             
             # Create gradient line
             trend_ax.plot(x, trend, color=chart_colors['trend'], linewidth=2.5, alpha=0.9)
@@ -91,7 +93,7 @@ def create_charts(parent_frame):
             if len(trend) > 1:
                 latest_rate = trend[-1]
                 trend_ax.annotate(f'{latest_rate:.1f}%', 
-                                 xy=(len(trend)-1, latest_rate),
+                                 xy=(x[-1], latest_rate),
                                  xytext=(10, 0),
                                  textcoords="offset points",
                                  color=chart_colors['text'],
@@ -116,7 +118,9 @@ def create_charts(parent_frame):
     canvas = FigureCanvasTkAgg(fig, master=parent_frame)
     widget = canvas.get_tk_widget()
     
-    # Store update function as attribute
+    # Store update function as attribute; max_trend_points tells callers to
+    # pass a downsampled trend of at most that many points
     widget.update_charts = update_charts
+    widget.max_trend_points = max_trend_points
     
     return widget
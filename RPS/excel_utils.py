@@ -0,0 +1,52 @@
+from itertools import zip_longest
+from openpyxl import Workbook, load_workbook
+
+def open_workbook(path):
+    # Read-only mode streams rows from the sheet XML instead of building
+    # every cell object up front
+    return load_workbook(path, read_only=True, data_only=True)
+
+def iter_row_chunks(workbook, sheet_name, chunk_size=50000):
+    # Yield a sheet as dicts of column lists, chunk_size rows at a time,
+    # using the first row as column names
+    rows = workbook[sheet_name].iter_rows(values_only=True)
+    header = next(rows, None)
+    if header is None:
+        return
+    # Blank header cells are skipped by position, so the columns after
+    # them keep their names
+    names = [name for name in header if name is not None]
+
+    columns = {name: [] for name in names}
+    count = 0
+    for row in rows:
+        if row is None or all(value is None for value in row):
+            continue
+        # Trailing empty cells aren't stored, so short rows are padded
+        for name, value in zip_longest(header, row):
+            if name is not None:
+                columns[name].append(value)
+        count += 1
+        if count == chunk_size:
+            yield columns
+            columns = {name: [] for name in names}
+            count = 0
+    if count:
+        yield columns
+
+def read_first_row(workbook, sheet_name):
+    # First data row of a sheet as a dict, or None if the sheet is empty
+    for chunk in iter_row_chunks(workbook, sheet_name, chunk_size=1):
+        return {name: values[0] for name, values in chunk.items()}
+    return None
+
+def write_workbook(path, sheets):
+    # Write-only mode streams rows straight to disk. `sheets` maps a sheet
+    # name to (header, rows), where rows may be any iterable of row tuples.
+    workbook = Workbook(write_only=True)
+    for sheet_name, (header, rows) in sheets.items():
+        sheet = workbook.create_sheet(sheet_name)
+        sheet.append(list(header))
+        for row in rows:
+            sheet.append(row)
+    workbook.save(path)
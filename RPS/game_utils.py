@@ -1,167 +1,335 @@
 import random
-from datetime import datetime
-import polars as pl
 import os
+from history_utils import MOVES, MOVE_CODES, now_timestamp
+from rolling_utils import DEFAULT_WINDOWS, RollingStats
+from query_utils import HistoryIndex
+from retention_utils import RetentionJob
+from rollup_utils import Rollups
+from rules_utils import resolve_round
+from snapshot_utils import read_snapshot, write_snapshot
+from storage_utils import ExcelStorage, MmapStorage, SharedExcelStorage
+from strategy_utils import make_strategy, warm_up
+from timing_utils import PhaseTimer
+from trend_utils import TrendDownsampler, WinRateTrend
+from writer_utils import BackgroundWriter
 
 class RPSGame:
-    def __init__(self):
-        self.excel_path = os.path.join(os.path.dirname(__file__), 'game_history.xlsx')
+    # Rounds of recent history a newly chosen strategy learns from
+    WARM_UP_GAMES = 1000
+    # Phases play() records when timing is enabled
+    PLAY_PHASES = ('outcome', 'stats', 'persist')
+
+    def __init__(self, journal=False, storage=None, background=False, debounce=0.5, strategy='random', timing=False, seed=None, shared=False, mapped=False,
+                 windows=DEFAULT_WINDOWS, stats_path=None, retention=None):
+        # Excel is the default backend; journal mode appends each round to a
+        # write-ahead log and only rewrites the workbook on compact() or close().
+        # Shared mode is journal mode for several processes playing at once.
+        # Mapped mode keeps the history in a memory-mapped binary file
+        # (imported from the workbook the first time) for instant startup.
+        if storage is None:
+            excel_path = os.path.join(os.path.dirname(__file__), 'game_history.xlsx')
+            if stats_path is None:
+                stats_path = os.path.splitext(excel_path)[0] + '.stats.json'
+            if mapped:
+                storage = MmapStorage(os.path.splitext(excel_path)[0] + '.rpsh', excel_path)
+            elif shared:
+                storage = SharedExcelStorage(excel_path)
+            else:
+                storage = ExcelStorage(excel_path, journal=journal)
+        
+        # Background mode hands writes to a batching worker thread
+        if background:
+            storage = BackgroundWriter(storage, debounce=debounce)
+        self.storage = storage
+        
+        # Load history and running statistics from the backend. Rounds an
+        # optional RetentionPolicy has archived are no longer in the history
+        # (see start_compaction()); the stats and trend still count them.
+        self.game_history, stats = self.storage.load()
+        self.retention = retention
+        self.compaction = None
+        self.total_games = stats['total_games']
+        self.wins = stats['wins']
+        self.losses = stats['losses']
+        self.ties = stats['ties']
+        self.move_counts = {
+            'rock': stats['rock_count'],
+            'paper': stats['paper_count'],
+            'scissors': stats['scissors_count']
+        }
+        
+        # Windowed, streak and per-move stats and the hour/day/week rollups,
+        # kept up to date per round and snapshotted to stats_path on
+        # compact()/close() so startup only replays the rounds recorded
+        # after the snapshot
+        self.stats_path = stats_path
+        snapshot = read_snapshot(stats_path)
+        loaded = self._loaded_history()
+        archive = self._archive()
+        offset = archive.rounds if archive is not None else 0
+        self.rolling = RollingStats.restore(snapshot.get('rolling'), loaded, windows, offset,
+                                            archive.rolling if archive is not None else None)
+        self.rollups = Rollups.restore(snapshot.get('rollups'), loaded, archive)
+        # On a shared history other windows' rounds land between ours, and
+        # sync() rebuilds the rolling stats in stored order from their state
+        # after the rounds known to be stored in order so far
+        self.rolling_base = (self.rolling.to_dict(), len(loaded))
+        
+        # The trend is read from the stored running win counts on first use
+        self.trend = None
+        self.trend_samplers = {}
         
-        # Initialize or load game history
-        if os.path.exists(self.excel_path):
-            self.load_history_from_excel()
+        # Secondary indexes for query_history(), built on first use and
+        # then kept up to date per round
+        self.index = None
+        
+        # The computer's moves come from a per-game RNG; `seed` fixes it for
+        # reproducible runs, otherwise a fresh seed is drawn
+        self.seed = seed
+        self.rng = None
+        self.session = None
+        self.set_strategy(strategy)
+        
+        # Per-phase timing is off unless asked for; play() then skips it
+        # entirely instead of calling no-op timers
+        self.timer = None
+        if timing:
+            self.enable_timing()
+    
+    def enable_timing(self, capacity=1000):
+        if self.timer is None:
+            self.timer = PhaseTimer(self.PLAY_PHASES, capacity)
+        return self.timer
+    
+    def disable_timing(self):
+        self.timer = None
+    
+    def set_strategy(self, strategy):
+        # Computer opponent by name ('random', 'frequency', 'markov',
+        # 'pattern') or as a strategy instance; it starts from recent history.
+        #
+        # Each strategy starts a session with its own RNG seed: the configured
+        # seed for the first one, then seeds drawn from the previous session's
+        # RNG. The session is stored with the first round played under it, so
+        # replay_utils can re-run it from the history alone. On a shared
+        # history our queued rounds are written and other windows' rounds
+        # taken in first, so the session starts, and its strategy warms up,
+        # at a known stored position.
+        shared = getattr(self.storage, 'sync', None) is not None
+        if shared:
+            self.flush()
+            self.sync()
+        if self.rng is None:
+            seed = self.seed if self.seed is not None else random.SystemRandom().randrange(2 ** 32)
+        else:
+            seed = self.rng.randrange(2 ** 32)
+        self.rng = random.Random(seed)
+        self.strategy = make_strategy(strategy, rng=self.rng)
+        if shared:
+            archive = self._archive()
+            stored = self.total_games - (archive.rounds if archive is not None else 0)
+            recent = self.game_history[max(0, stored - self.WARM_UP_GAMES):stored]
         else:
-            self.game_history = []
-            self.move_counts = {'rock': 0, 'paper': 0, 'scissors': 0}
-            self.win_rates = [0]  # Initialize with 0
-            self.wins = 0
-            self.total_games = 0
-            self.init_excel_file()
+            recent = self.get_recent_games(self.WARM_UP_GAMES)
+        warm_up(self.strategy, recent)
+        self.session = {'first_round': self.total_games, 'seed': seed, 'strategy': self.strategy.name}
     
-    def init_excel_file(self):
-        # Create initial Excel file with empty dataframe
-        history_df = pl.DataFrame(
-            schema={
-                'datetime': pl.Utf8,
-                'player': pl.Utf8,
-                'computer': pl.Utf8,
-                'result': pl.Utf8
-            }
-        )
-        
-        stats_df = pl.DataFrame({
-            'total_games': [0],
-            'wins': [0],
-            'rock_count': [0],
-            'paper_count': [0],
-            'scissors_count': [0],
-            'win_rate': [0.0]
-        })
-        
-        # Use pandas to write to Excel (polars doesn't support Excel writing directly)
-        import pandas as pd
-        with pd.ExcelWriter(self.excel_path) as writer:
-            history_df.to_pandas().to_excel(writer, sheet_name='History', index=False)
-            stats_df.to_pandas().to_excel(writer, sheet_name='Stats', index=False)
+    def _loaded_history(self):
+        # The backend's own history view; a BackgroundWriter wraps it, and
+        # the unwrapped one may have columns RollingStats can use directly
+        return getattr(self.game_history, 'persisted', self.game_history)
     
-    def load_history_from_excel(self):
-        # Use pandas to read Excel then convert to polars
-        import pandas as pd
-        
-        # Load game history from Excel
-        history_df = pl.from_pandas(pd.read_excel(self.excel_path, sheet_name='History'))
-        stats_df = pl.from_pandas(pd.read_excel(self.excel_path, sheet_name='Stats'))
-        
-        # Convert DataFrame to list of dictionaries
-        self.game_history = history_df.to_dicts()
-        
-        # Load statistics
-        if not stats_df.is_empty():
-            self.total_games = stats_df.item(0, 'total_games')
-            self.wins = stats_df.item(0, 'wins')
-            self.move_counts = {
-                'rock': stats_df.item(0, 'rock_count'),
-                'paper': stats_df.item(0, 'paper_count'),
-                'scissors': stats_df.item(0, 'scissors_count')
-            }
-            
-            # Calculate win rates array
-            if self.total_games > 0:
-                win_rate = (self.wins / self.total_games) * 100
-            else:
-                win_rate = 0
-            
-            self.win_rates = [win_rate]  # Just use the current rate for initial trend
-            
-            # Generate trend data based on history
-            self._generate_trend_from_history()
+    def _archive(self):
+        # The backend's DailyArchive, or None if it can't archive rounds
+        archived = getattr(self.storage, 'archived', None)
+        return archived() if archived is not None else None
+    
+    def save_snapshot(self):
+        if self.stats_path is not None:
+            try:
+                write_snapshot(self.stats_path, {'rolling': self.rolling.to_dict(), 'rollups': self.rollups.to_dict()})
+            except OSError as e:
+                print(f"Error saving stats snapshot: {e}")
     
     def _generate_trend_from_history(self):
-        # Reset win rates
-        self.win_rates = [0]
-        
-        # Track running total for win calculation
-        running_wins = 0
-        running_games = 0
-        
-        for game in self.game_history:
-            running_games += 1
-            if game['result'] == 'wins':
-                running_wins += 1
-            
-            # Calculate win rate at this point
-            if running_games > 0:
-                win_rate = (running_wins / running_games) * 100
-            else:
-                win_rate = 0
-                
-            self.win_rates.append(win_rate)
+        self.trend = WinRateTrend(self.storage.cumulative_wins())
+        self.trend_samplers = {}
     
-    def save_to_excel(self):
-        # Convert game history to DataFrame
-        history_df = pl.DataFrame(self.game_history)
-        
-        # Create stats DataFrame
-        stats_df = pl.DataFrame({
-            'total_games': [self.total_games],
-            'wins': [self.wins],
-            'rock_count': [self.move_counts['rock']],
-            'paper_count': [self.move_counts['paper']],
-            'scissors_count': [self.move_counts['scissors']],
-            'win_rate': [(self.wins / self.total_games * 100) if self.total_games > 0 else 0]
-        })
-        
-        # Use pandas to write to Excel
-        import pandas as pd
-        with pd.ExcelWriter(self.excel_path) as writer:
-            # Convert polars to pandas before writing to Excel
-            if not history_df.is_empty():
-                history_df.to_pandas().to_excel(writer, sheet_name='History', index=False)
-            else:
-                pd.DataFrame(columns=['datetime', 'player', 'computer', 'result']).to_excel(
-                    writer, sheet_name='History', index=False
-                )
-            stats_df.to_pandas().to_excel(writer, sheet_name='Stats', index=False)
+    def _stats_row(self):
+        return {
+            'total_games': self.total_games,
+            'wins': self.wins,
+            'losses': self.losses,
+            'ties': self.ties,
+            'rock_count': self.move_counts['rock'],
+            'paper_count': self.move_counts['paper'],
+            'scissors_count': self.move_counts['scissors']
+        }
+    
+    def flush(self):
+        # Block until every recorded round has reached the backend
+        if hasattr(self.storage, 'flush'):
+            self.storage.flush()
+    
+    def compact(self):
+        self.storage.compact()
+        self.save_snapshot()
+    
+    def start_compaction(self, progress=None):
+        # Start archiving the rounds the retention policy no longer keeps,
+        # as daily rows, on a background thread; progress(done, total) is
+        # called from it. finish_compaction() applies the result. Returns
+        # the running job, or None if there is nothing to archive.
+        if self.compaction is not None and self.compaction.state in ('archiving', 'ready'):
+            return self.compaction
+        if self.retention is None:
+            return None
+        history = self._loaded_history()
+        archive = self._archive()
+        if archive is None or not hasattr(history, 'timestamps'):
+            print("Error starting compaction: this storage backend can't archive rounds")
+            return None
+        cut = self.retention.cutoff(history.timestamps)
+        if cut == 0:
+            return None
+        # The job carries the rolling stats on from the archive's saved
+        # state, so each archived row has the state after it
+        rolling = RollingStats(self.rolling.windows)
+        if archive.rounds:
+            rolling = RollingStats.from_dict(archive.rolling, self.rolling.windows) if archive.rolling else None
+        self.compaction = RetentionJob(history, cut, archive.rounds, archive.wins, progress,
+                                       rolling=rolling).start()
+        return self.compaction
 
-    def play(self, player_choice):
-        choices = ['rock', 'paper', 'scissors']
-        computer_choice = random.choice(choices)
+    def finish_compaction(self):
+        # Apply a finished compaction from the thread that plays: the
+        # archived rounds leave the history and the storage is rewritten
+        # with only the rounds kept, which the policy bounds. Returns True
+        # once applied; a shared history waits until the other windows
+        # have closed.
+        job = self.compaction
+        if job is None or job.state != 'ready':
+            return False
+        if not self.storage.apply_retention(job.cut, job.rows):
+            return False
+        job.state = 'applied'
+        # Positions in the history have moved; the counters, streaks,
+        # rollups and trend are lifetime state and stay as they are
+        self.index = None
+        state, known = self.rolling_base
+        self.rolling_base = (state, known - job.cut)
+        self.save_snapshot()
+        return True
+
+    def sync(self):
+        # Count rounds other instances sharing the storage have recorded.
+        # Their rounds interleave with ours in the stored order, so the
+        # trend is re-read from the storage on next use and the rolling
+        # stats are rebuilt in that order.
+        sync = getattr(self.storage, 'sync', None)
+        if sync is None:
+            return 0
+        foreign = sync()
+        if foreign:
+            self.trend = None
+            self.index = None
+            for game in foreign:
+                self._count_game(game)
+            self._rebuild_rolling()
+        return len(foreign)
+
+    def _rebuild_rolling(self):
+        # Rolling stats from the base state on over the rounds stored since,
+        # then our rounds still queued for the storage
+        history = self._loaded_history()
+        split = getattr(self.game_history, 'split', None)
+        stored, queued = split() if split is not None else (len(history), [])
+        state, known = self.rolling_base
+        rolling = RollingStats.from_dict(state, self.rolling.windows)
+        if stored > known:
+            rolling.extend(history.players[known:stored], history.results[known:stored],
+                           int(history.timestamps[stored - 1]))
+        self.rolling_base = (rolling.to_dict(), stored)
+        for game in queued:
+            rolling.add_game(game)
+        self.rolling = rolling
+    
+    def close(self):
+        self.storage.close()
+        self.save_snapshot()
+
+    def _record_game(self, game):
+        self._count_game(game)
+        self._persist(game)
+
+    def _persist(self, game):
+        # A new session is written just before its first round
+        if self.session is not None:
+            self.storage.add_session(self.session)
+            self.session = None
+        
+        # Persist the round together with the updated stats
+        self.storage.append(game, self._stats_row())
+
+    def _count_game(self, game):
+        player_choice = game['player']
         
         # Update move counts
         self.move_counts[player_choice.lower()] += 1
         
-        # Determine winner
-        if player_choice == computer_choice:
-            result = 'ties'
-        elif (
-            (player_choice == 'rock' and computer_choice == 'scissors') or
-            (player_choice == 'paper' and computer_choice == 'rock') or
-            (player_choice == 'scissors' and computer_choice == 'paper')
-        ):
-            result = 'wins'
+        if game['result'] == 'wins':
             self.wins += 1
+        elif game['result'] == 'losses':
+            self.losses += 1
         else:
-            result = 'losses'
-        
+            self.ties += 1
         self.total_games += 1
+        self.rolling.add_game(game)
+        self.rollups.add_game(game)
         
-        # Calculate win rate
-        win_rate = (self.wins / self.total_games) * 100 if self.total_games > 0 else 0
-        self.win_rates.append(win_rate)
+        # Extend the running win count and the query indexes
+        if self.trend is not None:
+            self.trend.append(game['result'] == 'wins')
+        if self.index is not None:
+            self.index.add_game(game)
+
+    def _resolve(self, player_choice):
+        computer_code = self.strategy.next_move()
+        computer_choice = MOVES[computer_code]
         
-        # Record game in history
-        new_game = {
-            'datetime': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        # Determine winner from the shared outcome table
+        result = resolve_round(player_choice, computer_choice)
+        self.strategy.update(MOVE_CODES[player_choice.lower()], computer_code)
+        
+        return {
+            'timestamp': now_timestamp(),
             'player': player_choice,
             'computer': computer_choice,
             'result': result
         }
-        self.game_history.append(new_game)
+
+    def play(self, player_choice):
+        if self.timer is not None:
+            return self._play_timed(player_choice)
+        
+        # Record game in history
+        new_game = self._resolve(player_choice)
+        self._record_game(new_game)
         
-        # Save to Excel after each game
-        self.save_to_excel()
+        return new_game['computer'], new_game['result']
+
+    def _play_timed(self, player_choice):
+        # Same steps as play(), each timed into a new round of the timer
+        timer = self.timer
+        timer.begin_round()
+        with timer.phase('outcome'):
+            new_game = self._resolve(player_choice)
+        with timer.phase('stats'):
+            self._count_game(new_game)
+        with timer.phase('persist'):
+            self._persist(new_game)
         
-        return computer_choice, result
+        return new_game['computer'], new_game['result']
 
     def get_stats(self):
         win_rate = f"{(self.wins / self.total_games * 100):.1f}%" if self.total_games > 0 else "0.0%"
@@ -171,8 +339,54 @@ class RPSGame:
             'win_rate': win_rate
         }
 
-    def get_move_distribution(self):
-        return {k.capitalize(): v for k, v in self.move_counts.items()}
+    def get_rolling_stats(self):
+        # Last-N result rates, streaks and per-move win rates; no history scan
+        return self.rolling.summary()
+
+    def get_rollups(self, granularity='day', start=None, end=None, limit=None):
+        # Per-hour/day/week counters, oldest first, from the materialized
+        # rollups rather than the raw history
+        return self.rollups.report(granularity, start, end, limit)
+
+    def _history_index(self):
+        if self.index is None:
+            index = HistoryIndex.from_history(self._loaded_history())
+            for game in self.game_history[len(index):]:
+                index.add_game(game)
+            self.index = index
+        return self.index
+
+    def query_history(self, start=None, end=None, result=None, move=None, newest_first=True, offset=0, limit=50):
+        # One page of rounds with start <= datetime < end, the given result
+        # ('wins', 'losses', 'ties') and player move, newest first unless
+        # asked otherwise. Only the rows on the page are read.
+        total, positions = self._history_index().query(start, end, result, move, newest_first, offset, limit)
+        history = self.game_history
+        return {'total': total, 'games': [history[int(position)] for position in positions]}
 
-    def get_winrate_trend(self):
-        return self.win_rates
+    def get_result_counts(self, start=None, end=None):
+        # Wins/losses/ties, optionally within a [start, end) datetime window
+        return self.storage.count_results(start, end)
+
+    def get_recent_games(self, n=5):
+        return self.storage.recent(n)
+
+    def get_move_distribution(self, start=None, end=None):
+        move_counts = self.move_counts
+        if start is not None or end is not None:
+            move_counts = self.storage.count_moves(start, end)
+        return {k.capitalize(): v for k, v in move_counts.items()}
+
+    def get_winrate_trend(self, start=0, stop=None):
+        if self.trend is None:
+            self._generate_trend_from_history()
+        return self.trend.rates(start, stop)
+
+    def get_winrate_trend_downsampled(self, max_points=500):
+        # Shape-preserving (x, y) downsample of the trend for plotting; each
+        # call only feeds the points added since the previous one
+        if self.trend is None:
+            self._generate_trend_from_history()
+        sampler = self.trend_samplers.setdefault(max_points, TrendDownsampler(max_points))
+        sampler.extend(self.trend.rates(sampler.count))
+        return sampler.points()
@@ -0,0 +1,316 @@
+from collections.abc import Mapping, Sequence
+from datetime import datetime, timedelta
+from functools import lru_cache
+import os
+import numpy as np
+import polars as pl
+from rules_utils import RESULTS, RESULT_CODES, RPS
+
+# History records the classic game's moves
+MOVES = RPS.moves
+MOVE_CODES = RPS.codes
+
+DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+EPOCH = datetime(1970, 1, 1)
+MILLISECOND = timedelta(milliseconds=1)
+
+def to_timestamp(value):
+    # Wall-clock datetime string (or datetime) to integer epoch milliseconds;
+    # integers are taken to be timestamps already. History times are naive
+    # local times, so no timezone is applied.
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return (value - EPOCH) // MILLISECOND
+
+def now_timestamp():
+    return to_timestamp(datetime.now())
+
+@lru_cache(maxsize=4096)
+def _format_seconds(seconds):
+    return (EPOCH + timedelta(seconds=seconds)).strftime(DATETIME_FORMAT)
+
+def format_timestamp(timestamp):
+    # Display string, to the second. Rounds are only formatted when shown,
+    # and the UI shows the same ones on every redraw, so strings are cached.
+    return _format_seconds(int(timestamp) // 1000)
+
+def game_timestamp(game):
+    # Epoch milliseconds of a round, from records written before timestamps
+    # too (journals, SQLite and Parquet rows carry the datetime string)
+    if 'timestamp' in game:
+        return game['timestamp']
+    return to_timestamp(game['datetime'])
+
+def game_datetime(game):
+    if 'timestamp' in game:
+        return format_timestamp(game['timestamp'])
+    return game['datetime']
+
+
+class GameRecord(Mapping):
+    # Read-only dict-like view of one round in a CompactHistory. 'datetime'
+    # is formatted on access and isn't one of the keys, so dict(record) has
+    # the same shape as a round from RPSGame.
+    __slots__ = ('history', 'index')
+    KEYS = ('timestamp', 'player', 'computer', 'result')
+
+    def __init__(self, history, index):
+        self.history = history
+        self.index = index
+
+    def __getitem__(self, key):
+        i = self.index
+        if key == 'timestamp':
+            return int(self.history.timestamps[i])
+        if key == 'datetime':
+            return format_timestamp(self.history.timestamps[i])
+        if key == 'player':
+            return MOVES[self.history.players[i]]
+        if key == 'computer':
+            return MOVES[self.history.computers[i]]
+        if key == 'result':
+            return RESULTS[self.history.results[i]]
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(self.KEYS)
+
+    def __len__(self):
+        return len(self.KEYS)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+class CompactHistory(Sequence):
+    # Game history stored column-wise as NumPy arrays: uint8 codes for the
+    # moves and result and int64 epoch milliseconds for the timestamp, about 11
+    # bytes per round instead of a dict of four strings. Indexing returns
+    # GameRecord views so existing callers can keep using record['player'].
+    # The arrays grow by doubling; the timestamps/players/computers/results
+    # properties are views of the filled part for charts and statistics.
+    def __init__(self, capacity=1024):
+        self._length = 0
+        self._timestamps = np.empty(capacity, dtype=np.int64)
+        self._players = np.empty(capacity, dtype=np.uint8)
+        self._computers = np.empty(capacity, dtype=np.uint8)
+        self._results = np.empty(capacity, dtype=np.uint8)
+
+    @classmethod
+    def from_arrays(cls, timestamps, players, computers, results):
+        history = cls(capacity=max(1024, len(timestamps)))
+        history._write(0, timestamps, players, computers, results)
+        history._length = len(timestamps)
+        return history
+
+    @classmethod
+    def from_polars(cls, history_df):
+        history = cls(capacity=max(1024, len(history_df)))
+        history.extend_polars(history_df)
+        return history
+
+    def extend_polars(self, history_df):
+        # Encode a DataFrame of history rows in one vectorized pass
+        if history_df.is_empty():
+            return
+
+        # Rows from before epoch timestamps only have the datetime string
+        moves = pl.Enum(list(MOVES))
+        if 'timestamp' in history_df.columns:
+            timestamps = pl.col('timestamp').cast(pl.Int64)
+        else:
+            timestamps = pl.col('datetime')
+            if history_df.schema['datetime'] == pl.Utf8:
+                timestamps = timestamps.str.strptime(pl.Datetime('ms'), DATETIME_FORMAT)
+            timestamps = timestamps.dt.epoch('ms')
+        columns = history_df.select(
+            timestamps.alias('timestamp'),
+            pl.col('player').str.to_lowercase().cast(moves).to_physical().alias('player'),
+            pl.col('computer').str.to_lowercase().cast(moves).to_physical().alias('computer'),
+            pl.col('result').cast(pl.Enum(list(RESULTS))).to_physical().alias('result')
+        )
+        self._write(self._length, *(columns[name].to_numpy() for name in columns.columns))
+        self._length += len(columns)
+
+    def _grow(self, needed):
+        capacity = len(self._timestamps)
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        for name in ('_timestamps', '_players', '_computers', '_results'):
+            old = getattr(self, name)
+            new = np.empty(capacity, dtype=old.dtype)
+            new[:self._length] = old[:self._length]
+            setattr(self, name, new)
+
+    def _write(self, start, timestamps, players, computers, results):
+        stop = start + len(timestamps)
+        self._grow(stop)
+        self._timestamps[start:stop] = timestamps
+        self._players[start:stop] = players
+        self._computers[start:stop] = computers
+        self._results[start:stop] = results
+
+    def extend_from(self, other, start=0):
+        # Append rounds [start:] of another CompactHistory
+        self._write(self._length, other.timestamps[start:], other.players[start:],
+                    other.computers[start:], other.results[start:])
+        self._length += len(other) - start
+
+    def drop_front(self, count):
+        # Remove the first `count` rounds in place, so views holding this
+        # history see the shorter one
+        count = min(count, self._length)
+        for name in ('_timestamps', '_players', '_computers', '_results'):
+            array = getattr(self, name)
+            array[:self._length - count] = array[count:self._length]
+        self._length -= count
+
+    def append(self, game):
+        self.extend([game])
+
+    def extend(self, games):
+        games = list(games)
+        self._write(
+            self._length,
+            [game_timestamp(game) for game in games],
+            [MOVE_CODES[game['player'].lower()] for game in games],
+            [MOVE_CODES[game['computer'].lower()] for game in games],
+            [RESULT_CODES[game['result']] for game in games]
+        )
+        self._length += len(games)
+
+    @property
+    def timestamps(self):
+        return self._timestamps[:self._length]
+
+    @property
+    def players(self):
+        return self._players[:self._length]
+
+    @property
+    def computers(self):
+        return self._computers[:self._length]
+
+    @property
+    def results(self):
+        return self._results[:self._length]
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [GameRecord(self, i) for i in range(*index.indices(self._length))]
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError('game history index out of range')
+        return GameRecord(self, index)
+
+    def nbytes(self):
+        return sum(array.nbytes for array in (self.timestamps, self.players, self.computers, self.results))
+
+    def to_polars(self, start=0, stop=None):
+        # Decode rounds [start, stop) back to a DataFrame of the timestamp
+        # and strings
+        rows = slice(start, stop)
+        moves = pl.Series(MOVES)
+        timestamps = pl.Series(self.timestamps[rows])
+        return pl.DataFrame({
+            'timestamp': timestamps,
+            'datetime': pl.from_epoch(timestamps, time_unit='ms').dt.strftime(DATETIME_FORMAT),
+            'player': moves.gather(self.players[rows]),
+            'computer': moves.gather(self.computers[rows]),
+            'result': pl.Series(RESULTS).gather(self.results[rows])
+        })
+
+    def window_mask(self, start=None, end=None):
+        # Boolean mask of rounds with start <= datetime < end
+        mask = np.ones(self._length, dtype=bool)
+        if start is not None:
+            mask &= self.timestamps >= to_timestamp(start)
+        if end is not None:
+            mask &= self.timestamps < to_timestamp(end)
+        return mask
+
+
+class MappedHistory(CompactHistory):
+    # CompactHistory whose columns are views of a memory-mapped file of
+    # fixed-width records, so opening it reads only the header and rounds
+    # are paged in as they are touched. Each record also carries the running
+    # win count, so the trend needs no pass over the results either.
+    #
+    # Rows written through extend() land in the mapping directly; the
+    # header's length and stats are only updated by commit(), so rows past
+    # the committed length (a crash mid-batch) are ignored on the next open.
+    HEADER_SIZE = 128
+    HEADER_DTYPE = np.dtype([('magic', 'S4'), ('version', '<u4'), ('length', '<i8'), ('stats', '<i8', (7,))])
+    RECORD_DTYPE = np.dtype([('timestamp', '<i8'), ('cum_wins', '<i8'), ('player', 'u1'),
+                             ('computer', 'u1'), ('result', 'u1')], align=True)
+    MAGIC = b'RPSH'
+    VERSION = 1
+
+    def __init__(self, path, capacity=1024):
+        self.path = path
+        if not os.path.exists(path):
+            header = np.zeros(1, dtype=self.HEADER_DTYPE)
+            header['magic'] = self.MAGIC
+            header['version'] = self.VERSION
+            with open(path, 'wb') as history_file:
+                history_file.write(header.tobytes().ljust(self.HEADER_SIZE, b'\0'))
+
+        self.header = np.memmap(path, dtype=self.HEADER_DTYPE, mode='r+', shape=(1,))
+        if self.header['magic'][0] != self.MAGIC or self.header['version'][0] != self.VERSION:
+            raise ValueError(f"{path} is not an RPS history file")
+        self._length = int(self.header['length'][0])
+        stored = (os.path.getsize(path) - self.HEADER_SIZE) // self.RECORD_DTYPE.itemsize
+        self._map(max(capacity, stored, self._length))
+
+    def _map(self, capacity):
+        # Mapping past the end of the file extends it. Earlier mappings stay
+        # valid for any views still holding them.
+        self.records = np.memmap(self.path, dtype=self.RECORD_DTYPE, mode='r+',
+                                 offset=self.HEADER_SIZE, shape=(capacity,))
+        rows = self.records.view(np.ndarray)
+        self._timestamps = rows['timestamp']
+        self._cumulative_wins = rows['cum_wins']
+        self._players = rows['player']
+        self._computers = rows['computer']
+        self._results = rows['result']
+
+    def _grow(self, needed):
+        capacity = len(self.records)
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        self._map(capacity)
+
+    def _write(self, start, timestamps, players, computers, results):
+        super()._write(start, timestamps, players, computers, results)
+        stop = start + len(timestamps)
+        base = self._cumulative_wins[start - 1] if start > 0 else 0
+        won = self._results[start:stop] == RESULT_CODES['wins']
+        self._cumulative_wins[start:stop] = base + np.cumsum(won, dtype=np.int64)
+
+    @property
+    def cumulative_wins(self):
+        return self._cumulative_wins[:self._length]
+
+    @property
+    def stats(self):
+        # Stats row stored in the header, in empty_stats() key order
+        return [int(value) for value in self.header['stats'][0]]
+
+    def commit(self, stats):
+        # Publish the rows written so far together with their stats row
+        self.header['stats'][0] = stats
+        self.header['length'][0] = self._length
+
+    def flush(self):
+        self.records.flush()
+        self.header.flush()
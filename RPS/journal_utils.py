@@ -0,0 +1,53 @@
+import json
+import os
+
+class GameJournal:
+    # Append-only write-ahead log of played rounds.
+    # Each round is one JSON line, so recording a round costs the same
+    # no matter how much history already exists.
+    def __init__(self, path, sync=False):
+        self.path = path
+        self.sync = sync
+        self._file = None
+
+    def _open(self):
+        if self._file is None:
+            self._file = open(self.path, 'a', encoding='utf-8')
+        return self._file
+
+    def append(self, record):
+        self.append_many([record])
+
+    def append_many(self, records):
+        journal_file = self._open()
+        journal_file.write(''.join(json.dumps(record, separators=(',', ':')) + '\n' for record in records))
+        journal_file.flush()
+
+        # Optionally force the record to disk before returning
+        if self.sync:
+            os.fsync(journal_file.fileno())
+
+    def replay(self):
+        if not os.path.exists(self.path):
+            return
+
+        with open(self.path, 'r', encoding='utf-8') as journal_file:
+            for line in journal_file:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    # A torn final line from a crash mid-write is skipped
+                    continue
+
+    def truncate(self):
+        self.close()
+        with open(self.path, 'w', encoding='utf-8'):
+            pass
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -0,0 +1,206 @@
+import bisect
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from history_utils import MOVES
+
+# Minimal Prometheus text-format metrics on the standard library. Metrics
+# are thread-safe and cheap to update (a lock and an add), so the game and
+# the writer thread record into them directly; the HTTP thread only reads.
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{value}"' for key, value in labels) + '}'
+
+
+class _Timer:
+    __slots__ = ('histogram', 'start')
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start)
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, seconds):
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self.lock:
+            self.counts[index] += 1
+            self.sum += seconds
+
+    def time(self):
+        # `with histogram.time():` observes the duration of the block
+        return _Timer(self)
+
+    def samples(self):
+        with self.lock:
+            counts, total = list(self.counts), self.sum
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += count
+            yield f'{self.name}_bucket', (('le', _format_value(bound)),), cumulative
+        yield f'{self.name}_sum', (), total
+        yield f'{self.name}_count', (), cumulative
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self.value = 0
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self.lock:
+            self.value += amount
+
+    def samples(self):
+        yield self.name, (), self.value
+
+
+class CallbackMetric:
+    # Counter or gauge read from `read()` at scrape time. read() returns a
+    # number, or a dict of label value -> number for a metric with one label.
+    def __init__(self, name, kind, help_text, read, label=None):
+        self.name = name
+        self.kind = kind
+        self.help = help_text
+        self.read = read
+        self.label = label
+
+    def samples(self):
+        value = self.read()
+        if self.label is None:
+            yield self.name, (), value
+            return
+        for label_value, sample in value.items():
+            yield self.name, ((self.label, label_value),), sample
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+
+    def register(self, metric):
+        with self.lock:
+            self.metrics[metric.name] = metric
+        return metric
+
+    def histogram(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        return self.metrics.get(name) or self.register(Histogram(name, help_text, buckets))
+
+    def counter(self, name, help_text):
+        return self.metrics.get(name) or self.register(Counter(name, help_text))
+
+    def render(self):
+        with self.lock:
+            metrics = list(self.metrics.values())
+        lines = []
+        for metric in metrics:
+            try:
+                samples = list(metric.samples())
+            except Exception as e:
+                # A failing callback shouldn't take the whole scrape down
+                print(f"Error reading metric {metric.name}: {e}")
+                continue
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            for name, labels, value in samples:
+                lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+
+# Durations recorded by the persistence layer and the dashboard
+PERSIST_SECONDS = REGISTRY.histogram(
+    'rps_persist_batch_seconds', 'Time to write one batch of rounds to the storage backend')
+EXCEL_SAVE_SECONDS = REGISTRY.histogram(
+    'rps_excel_save_seconds', 'Time to rewrite game_history.xlsx')
+PERSIST_ERRORS = REGISTRY.counter(
+    'rps_persist_errors_total', 'Failed writes to the storage backend')
+CHART_REDRAW_SECONDS = REGISTRY.histogram(
+    'rps_chart_redraw_seconds', 'Time to refresh the dashboard charts')
+
+
+def register_game(game, registry=REGISTRY):
+    # Expose an RPSGame's counters. They are plain ints read at scrape time,
+    # so nothing is recorded per round and no Tk state is involved.
+    def pending():
+        storage_pending = getattr(game.storage, 'pending', None)
+        return storage_pending() if storage_pending else 0
+
+    for metric in (
+        CallbackMetric('rps_games_total', 'counter', 'Rounds played', lambda: game.total_games),
+        CallbackMetric('rps_results_total', 'counter', 'Rounds by result for the player',
+                       lambda: {'wins': game.wins, 'losses': game.losses, 'ties': game.ties}, label='result'),
+        CallbackMetric('rps_player_moves_total', 'counter', 'Player moves',
+                       lambda: {move: game.move_counts[move] for move in MOVES}, label='move'),
+        CallbackMetric('rps_persist_queue_depth', 'gauge', 'Rounds waiting to be written to storage', pending),
+    ):
+        registry.register(metric)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry = REGISTRY
+
+    def do_GET(self):
+        if self.path.split('?')[0] not in ('/', '/metrics'):
+            self.send_error(404)
+            return
+        body = self.registry.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Scrapes every few seconds would otherwise flood stderr
+        pass
+
+
+class MetricsServer:
+    # Serves GET /metrics on localhost from a daemon thread. Binding to
+    # 127.0.0.1 keeps the endpoint off the network; port 0 picks a free port.
+    def __init__(self, port=9464, host='127.0.0.1', registry=REGISTRY):
+        handler = type('MetricsHandler', (_MetricsHandler,), {'registry': registry})
+        self.server = ThreadingHTTPServer((host, port), handler)
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        self.thread = threading.Thread(target=self.server.serve_forever, name='rps-metrics', daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def close(self):
+        if self.thread.is_alive():
+            self.server.shutdown()
+        self.server.server_close()
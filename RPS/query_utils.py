@@ -0,0 +1,153 @@
+import numpy as np
+from history_utils import MOVES, MOVE_CODES, RESULTS, RESULT_CODES, game_timestamp, to_timestamp
+
+class _Positions:
+    # Growable int64 array, doubled when full like CompactHistory's columns
+    def __init__(self, values=(), capacity=1024):
+        values = np.asarray(values, dtype=np.int64)
+        self._length = len(values)
+        self._values = np.empty(max(capacity, 2 * self._length), dtype=np.int64)
+        self._values[:self._length] = values
+
+    def append(self, value):
+        if self._length == len(self._values):
+            grown = np.empty(2 * len(self._values), dtype=np.int64)
+            grown[:self._length] = self._values
+            self._values = grown
+        self._values[self._length] = value
+        self._length += 1
+
+    def insert(self, index, value):
+        self.append(value)
+        self._values[index + 1:self._length] = self._values[index:self._length - 1].copy()
+        self._values[index] = value
+
+    @property
+    def values(self):
+        return self._values[:self._length]
+
+    def __len__(self):
+        return self._length
+
+
+class HistoryIndex:
+    # Secondary indexes over the positions of a game history:
+    #   by_time    positions ordered by timestamp, with the timestamps in
+    #              the same order for binary search
+    #   by_result  ascending positions of each result
+    #   by_move    ascending positions of each player move
+    # Rounds arrive in time order almost always, so appending is O(1); a
+    # round older than the newest one is inserted in place.
+    #
+    # A query narrows the candidates with the index that applies (a date
+    # range is two binary searches) and only reads the result and move
+    # codes of those candidates for the remaining filters, then slices out
+    # the requested page. Unfiltered and single-filter pages are sliced
+    # straight from an index, so page 5000 costs the same as page 1.
+    def __init__(self):
+        self.timestamps = _Positions()
+        self.by_time = _Positions()
+        self.by_result = [_Positions() for _ in RESULTS]
+        self.by_move = [_Positions() for _ in MOVES]
+        self.results = _Positions()
+        self.moves = _Positions()
+        # True while positions are already in time order
+        self.in_order = True
+
+    def __len__(self):
+        return len(self.results)
+
+    def add(self, timestamp, player_code, result_code):
+        position = len(self.results)
+        self.results.append(result_code)
+        self.moves.append(player_code)
+        self.by_result[result_code].append(position)
+        self.by_move[player_code].append(position)
+
+        times = self.timestamps.values
+        if not len(times) or timestamp >= times[-1]:
+            self.timestamps.append(timestamp)
+            self.by_time.append(position)
+        else:
+            index = int(np.searchsorted(times, timestamp, side='right'))
+            self.timestamps.insert(index, timestamp)
+            self.by_time.insert(index, position)
+            self.in_order = False
+
+    def add_game(self, game):
+        self.add(game_timestamp(game), MOVE_CODES[game['player'].lower()], RESULT_CODES[game['result']])
+
+    @classmethod
+    def from_arrays(cls, timestamps, players, results):
+        index = cls()
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        order = np.argsort(timestamps, kind='stable')
+        index.timestamps = _Positions(timestamps[order])
+        index.by_time = _Positions(order)
+        index.results = _Positions(results)
+        index.moves = _Positions(players)
+        index.by_result = [_Positions(np.flatnonzero(results == code)) for code in range(len(RESULTS))]
+        index.by_move = [_Positions(np.flatnonzero(players == code)) for code in range(len(MOVES))]
+        index.in_order = bool(np.all(np.diff(timestamps) >= 0))
+        return index
+
+    @classmethod
+    def from_history(cls, history):
+        if hasattr(history, 'timestamps'):
+            return cls.from_arrays(history.timestamps, history.players, history.results)
+        index = cls()
+        for game in history:
+            index.add_game(game)
+        return index
+
+    def query(self, start=None, end=None, result=None, move=None, newest_first=True, offset=0, limit=50):
+        # (total matches, positions of the requested page) for rounds with
+        # start <= datetime < end and the given result and player move
+        candidates = None
+        time_ordered = True
+        if start is not None or end is not None:
+            times = self.timestamps.values
+            first = 0 if start is None else int(np.searchsorted(times, to_timestamp(start), side='left'))
+            last = len(times) if end is None else int(np.searchsorted(times, to_timestamp(end), side='left'))
+            candidates = self.by_time.values[first:max(first, last)]
+
+        for codes, lists, value in ((self.results, self.by_result, None if result is None else RESULT_CODES[result]),
+                                    (self.moves, self.by_move, None if move is None else MOVE_CODES[move.lower()])):
+            if value is None:
+                continue
+            if candidates is None:
+                # Position order; the same as time order unless a round was
+                # recorded out of order
+                candidates = lists[value].values
+                time_ordered = self.in_order
+            else:
+                candidates = candidates[codes.values[candidates] == value]
+
+        if candidates is None:
+            total = len(self)
+            if self.in_order:
+                page = _page_range(total, newest_first, offset, limit)
+                return total, page
+            candidates = self.by_time.values
+        elif not time_ordered:
+            candidates = candidates[np.argsort(self.timestamps_by_position()[candidates], kind='stable')]
+
+        total = len(candidates)
+        if newest_first:
+            stop = max(total - offset, 0)
+            page = candidates[max(stop - limit, 0):stop][::-1]
+        else:
+            page = candidates[offset:offset + limit]
+        return total, page
+
+    def timestamps_by_position(self):
+        times = np.empty(len(self), dtype=np.int64)
+        times[self.by_time.values] = self.timestamps.values
+        return times
+
+
+def _page_range(total, newest_first, offset, limit):
+    if newest_first:
+        stop = max(total - offset, 0)
+        return np.arange(stop - 1, max(stop - limit, 0) - 1, -1)
+    return np.arange(offset, min(offset + limit, total))
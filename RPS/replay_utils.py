@@ -0,0 +1,148 @@
+import argparse
+import os
+import time
+import numpy as np
+from game_utils import RPSGame
+from history_utils import CompactHistory, MOVES, RESULTS
+from storage_utils import ExcelStorage, MemoryStorage, history_stats
+
+# Headless replay of recorded sessions. A session (first_round, seed,
+# strategy) is re-run through RPSGame on an in-memory store that holds only
+# the rounds its strategy warmed up on; the player's recorded moves are fed
+# back in and every computer move and result must match the history. The
+# replayed stats and running win counts are then checked against the stored
+# ones.
+#
+# Windows sharing a history interleave their rounds, and their sessions can
+# start at the same round. A session only plays its own instance's rounds
+# (see RUN_COLUMNS in storage_utils), from its first round up to the next
+# session of the same instance.
+
+def compact_history(history):
+    # Backends return different history views; replay works on the arrays
+    if isinstance(history, CompactHistory):
+        return history
+    compact = CompactHistory(capacity=max(1024, len(history)))
+    compact.extend(history[:])
+    return compact
+
+def _take(history, rows):
+    return CompactHistory.from_arrays(
+        history.timestamps[rows], history.players[rows],
+        history.computers[rows], history.results[rows]
+    )
+
+def replay_session(history, won, session, positions):
+    # Replay the rounds at `positions` of a CompactHistory, in order, as the
+    # session starting at session['first_round']; won[i] is 1 if stored
+    # round i was a win
+    first = session['first_round']
+    warm_start = max(0, first - RPSGame.WARM_UP_GAMES)
+    game = RPSGame(storage=MemoryStorage(_take(history, slice(warm_start, first))),
+                   strategy=session['strategy'], seed=session['seed'])
+    before = history_stats(game.storage.history)
+    game._generate_trend_from_history()
+
+    players = history.players[positions]
+    computers = history.computers[positions]
+    results = history.results[positions]
+
+    mismatch = None
+    start = time.perf_counter()
+    for i in range(len(positions)):
+        computer_choice, result = game.play(MOVES[players[i]])
+        if computer_choice != MOVES[computers[i]] or result != RESULTS[results[i]]:
+            mismatch = int(positions[i])
+            break
+    elapsed = time.perf_counter() - start
+    played = i if mismatch is not None else len(positions)
+
+    # Stats and trend of the replayed rounds against the stored ones
+    expected = history_stats(_take(history, positions[:played]))
+    replayed = game._stats_row()
+    stats_match = all(replayed[key] - before[key] == expected[key] for key in expected)
+
+    replayed_won = np.diff(game.trend.cumulative_wins, prepend=0)[first - warm_start:]
+    trend_match = bool(np.array_equal(replayed_won, won[positions[:played]]))
+
+    return {
+        **session,
+        'rounds': len(positions),
+        'last_round': int(positions[-1]),
+        'replayed': played,
+        'mismatch': mismatch,
+        'stats_match': stats_match,
+        'trend_match': trend_match,
+        'ok': mismatch is None and stats_match and trend_match,
+        'rounds_per_second': played / elapsed if elapsed > 0 else 0.0
+    }
+
+def round_instances(storage, length, offset=0):
+    # Instance of each of the `length` rounds from round `offset` on, from
+    # the storage's run records (None for unshared rounds)
+    runs = getattr(storage, 'runs', None)
+    runs = sorted(runs() if runs is not None else [], key=lambda run: run['first_round'])
+    starts = np.array([run['first_round'] - offset for run in runs], dtype=np.int64)
+    owners = np.array([None] + [run['instance'] for run in runs], dtype=object)
+    return owners[np.searchsorted(starts, np.arange(length), side='right')]
+
+def replay_storage(storage, history):
+    # Replay every recorded session of a storage backend, given the history
+    # its load() returned. If a retention policy has archived the oldest
+    # rounds, the history starts at round `offset`, and sessions that
+    # started (or warmed up) on archived rounds are skipped.
+    history = compact_history(history)
+    archived = getattr(storage, 'archived', None)
+    archive = archived() if archived is not None else None
+    offset = archive.rounds if archive is not None else 0
+    won = np.diff(storage.cumulative_wins(), prepend=0)[offset:]
+    instances = round_instances(storage, len(history), offset)
+    sessions = sorted(storage.sessions(), key=lambda session: session['first_round'])
+
+    reports = []
+    for i, session in enumerate(sessions):
+        instance = session.get('instance')
+        first = session['first_round'] - offset
+        end = next((later['first_round'] - offset for later in sessions[i + 1:]
+                    if later.get('instance') == instance), len(history))
+        if first < (RPSGame.WARM_UP_GAMES if offset else 0):
+            continue
+        positions = first + np.flatnonzero(instances[first:end] == instance)
+        if not len(positions):
+            continue
+        report = replay_session(history, won, {**session, 'first_round': first}, positions)
+        report['first_round'] = session['first_round']
+        report['last_round'] += offset
+        if report['mismatch'] is not None:
+            report['mismatch'] += offset
+        reports.append(report)
+    return reports
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay recorded RPS sessions and verify them')
+    parser.add_argument('excel_path', nargs='?',
+                        default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'game_history.xlsx'))
+    args = parser.parse_args()
+
+    storage = ExcelStorage(args.excel_path, journal=True)
+    history, _ = storage.load()
+    reports = replay_storage(storage, history)
+    if not reports:
+        print("No recorded sessions to replay")
+        return
+
+    failed = 0
+    for report in reports:
+        status = 'ok' if report['ok'] else 'MISMATCH'
+        print(f"rounds {report['first_round']}-{report['last_round']} "
+              f"{report['strategy']} seed={report['seed']}: {status} "
+              f"({report['rounds']} rounds, {report['rounds_per_second']:.0f} rounds/s)")
+        if not report['ok']:
+            failed += 1
+            if report['mismatch'] is not None:
+                print(f"  first divergence at round {report['mismatch']}")
+    if failed:
+        raise SystemExit(1)
+
+if __name__ == '__main__':
+    main()
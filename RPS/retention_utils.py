@@ -0,0 +1,245 @@
+import base64
+import json
+import threading
+import numpy as np
+from history_utils import RESULT_CODES, format_timestamp, now_timestamp, to_timestamp
+from rollup_utils import COUNT_COLUMNS, DAY_MS, MOVE_COLUMNS, RESULT_COLUMNS, bucket_start
+
+# Columns of an archived day. win_bits is the day's per-round win flags,
+# bit-packed and base64-encoded: one bit a round is all the trend needs, so
+# the win-rate series stays exact for rounds whose moves are gone. rolling
+# is the RollingStats state after the row's last round (JSON, with the
+# recent results as a string of digits), which the rolling stats are
+# rebuilt from when there is no usable snapshot.
+ARCHIVE_COLUMNS = ['day', 'first_round', *COUNT_COLUMNS, 'cum_wins', 'win_bits', 'rolling']
+# Rounds per row, which keeps win_bits under Excel's 32767-character cell
+# limit; a busier day takes several rows
+MAX_ROW_ROUNDS = 131072
+
+def _pack_wins(won):
+    return base64.b64encode(np.packbits(won).tobytes()).decode('ascii')
+
+def _unpack_wins(win_bits, games):
+    packed = np.frombuffer(base64.b64decode(win_bits), dtype=np.uint8)
+    return np.unpackbits(packed, count=games).astype(bool)
+
+def _dump_rolling(state):
+    if state is None:
+        return None
+    return json.dumps({**state, 'recent': ''.join(map(str, state['recent']))}, separators=(',', ':'))
+
+def _load_rolling(text):
+    if not text:
+        return None
+    state = json.loads(text)
+    state['recent'] = [int(code) for code in state['recent']]
+    return state
+
+
+class RetentionPolicy:
+    # How much history to keep in full detail: the last `rounds` rounds, or
+    # every round from the last `days` days (today included). With both, a
+    # round is kept if either keeps it.
+    def __init__(self, days=None, rounds=None):
+        if days is None and rounds is None:
+            raise ValueError('a retention policy needs days or rounds')
+        if (days is not None and days < 1) or (rounds is not None and rounds < 0):
+            raise ValueError('retention days must be at least 1 and rounds not negative')
+        self.days = days
+        self.rounds = rounds
+
+    def cutoff(self, timestamps, now=None):
+        # Number of leading rounds to archive. Days are whole days, so an
+        # archived day is never split between the archive and the history.
+        length = len(timestamps)
+        cuts = []
+        if self.rounds is not None:
+            cuts.append(max(0, length - self.rounds))
+        if self.days is not None:
+            now = now_timestamp() if now is None else to_timestamp(now)
+            since = bucket_start(now, 'day') - (self.days - 1) * DAY_MS
+            kept = np.flatnonzero(np.asarray(timestamps) >= since)
+            cuts.append(int(kept[0]) if len(kept) else length)
+        return min(cuts)
+
+
+class DailyArchive:
+    # Rounds a retention policy has taken out of the history, as per-day
+    # aggregate rows in round order. The rows carry everything the lifetime
+    # stats, the trend and the daily and weekly rollups need, so those stay
+    # exact after the detail is gone.
+    def __init__(self, rows=()):
+        self.rows = []
+        for row in rows:
+            row = dict(row)
+            if isinstance(row.get('rolling'), str):
+                row['rolling'] = _load_rolling(row['rolling'])
+            self._add_row(row)
+
+    @property
+    def rounds(self):
+        # Rounds archived so far; the history's first round comes next
+        if not self.rows:
+            return 0
+        return self.rows[-1]['first_round'] + self.rows[-1]['games']
+
+    @property
+    def wins(self):
+        return self.rows[-1]['cum_wins'] if self.rows else 0
+
+    @property
+    def rolling(self):
+        # RollingStats.to_dict() state after the last archived round; None
+        # if nothing is archived or the rows predate it
+        return self.rows[-1].get('rolling') if self.rows else None
+
+    def __len__(self):
+        return len(self.rows)
+
+    def _add_row(self, row):
+        # A day archived in two passes (or split by a chunk) is merged back
+        # into one row while it fits
+        last = self.rows[-1] if self.rows else None
+        if last is not None and last['day'] == row['day'] and last['games'] + row['games'] <= MAX_ROW_ROUNDS:
+            won = np.concatenate([_unpack_wins(last['win_bits'], last['games']),
+                                  _unpack_wins(row['win_bits'], row['games'])])
+            for column in COUNT_COLUMNS:
+                last[column] += row[column]
+            last['cum_wins'] = row['cum_wins']
+            last['win_bits'] = _pack_wins(won)
+            last['rolling'] = row.get('rolling')
+        else:
+            self.rows.append(row)
+
+    def extend(self, rows):
+        for row in rows:
+            if row['first_round'] != self.rounds:
+                raise ValueError(f"archive rows must continue from round {self.rounds}")
+            self._add_row(dict(row))
+
+    def cumulative_wins(self):
+        # Running win count after each archived round
+        if not self.rows:
+            return np.zeros(0, dtype=np.int64)
+        won = np.concatenate([_unpack_wins(row['win_bits'], row['games']) for row in self.rows])
+        return np.cumsum(won, dtype=np.int64)
+
+    def days(self):
+        # (epoch-millisecond start of the day, COUNT_COLUMNS counts) per row
+        for row in self.rows:
+            yield to_timestamp(row['day']), [row[column] for column in COUNT_COLUMNS]
+
+    def to_rows(self):
+        return [[row[column] for column in ARCHIVE_COLUMNS[:-1]] + [_dump_rolling(row.get('rolling'))]
+                for row in self.rows]
+
+
+def archive_rows(timestamps, players, results, first_round=0, wins_before=0):
+    # Aggregate rows for consecutive rounds, one per run of rounds on the
+    # same day (a round recorded out of order starts a new run)
+    days = np.asarray(timestamps, dtype=np.int64) // DAY_MS
+    players = np.asarray(players, dtype=np.int64)
+    results = np.asarray(results, dtype=np.int64)
+    if not len(days):
+        return []
+
+    starts = np.flatnonzero(np.diff(days)) + 1
+    starts = np.concatenate([[0], starts])
+    ends = np.append(starts[1:], len(days))
+    # Split runs longer than a row holds
+    starts = np.concatenate([np.arange(start, end, MAX_ROW_ROUNDS) for start, end in zip(starts, ends)])
+    ends = np.append(starts[1:], len(days))
+
+    counts = np.zeros((len(days), len(COUNT_COLUMNS)), dtype=np.int64)
+    counts[:, 0] = 1
+    rows = np.arange(len(days))
+    counts[rows, np.asarray(RESULT_COLUMNS)[results]] = 1
+    counts[rows, np.asarray(MOVE_COLUMNS)[players]] = 1
+    totals = np.add.reduceat(counts, starts, axis=0)
+
+    won = results == RESULT_CODES['wins']
+    cum_wins = wins_before + np.cumsum(won, dtype=np.int64)
+    return [
+        {
+            'day': format_timestamp(int(days[start]) * DAY_MS)[:10],
+            'first_round': first_round + int(start),
+            **{column: int(value) for column, value in zip(COUNT_COLUMNS, total)},
+            'cum_wins': int(cum_wins[end - 1]),
+            'win_bits': _pack_wins(won[start:end])
+        }
+        for start, end, total in zip(starts, ends, totals)
+    ]
+
+
+class RetentionJob:
+    # Builds the archive rows for the first `cut` rounds of a CompactHistory
+    # on a worker thread, a chunk at a time, reporting progress as
+    # progress(done, total) from that thread. The history is append-only
+    # until the job is applied, so its first rounds can be read while play
+    # goes on. RPSGame.finish_compaction() applies a finished job.
+    #
+    # `rolling` is a RollingStats at the state after the rounds archived
+    # before, which the job carries on over the rounds it archives to give
+    # each row its state; without one, the rows have none.
+    #
+    # state is 'archiving', then 'ready' (or 'failed'), then 'applied'.
+    def __init__(self, history, cut, first_round=0, wins_before=0, progress=None, chunk_size=MAX_ROW_ROUNDS,
+                 rolling=None):
+        self.cut = cut
+        self.first_round = first_round
+        self.wins_before = wins_before
+        self.progress = progress
+        self.chunk_size = chunk_size
+        self.rolling = rolling
+        # Views of the archived rounds, taken now so the history can grow
+        self.columns = (history.timestamps[:cut], history.players[:cut], history.results[:cut])
+        self.done = 0
+        self.rows = []
+        self.state = 'archiving'
+        self.error = None
+        self.thread = threading.Thread(target=self._run, name='rps-retention', daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def _run(self):
+        try:
+            archive = DailyArchive()
+            wins = self.wins_before
+            for start in range(0, self.cut, self.chunk_size):
+                stop = min(start + self.chunk_size, self.cut)
+                rows = archive_rows(*(column[start:stop] for column in self.columns),
+                                    self.first_round + start, wins)
+                for row in rows:
+                    row['rolling'] = self._carry_rolling(row)
+                    archive._add_row(row)
+                wins = archive.wins
+                self.done = stop
+                if self.progress is not None:
+                    self.progress(self.done, self.cut)
+            self.rows = archive.rows
+            self.columns = None
+            self.state = 'ready'
+        except Exception as e:
+            print(f"Error archiving game history: {e}")
+            self.error = e
+            self.state = 'failed'
+
+    def _carry_rolling(self, row):
+        # Rolling stats state after the row's last round
+        if self.rolling is None:
+            return None
+        timestamps, players, results = self.columns
+        start = row['first_round'] - self.first_round
+        stop = start + row['games']
+        self.rolling.extend(players[start:stop], results[start:stop], int(timestamps[stop - 1]))
+        return self.rolling.to_dict()
+
+    def fraction(self):
+        return self.done / self.cut if self.cut else 1.0
+
+    def wait(self, timeout=None):
+        # True once the job has finished archiving (or failed)
+        self.thread.join(timeout)
+        return not self.thread.is_alive()
@@ -0,0 +1,212 @@
+import numpy as np
+from history_utils import MOVES, MOVE_CODES, RESULTS, RESULT_CODES, game_timestamp
+from snapshot_utils import covers_prefix
+
+# Last-N windows tracked by default
+DEFAULT_WINDOWS = (10, 50, 100)
+
+class RollingStats:
+    # Statistics beyond the lifetime totals, each kept up to date in O(1) per
+    # round: result counts over the last N rounds for every window, the
+    # current and longest streak of each result, and results per player
+    # move. The last max(windows) results sit in a ring buffer so the oldest
+    # round can be taken out of each window as a new one comes in.
+    #
+    # RPSGame snapshots it next to the history; at startup it is caught up
+    # with the rounds recorded after the snapshot instead of rescanning.
+    def __init__(self, windows=DEFAULT_WINDOWS):
+        self.windows = tuple(sorted(set(windows)))
+        self.size = self.windows[-1]
+        self.recent = bytearray(self.size)
+        self.games = 0
+        self.window_counts = {window: [0] * len(RESULTS) for window in self.windows}
+        self.streak_result = None
+        self.streak = 0
+        self.longest = [0] * len(RESULTS)
+        self.move_results = [[0] * len(RESULTS) for _ in MOVES]
+        self.last_timestamp = None
+
+    def update(self, player_code, result_code):
+        games = self.games
+        for window, counts in self.window_counts.items():
+            counts[result_code] += 1
+            if games >= window:
+                counts[self.recent[(games - window) % self.size]] -= 1
+        self.recent[games % self.size] = result_code
+        self.games = games + 1
+
+        if result_code == self.streak_result:
+            self.streak += 1
+        else:
+            self.streak_result = result_code
+            self.streak = 1
+        if self.streak > self.longest[result_code]:
+            self.longest[result_code] = self.streak
+
+        self.move_results[player_code][result_code] += 1
+
+    def add_game(self, game):
+        self.update(MOVE_CODES[game['player'].lower()], RESULT_CODES[game['result']])
+        self.last_timestamp = game_timestamp(game)
+
+    def extend(self, players, results, last_timestamp=None):
+        # Apply whole columns of rounds in a few NumPy passes, ending in the
+        # same state as update() round by round
+        players = np.asarray(players, dtype=np.int64)
+        results = np.asarray(results, dtype=np.int64)
+        n = len(results)
+        if n == 0:
+            return self
+        tail = np.concatenate([np.asarray(self._recent_results(), dtype=np.int64), results])
+        self._fill_recent(tail[-self.size:], self.games + n)
+
+        # Runs of equal results give both the current and the longest
+        # streaks; the first run carries on the current streak
+        starts = np.concatenate([[0], np.flatnonzero(np.diff(results)) + 1])
+        lengths = np.diff(np.append(starts, n))
+        values = results[starts]
+        if values[0] == self.streak_result:
+            lengths[0] += self.streak
+        self.streak_result = int(values[-1])
+        self.streak = int(lengths[-1])
+        for code in range(len(RESULTS)):
+            runs = lengths[values == code]
+            if len(runs):
+                self.longest[code] = max(self.longest[code], int(runs.max()))
+
+        counts = np.bincount(players * len(RESULTS) + results, minlength=len(MOVES) * len(RESULTS))
+        self.move_results = (np.asarray(self.move_results) + counts.reshape(len(MOVES), len(RESULTS))).tolist()
+        if last_timestamp is not None:
+            self.last_timestamp = last_timestamp
+        return self
+
+    @classmethod
+    def from_arrays(cls, players, results, windows=DEFAULT_WINDOWS, last_timestamp=None):
+        # Build the same state from whole history columns
+        return cls(windows).extend(players, results, last_timestamp)
+
+    def _recent_results(self):
+        # Results in the ring, oldest first
+        count = min(self.games, self.size)
+        return [self.recent[i % self.size] for i in range(self.games - count, self.games)]
+
+    def _fill_recent(self, tail, games):
+        # Ring buffer and window counts from the last len(tail) results of
+        # `games` rounds
+        tail = np.asarray(tail, dtype=np.int64)
+        ring = np.zeros(self.size, dtype=np.uint8)
+        ring[np.arange(games - len(tail), games) % self.size] = tail
+        self.recent = bytearray(ring.tobytes())
+        for window in self.windows:
+            self.window_counts[window] = np.bincount(tail[-window:], minlength=len(RESULTS)).tolist()
+        self.games = games
+
+    @classmethod
+    def from_history(cls, history, windows=DEFAULT_WINDOWS, offset=0, archived=None):
+        # If the history starts at round `offset`, the rounds before it are
+        # archived and `archived` is the state the archive saved after
+        # them (DailyArchive.rolling). Without a usable one the stats only
+        # count the rounds kept.
+        stats = cls(windows)
+        if offset:
+            base = None
+            if archived is not None and archived.get('games') == offset:
+                try:
+                    base = cls.from_dict(archived, windows)
+                except (KeyError, TypeError, ValueError):
+                    base = None
+            if base is None:
+                print("Error rebuilding rolling stats: no saved state for the archived rounds, "
+                      "so they only count the rounds kept")
+            else:
+                stats = base
+
+        last_timestamp = game_timestamp(history[len(history) - 1]) if len(history) else None
+        if hasattr(history, 'results'):
+            return stats.extend(history.players, history.results, last_timestamp)
+        for game in history:
+            stats.add_game(game)
+        return stats
+
+    # Queries
+
+    def window_rates(self, window):
+        # Result percentages over the last `window` rounds (fewer at first)
+        counts = self.window_counts[window]
+        played = min(window, self.games)
+        return {result: (counts[code] * 100 / played if played else 0.0) for code, result in enumerate(RESULTS)}
+
+    def current_streak(self):
+        # (result, length) of the run the latest round belongs to
+        if self.streak_result is None:
+            return None, 0
+        return RESULTS[self.streak_result], self.streak
+
+    def longest_streak(self, result='wins'):
+        return self.longest[RESULT_CODES[result]]
+
+    def move_win_rates(self):
+        # Win percentage per player move; None for moves never played
+        rates = {}
+        for code, move in enumerate(MOVES):
+            played = sum(self.move_results[code])
+            rates[move] = self.move_results[code][RESULT_CODES['wins']] * 100 / played if played else None
+        return rates
+
+    def summary(self):
+        result, length = self.current_streak()
+        return {
+            'windows': {window: self.window_rates(window) for window in self.windows},
+            'current_streak': {'result': result, 'length': length},
+            'longest_streaks': {result: self.longest[code] for code, result in enumerate(RESULTS)},
+            'move_win_rates': self.move_win_rates()
+        }
+
+    # Snapshots
+
+    def to_dict(self):
+        return {
+            'games': self.games,
+            'last_timestamp': self.last_timestamp,
+            'windows': list(self.windows),
+            'recent': self._recent_results(),
+            'streak_result': self.streak_result,
+            'streak': self.streak,
+            'longest': list(self.longest),
+            'move_results': [list(row) for row in self.move_results]
+        }
+
+    @classmethod
+    def from_dict(cls, data, windows=DEFAULT_WINDOWS):
+        stats = cls(windows)
+        recent = data['recent']
+        # A snapshot with shorter windows can't fill the longest window
+        if len(recent) < min(data['games'], stats.size):
+            return None
+
+        stats._fill_recent(recent[-stats.size:], data['games'])
+        stats.streak_result = data['streak_result']
+        stats.streak = data['streak']
+        stats.longest = list(data['longest'])
+        stats.move_results = [list(row) for row in data['move_results']]
+        stats.last_timestamp = data['last_timestamp']
+        return stats
+
+    @classmethod
+    def restore(cls, data, history, windows=DEFAULT_WINDOWS, offset=0, archived=None):
+        # Snapshot dict caught up with the rounds of `history` recorded
+        # after it; rebuilt from the history if the snapshot is unusable.
+        # The history starts at round `offset` if older rounds are archived
+        # (see from_history()).
+        stats = None
+        if data:
+            try:
+                stats = cls.from_dict(data, windows)
+            except (KeyError, TypeError, ValueError) as e:
+                print(f"Error restoring rolling stats, rebuilding them: {e}")
+        if stats is None or not covers_prefix(history, stats.games, stats.last_timestamp, offset):
+            return cls.from_history(history, windows, offset, archived)
+
+        for game in history[stats.games - offset:]:
+            stats.add_game(game)
+        return stats
@@ -0,0 +1,187 @@
+import bisect
+import numpy as np
+import polars as pl
+from history_utils import MOVES, MOVE_CODES, RESULTS, RESULT_CODES, format_timestamp, game_timestamp, to_timestamp
+from snapshot_utils import covers_prefix
+
+# Bucket lengths in milliseconds. Weeks start on Monday; day 0 of the epoch
+# was a Thursday, hence the 3-day offset.
+GRANULARITIES = ('hour', 'day', 'week')
+DAY_MS = 86400 * 1000
+BUCKET_MS = {'hour': 3600 * 1000, 'day': DAY_MS, 'week': 7 * DAY_MS}
+WEEK_OFFSET = 3 * DAY_MS
+# Counters kept per bucket, in the order of the stats row
+COUNT_COLUMNS = ('games', 'wins', 'losses', 'ties', 'rock_count', 'paper_count', 'scissors_count')
+RESULT_COLUMNS = [COUNT_COLUMNS.index(result) for result in RESULTS]
+MOVE_COLUMNS = [COUNT_COLUMNS.index(f'{move}_count') for move in MOVES]
+
+def bucket_start(timestamp, granularity):
+    if granularity == 'week':
+        return timestamp - (timestamp + WEEK_OFFSET) % BUCKET_MS['week']
+    return timestamp - timestamp % BUCKET_MS[granularity]
+
+def _bucket_expr(granularity):
+    timestamp = pl.col('timestamp')
+    if granularity == 'week':
+        return timestamp - (timestamp + WEEK_OFFSET) % BUCKET_MS['week']
+    return timestamp - timestamp % BUCKET_MS[granularity]
+
+
+class Rollups:
+    # Materialized per-hour, per-day and per-week counters of games, results
+    # and player moves. Each round adds to one bucket per granularity, and
+    # the sorted bucket starts are kept alongside, so a report over any
+    # range is a bisect plus the rows it returns.
+    #
+    # Buckets are keyed by the epoch-millisecond start of the period in the
+    # history's own (naive, local) time.
+    def __init__(self):
+        self.buckets = {granularity: {} for granularity in GRANULARITIES}
+        self.starts = {granularity: [] for granularity in GRANULARITIES}
+        self.games = 0
+        self.last_timestamp = None
+
+    def update(self, timestamp, player_code, result_code):
+        result_column = RESULT_COLUMNS[result_code]
+        move_column = MOVE_COLUMNS[player_code]
+        for granularity in GRANULARITIES:
+            start = bucket_start(timestamp, granularity)
+            counts = self.buckets[granularity].get(start)
+            if counts is None:
+                counts = self.buckets[granularity][start] = [0] * len(COUNT_COLUMNS)
+                starts = self.starts[granularity]
+                if not starts or start > starts[-1]:
+                    starts.append(start)
+                else:
+                    bisect.insort(starts, start)
+            counts[0] += 1
+            counts[result_column] += 1
+            counts[move_column] += 1
+        self.games += 1
+
+    def add_game(self, game):
+        timestamp = game_timestamp(game)
+        self.update(timestamp, MOVE_CODES[game['player'].lower()], RESULT_CODES[game['result']])
+        self.last_timestamp = timestamp
+
+    @classmethod
+    def from_frame(cls, history_df, last_timestamp=None):
+        # Rebuild every granularity from a DataFrame of integer timestamp,
+        # player and result codes, as one polars query
+        rollups = cls()
+        counts = [
+            pl.len().alias('games'),
+            *((pl.col('result') == RESULT_CODES[result]).sum().alias(result) for result in ('wins', 'losses', 'ties')),
+            *((pl.col('player') == code).sum().alias(f'{move}_count') for code, move in enumerate(MOVES))
+        ]
+        lazy = history_df.lazy()
+        frames = pl.collect_all([
+            lazy.group_by(_bucket_expr(granularity).alias('start')).agg(counts).sort('start')
+            for granularity in GRANULARITIES
+        ])
+        for granularity, frame in zip(GRANULARITIES, frames):
+            starts = frame['start'].to_list()
+            rows = frame.select(COUNT_COLUMNS).rows()
+            rollups.buckets[granularity] = {start: list(row) for start, row in zip(starts, rows)}
+            rollups.starts[granularity] = starts
+        rollups.games = len(history_df)
+        rollups.last_timestamp = last_timestamp
+        return rollups
+
+    @classmethod
+    def from_history(cls, history):
+        last_timestamp = game_timestamp(history[len(history) - 1]) if len(history) else None
+        if hasattr(history, 'timestamps'):
+            history_df = pl.DataFrame({
+                'timestamp': history.timestamps,
+                'player': history.players,
+                'result': history.results
+            })
+        else:
+            history_df = pl.DataFrame({
+                'timestamp': [game_timestamp(game) for game in history],
+                'player': [MOVE_CODES[game['player'].lower()] for game in history],
+                'result': [RESULT_CODES[game['result']] for game in history]
+            }, schema={'timestamp': pl.Int64, 'player': pl.UInt8, 'result': pl.UInt8})
+        return cls.from_frame(history_df, last_timestamp)
+
+    def add_days(self, days):
+        # Fold in (day start, COUNT_COLUMNS counts) rows of rounds that are
+        # no longer in the history. Their hours are unknown, so only the
+        # day and week rollups get them.
+        for timestamp, day_counts in days:
+            for granularity in ('day', 'week'):
+                start = bucket_start(timestamp, granularity)
+                counts = self.buckets[granularity].get(start)
+                if counts is None:
+                    self.buckets[granularity][start] = list(day_counts)
+                    bisect.insort(self.starts[granularity], start)
+                else:
+                    for i, count in enumerate(day_counts):
+                        counts[i] += count
+            self.games += day_counts[0]
+
+    def report(self, granularity='day', start=None, end=None, limit=None):
+        # Buckets overlapping [start, end) datetimes, oldest first; `limit`
+        # keeps only the most recent ones
+        starts = self.starts[granularity]
+        first = 0 if start is None else bisect.bisect_left(starts, bucket_start(to_timestamp(start), granularity))
+        last = len(starts) if end is None else bisect.bisect_left(starts, to_timestamp(end))
+        if limit is not None:
+            first = max(first, last - limit)
+        buckets = self.buckets[granularity]
+        return [
+            {'start': format_timestamp(bucket), **dict(zip(COUNT_COLUMNS, buckets[bucket]))}
+            for bucket in starts[first:last]
+        ]
+
+    def to_polars(self, granularity='day'):
+        starts = self.starts[granularity]
+        counts = np.array([self.buckets[granularity][start] for start in starts],
+                          dtype=np.int64).reshape(len(starts), len(COUNT_COLUMNS))
+        return pl.DataFrame({
+            'start': pl.from_epoch(pl.Series(starts, dtype=pl.Int64), time_unit='ms'),
+            **{column: counts[:, i] for i, column in enumerate(COUNT_COLUMNS)}
+        })
+
+    # Snapshots
+
+    def to_dict(self):
+        return {
+            'games': self.games,
+            'last_timestamp': self.last_timestamp,
+            **{granularity: [[start, *self.buckets[granularity][start]] for start in self.starts[granularity]]
+               for granularity in GRANULARITIES}
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        rollups = cls()
+        for granularity in GRANULARITIES:
+            rows = data[granularity]
+            rollups.starts[granularity] = [row[0] for row in rows]
+            rollups.buckets[granularity] = {row[0]: list(row[1:]) for row in rows}
+        rollups.games = data['games']
+        rollups.last_timestamp = data['last_timestamp']
+        return rollups
+
+    @classmethod
+    def restore(cls, data, history, archive=None):
+        # Same catch-up rules as RollingStats.restore; a rebuild adds the
+        # archive's daily rows for the rounds before the history
+        offset = archive.rounds if archive is not None else 0
+        rollups = None
+        if data:
+            try:
+                rollups = cls.from_dict(data)
+            except (KeyError, TypeError, ValueError) as e:
+                print(f"Error restoring rollups, rebuilding them: {e}")
+        if rollups is None or not covers_prefix(history, rollups.games, rollups.last_timestamp, offset):
+            rollups = cls.from_history(history)
+            if offset:
+                rollups.add_days(archive.days())
+            return rollups
+
+        for game in history[rollups.games - offset:]:
+            rollups.add_game(game)
+        return rollups
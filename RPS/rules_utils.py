@@ -0,0 +1,92 @@
+import numpy as np
+
+# Result codes for the player, shared by every rule set
+RESULTS = ('ties', 'wins', 'losses')
+RESULT_CODES = {result: code for code, result in enumerate(RESULTS)}
+
+class Rules:
+    # A game as a list of moves and an outcome table: outcomes[player][computer]
+    # is the player's result code. Resolving a round is one table lookup, and
+    # resolve_codes() looks up whole arrays of move codes at once.
+    #
+    # This module only needs NumPy, so the standalone DearPyGui apps can
+    # import it without the rest of the package.
+    def __init__(self, name, moves, outcomes):
+        self.name = name
+        self.moves = tuple(moves)
+        self.codes = {move: code for code, move in enumerate(self.moves)}
+        self.outcomes = np.asarray(outcomes, dtype=np.uint8)
+
+        n = len(self.moves)
+        wins, losses = RESULT_CODES['wins'], RESULT_CODES['losses']
+        if self.outcomes.shape != (n, n):
+            raise ValueError(f"{name}: outcome table must be {n}x{n}")
+        if np.any(np.diag(self.outcomes) != RESULT_CODES['ties']):
+            raise ValueError(f"{name}: a move must tie with itself")
+        if np.any((self.outcomes == wins) != (self.outcomes.T == losses)):
+            raise ValueError(f"{name}: outcome table is not consistent for both players")
+
+        # Nested lists index faster than the array for a single round
+        self._table = self.outcomes.tolist()
+        # counters[m] lists the moves that beat m
+        self.counters = [[c for c in range(n) if self._table[c][m] == wins] for m in range(n)]
+
+    @classmethod
+    def cyclic(cls, name, moves):
+        # Odd-N cyclic game: each move beats the (N - 1) / 2 moves before it,
+        # wrapping around, and loses to the ones after it
+        n = len(moves)
+        if n < 3 or n % 2 == 0:
+            raise ValueError(f"{name}: a cyclic game needs an odd number of moves, at least 3")
+        steps = (np.arange(n)[:, None] - np.arange(n)[None, :]) % n
+        outcomes = np.where(steps == 0, RESULT_CODES['ties'],
+                            np.where(steps <= n // 2, RESULT_CODES['wins'], RESULT_CODES['losses']))
+        return cls(name, moves, outcomes)
+
+    @classmethod
+    def from_beats(cls, name, beats):
+        # Game from {move: moves it beats}; moves keep the dict's order
+        moves = list(beats)
+        codes = {move: code for code, move in enumerate(moves)}
+        outcomes = np.full((len(moves), len(moves)), RESULT_CODES['ties'], dtype=np.uint8)
+        for move, beaten in beats.items():
+            for other in beaten:
+                outcomes[codes[move], codes[other]] = RESULT_CODES['wins']
+                outcomes[codes[other], codes[move]] = RESULT_CODES['losses']
+        return cls(name, moves, outcomes)
+
+    def resolve(self, player_choice, computer_choice):
+        # Result name for one round given move names (any case)
+        return RESULTS[self._table[self.codes[player_choice.lower()]][self.codes[computer_choice.lower()]]]
+
+    def resolve_code(self, player_code, computer_code):
+        return self._table[player_code][computer_code]
+
+    def resolve_codes(self, player_codes, computer_codes):
+        # Result codes for arrays of move codes, in one table lookup
+        return self.outcomes[player_codes, computer_codes]
+
+
+# Classic game: with moves coded rock=0, paper=1, scissors=2 each move beats
+# the one before it, so the result code is (player - computer) % 3
+RPS = Rules.cyclic('rps', ('rock', 'paper', 'scissors'))
+
+# Rock-Paper-Scissors-Lizard-Spock; the first three moves keep their codes
+RPSLS = Rules.from_beats('rpsls', {
+    'rock': ('scissors', 'lizard'),
+    'paper': ('rock', 'spock'),
+    'scissors': ('paper', 'lizard'),
+    'lizard': ('paper', 'spock'),
+    'spock': ('rock', 'scissors')
+})
+
+RULES = {rules.name: rules for rules in (RPS, RPSLS)}
+
+# The classic game's table and resolvers, used throughout the package
+OUTCOMES = RPS.outcomes
+
+def resolve_codes(player_codes, computer_codes):
+    return OUTCOMES[player_codes, computer_codes]
+
+def resolve_round(player_choice, computer_choice):
+    return RPS.resolve(player_choice, computer_choice)
@@ -0,0 +1,186 @@
+import argparse
+import asyncio
+import itertools
+import json
+from history_utils import MOVES, MOVE_CODES, now_timestamp
+from rules_utils import resolve_round
+from storage_utils import SQLiteStorage, update_stats
+from strategy_utils import STRATEGIES, make_strategy
+from writer_utils import BackgroundWriter
+
+# Line protocol: one JSON object per line in each direction.
+#
+#   -> {"op": "play", "move": "rock"}
+#   <- {"computer": "paper", "result": "losses", "total_games": 1, "wins": 0, "win_rate": "0.0%"}
+#   -> {"op": "stats"}                  <- the session's counters
+#   -> {"op": "strategy", "name": "markov"}
+#   -> {"op": "quit"}
+#
+# On connect the server sends {"session": <id>, "strategy": <name>}.
+# Errors come back as {"error": "..."} and leave the connection open.
+
+class Session:
+    # Per-connection game state: the same counters RPSGame keeps, plus the
+    # session's own model of the player for the shared strategy
+    def __init__(self, session_id, strategy):
+        self.id = session_id
+        self.strategy = make_strategy(strategy)
+        self.total_games = 0
+        self.wins = 0
+        self.losses = 0
+        self.ties = 0
+        self.move_counts = {move: 0 for move in MOVES}
+
+    def play(self, player_choice):
+        player_choice = player_choice.lower()
+        computer_code = self.strategy.next_move()
+        computer_choice = MOVES[computer_code]
+        result = resolve_round(player_choice, computer_choice)
+        self.strategy.update(MOVE_CODES[player_choice], computer_code)
+
+        self.move_counts[player_choice] += 1
+        if result == 'wins':
+            self.wins += 1
+        elif result == 'losses':
+            self.losses += 1
+        else:
+            self.ties += 1
+        self.total_games += 1
+
+        return {
+            'timestamp': now_timestamp(),
+            'player': player_choice,
+            'computer': computer_choice,
+            'result': result
+        }
+
+    def get_stats(self):
+        win_rate = f"{(self.wins / self.total_games * 100):.1f}%" if self.total_games > 0 else "0.0%"
+        return {
+            'total_games': self.total_games,
+            'wins': self.wins,
+            'win_rate': win_rate
+        }
+
+
+class GameServer:
+    # Hosts many concurrent sessions in one asyncio event loop. Every session
+    # plays under the shared rules and strategy; rounds from all sessions go
+    # through one BackgroundWriter, so persistence is batched across sessions
+    # and never blocks the loop on disk. When the writer's queue is full the
+    # round is handed over from an executor thread instead, and later rounds
+    # wait their turn on a lock, so back-pressure only stalls the sessions
+    # that are playing, not the loop.
+    def __init__(self, storage, strategy='frequency', debounce=0.5, max_batch=5000):
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown strategy: {strategy}")
+        self.strategy = strategy
+        self.writer = BackgroundWriter(storage, debounce=debounce, max_batch=max_batch)
+        _, stats = self.writer.load()
+        self.stats = dict(stats)
+        self.sessions = {}
+        self.session_ids = itertools.count(1)
+        self.record_lock = asyncio.Lock()
+        self.server = None
+
+    async def start(self, host='127.0.0.1', port=8765):
+        self.server = await asyncio.start_server(self.handle, host, port)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        # Flush the last batch without blocking the loop
+        await asyncio.get_running_loop().run_in_executor(None, self.writer.close)
+
+    async def record(self, game):
+        # The loop is the only producer, so a queue that isn't full takes
+        # the round without blocking
+        async with self.record_lock:
+            update_stats(self.stats, game)
+            stats = dict(self.stats)
+            if self.writer.queue.full():
+                await asyncio.get_running_loop().run_in_executor(None, self.writer.append, game, stats)
+            else:
+                self.writer.append(game, stats)
+
+    async def dispatch(self, session, message):
+        op = message.get('op')
+        if op == 'play':
+            move = message.get('move')
+            if not isinstance(move, str) or move.lower() not in MOVE_CODES:
+                return {'error': f"Invalid move: {move}"}
+            game = session.play(move)
+            await self.record(game)
+            return {'computer': game['computer'], 'result': game['result'], **session.get_stats()}
+        if op == 'stats':
+            return {
+                **session.get_stats(),
+                'losses': session.losses,
+                'ties': session.ties,
+                'moves': session.move_counts
+            }
+        if op == 'strategy':
+            name = message.get('name')
+            if not isinstance(name, str) or name not in STRATEGIES:
+                return {'error': f"Unknown strategy: {name}"}
+            session.strategy = make_strategy(name)
+            return {'strategy': name}
+        return {'error': f"Unknown op: {op}"}
+
+    async def handle(self, reader, writer):
+        session = Session(next(self.session_ids), self.strategy)
+        self.sessions[session.id] = session
+        writer.write(json.dumps({'session': session.id, 'strategy': self.strategy}).encode() + b'\n')
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    message = json.loads(line)
+                except ValueError:
+                    reply = {'error': 'Invalid JSON'}
+                else:
+                    if not isinstance(message, dict):
+                        reply = {'error': 'expected a JSON object'}
+                    elif message.get('op') == 'quit':
+                        break
+                    else:
+                        reply = await self.dispatch(session, message)
+                writer.write(json.dumps(reply).encode() + b'\n')
+                # Only wait for the socket when its buffer backs up, so
+                # pipelined requests are answered in one go
+                if writer.transport.get_write_buffer_size() > 65536:
+                    await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            del self.sessions[session.id]
+            writer.close()
+
+
+async def serve(db_path, host, port, strategy):
+    server = GameServer(SQLiteStorage(db_path), strategy=strategy)
+    port = await server.start(host, port)
+    print(f"Serving RPS on {host}:{port} ({strategy} strategy, history in {db_path})")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.close()
+
+def main():
+    parser = argparse.ArgumentParser(description='Multi-session RPS game server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--db', default='server_history.db', help='SQLite history file')
+    parser.add_argument('--strategy', default='frequency', choices=list(STRATEGIES))
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.db, args.host, args.port, args.strategy))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
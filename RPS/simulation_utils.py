@@ -0,0 +1,63 @@
+import numpy as np
+from history_utils import MOVES, MOVE_CODES, RESULTS, RESULT_CODES
+from rules_utils import resolve_codes
+from trend_utils import WinRateTrend
+
+def strategy_moves(strategy, n, rng, offset=0):
+    # Generate n move codes for a strategy:
+    #   'random'                   uniform over the three moves
+    #   'rock' / 'paper' / ...     always the same move
+    #   'cycle'                    rock, paper, scissors, rock, ...
+    #   [p_rock, p_paper, p_scis]  weighted random
+    #   callable(n, rng, offset)   returns an array of n move codes
+    # offset is the index of the first round, so chunked runs continue cycles
+    if callable(strategy):
+        return np.asarray(strategy(n, rng, offset), dtype=np.uint8)
+    if isinstance(strategy, str):
+        if strategy == 'random':
+            return rng.integers(0, len(MOVES), n, dtype=np.uint8)
+        if strategy == 'cycle':
+            return ((np.arange(n) + offset) % len(MOVES)).astype(np.uint8)
+        if strategy.lower() in MOVE_CODES:
+            return np.full(n, MOVE_CODES[strategy.lower()], dtype=np.uint8)
+        raise ValueError(f"Unknown strategy: {strategy}")
+    return rng.choice(len(MOVES), size=n, p=np.asarray(strategy, dtype=np.float64)).astype(np.uint8)
+
+def simulate(n, player_strategy='random', computer_strategy='random', seed=None, trend=True, chunk_size=1_000_000):
+    # Play n headless rounds with the same outcome table as RPSGame.play(),
+    # chunk_size rounds at a time, without touching disk. Returns aggregate
+    # counts and, if trend is set, the running win counts and win rates.
+    rng = np.random.default_rng(seed)
+    result_counts = np.zeros(len(RESULTS), dtype=np.int64)
+    player_counts = np.zeros(len(MOVES), dtype=np.int64)
+    computer_counts = np.zeros(len(MOVES), dtype=np.int64)
+    cumulative_chunks = []
+    wins_so_far = 0
+
+    for offset in range(0, n, chunk_size):
+        size = min(chunk_size, n - offset)
+        players = strategy_moves(player_strategy, size, rng, offset)
+        computers = strategy_moves(computer_strategy, size, rng, offset)
+        results = resolve_codes(players, computers)
+
+        result_counts += np.bincount(results, minlength=len(RESULTS))
+        player_counts += np.bincount(players, minlength=len(MOVES))
+        computer_counts += np.bincount(computers, minlength=len(MOVES))
+
+        if trend:
+            cumulative = wins_so_far + np.cumsum(results == RESULT_CODES['wins'], dtype=np.int64)
+            cumulative_chunks.append(cumulative)
+            wins_so_far = int(cumulative[-1])
+
+    summary = {
+        'total_games': n,
+        **{result: int(result_counts[code]) for code, result in enumerate(RESULTS)},
+        'player_moves': {move: int(player_counts[code]) for code, move in enumerate(MOVES)},
+        'computer_moves': {move: int(computer_counts[code]) for code, move in enumerate(MOVES)},
+        'win_rate': float(result_counts[RESULT_CODES['wins']] * 100 / n) if n else 0.0
+    }
+    if trend:
+        cumulative_wins = np.concatenate(cumulative_chunks) if cumulative_chunks else np.zeros(0, dtype=np.int64)
+        summary['cumulative_wins'] = cumulative_wins
+        summary['win_rates'] = WinRateTrend(cumulative_wins).rates()
+    return summary
@@ -0,0 +1,36 @@
+import json
+import os
+from history_utils import game_timestamp
+
+# Snapshots of state derived from the history (rolling stats, rollups), so
+# startup can catch up from the last snapshot instead of rescanning every
+# round. Each part records how many rounds it covers and the timestamp of
+# the last one, which is enough to tell whether it still matches.
+
+def read_snapshot(path):
+    # Snapshot dict, or {} if there is none or it can't be read
+    if path is None or not os.path.exists(path):
+        return {}
+    try:
+        with open(path, 'r', encoding='utf-8') as snapshot_file:
+            snapshot = json.load(snapshot_file)
+    except (OSError, ValueError) as e:
+        print(f"Error reading stats snapshot, rebuilding it: {e}")
+        return {}
+    return snapshot if isinstance(snapshot, dict) else {}
+
+def write_snapshot(path, snapshot):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as snapshot_file:
+        json.dump(snapshot, snapshot_file)
+    os.replace(tmp_path, path)
+
+def covers_prefix(history, games, last_timestamp, offset=0):
+    # True if a snapshot of `games` rounds ending at last_timestamp describes
+    # the start of this history, which begins at round `offset` once older
+    # rounds are archived. A snapshot taken right at the archive boundary
+    # can't be checked against the history and is trusted.
+    position = games - offset
+    if position <= 0:
+        return position == 0
+    return position <= len(history) and game_timestamp(history[position - 1]) == last_timestamp
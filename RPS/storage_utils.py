@@ -0,0 +1,1013 @@
+import argparse
+import glob
+import json
+import os
+import sqlite3
+import threading
+import uuid
+import numpy as np
+import polars as pl
+from excel_utils import iter_row_chunks, open_workbook, read_first_row, write_workbook
+from history_utils import (CompactHistory, DATETIME_FORMAT, MappedHistory, MOVES, RESULTS, RESULT_CODES,
+                           format_timestamp, game_timestamp, to_timestamp)
+from journal_utils import GameJournal
+from lock_utils import FileLock
+from metrics_utils import EXCEL_SAVE_SECONDS
+from retention_utils import ARCHIVE_COLUMNS, DailyArchive
+
+HISTORY_COLUMNS = ['datetime', 'player', 'computer', 'result']
+# A round as the SQLite and Parquet stores keep it: epoch milliseconds and
+# the move and result strings
+ROUND_COLUMNS = ['timestamp', 'player', 'computer', 'result']
+ROUND_SCHEMA = {'timestamp': pl.Int64, 'player': pl.Utf8, 'computer': pl.Utf8, 'result': pl.Utf8}
+# The workbook keeps the epoch-millisecond timestamp the history is read
+# from next to the datetime string, which is only there for people reading
+# the sheet
+EXCEL_HISTORY_COLUMNS = ['timestamp'] + HISTORY_COLUMNS + ['cum_wins']
+# A session is the run of rounds played from first_round on with one
+# strategy and RNG seed; recording them makes a game replayable
+SESSION_COLUMNS = ['first_round', 'seed', 'strategy']
+# Windows playing a shared history at once interleave their rounds. Each
+# storage instance has an id, stamped on its sessions, and a run record
+# marks the round from which the stored rounds are an instance's, until the
+# next run; rounds before the first run (or in a None run) are from
+# unshared storages. That is every round's instance, run-length encoded.
+RUN_COLUMNS = ['first_round', 'instance']
+EXCEL_SESSION_COLUMNS = SESSION_COLUMNS + ['instance']
+
+def empty_stats():
+    return {
+        'total_games': 0,
+        'wins': 0,
+        'losses': 0,
+        'ties': 0,
+        'rock_count': 0,
+        'paper_count': 0,
+        'scissors_count': 0
+    }
+
+def update_stats(stats, game):
+    # Apply one round to a stats row in place
+    stats['total_games'] += 1
+    stats[game['result']] += 1
+    stats[f"{game['player'].lower()}_count"] += 1
+
+def history_stats(history):
+    # Stats row for a CompactHistory, counted in one pass
+    results = np.bincount(history.results, minlength=len(RESULTS))
+    moves = np.bincount(history.players, minlength=len(MOVES))
+    stats = empty_stats()
+    stats['total_games'] = len(history)
+    for code, result in enumerate(RESULTS):
+        stats[result] = int(results[code])
+    for code, move in enumerate(MOVES):
+        stats[f'{move}_count'] = int(moves[code])
+    return stats
+
+def history_row(game):
+    # A round as the ROUND_COLUMNS the SQLite and Parquet stores keep
+    return {
+        'timestamp': game_timestamp(game),
+        'player': game['player'],
+        'computer': game['computer'],
+        'result': game['result']
+    }
+
+def journal_records(games, stats):
+    # Tag each game with its sequence number, given the stats after the batch
+    first_seq = stats['total_games'] - len(games) + 1
+    return [{'seq': first_seq + i, **game} for i, game in enumerate(games)]
+
+
+class ExcelStorage:
+    # Stores history in game_history.xlsx, either rewriting the file after
+    # every round or, in journal mode, appending rounds to a write-ahead log
+    # that is compacted into the workbook on demand. Rounds a retention
+    # policy has archived are kept as daily rows on an Archive sheet; the
+    # History sheet starts at the first round after them, and the Stats
+    # sheet still counts every round.
+    def __init__(self, excel_path, journal=False):
+        self.excel_path = excel_path
+        self.journal = None
+        if journal:
+            self.journal = GameJournal(os.path.splitext(excel_path)[0] + '.journal')
+        self.history = CompactHistory()
+        self.stored_cumulative_wins = None
+        self.stats = empty_stats()
+        self.session_log = []
+        self.run_log = []
+        self.instance = None
+        self.archive = DailyArchive()
+
+    def load(self):
+        if os.path.exists(self.excel_path):
+            self.load_history_from_excel()
+        else:
+            self.init_excel_file()
+
+        # Recover rounds recorded since the last compaction
+        if self.journal is not None:
+            self.replay_journal()
+
+        return self.history, dict(self.stats)
+
+    def init_excel_file(self):
+        self.history = CompactHistory()
+        self.stored_cumulative_wins = None
+        self.stats = empty_stats()
+        self.session_log = []
+        self.run_log = []
+        self.archive = DailyArchive()
+        self.save_to_excel()
+
+    def load_history_from_excel(self, chunk_size=50000):
+        # Stream both sheets with openpyxl's read-only mode, encoding the
+        # history chunk by chunk so no full DataFrame is ever built
+        workbook = open_workbook(self.excel_path)
+        try:
+            self.history = CompactHistory()
+            cumulative_chunks = []
+            has_cumulative = True
+            for chunk in iter_row_chunks(workbook, 'History', chunk_size):
+                # Workbooks from before timestamps are parsed from the
+                # datetime strings, once; the next save adds the column
+                columns = ['timestamp', 'player', 'computer', 'result'] if 'timestamp' in chunk else HISTORY_COLUMNS
+                self.history.extend_polars(pl.DataFrame({column: chunk[column] for column in columns}))
+                if 'cum_wins' in chunk:
+                    cumulative_chunks.append(np.asarray(chunk['cum_wins'], dtype=np.int64))
+                else:
+                    has_cumulative = False
+            stats_row = read_first_row(workbook, 'Stats')
+
+            # Workbooks from before seeded sessions have no Sessions sheet
+            self.session_log = []
+            if 'Sessions' in workbook.sheetnames:
+                for chunk in iter_row_chunks(workbook, 'Sessions'):
+                    instances = chunk.get('instance', [None] * len(chunk['first_round']))
+                    self.session_log.extend(
+                        {'first_round': int(first), 'seed': int(seed), 'strategy': strategy, 'instance': instance}
+                        for first, seed, strategy, instance in zip(*(chunk[column] for column in SESSION_COLUMNS), instances)
+                    )
+            self.run_log = []
+            if 'Runs' in workbook.sheetnames:
+                for chunk in iter_row_chunks(workbook, 'Runs'):
+                    self.run_log.extend({'first_round': int(first), 'instance': instance}
+                                        for first, instance in zip(*(chunk[column] for column in RUN_COLUMNS)))
+
+            archive_rows = []
+            if 'Archive' in workbook.sheetnames:
+                for chunk in iter_row_chunks(workbook, 'Archive'):
+                    # Rows from before the rolling column have no state
+                    blank = [None] * len(chunk['day'])
+                    archive_rows.extend(dict(zip(ARCHIVE_COLUMNS, row))
+                                        for row in zip(*(chunk.get(column, blank) for column in ARCHIVE_COLUMNS)))
+            self.archive = DailyArchive(archive_rows)
+        finally:
+            workbook.close()
+
+        self.stored_cumulative_wins = None
+        if has_cumulative and cumulative_chunks:
+            self.stored_cumulative_wins = np.concatenate(cumulative_chunks)
+
+        # Load statistics
+        self.stats = empty_stats()
+        if stats_row is not None:
+            for column in self.stats:
+                if stats_row.get(column) is not None:
+                    self.stats[column] = int(stats_row[column])
+
+            # Older files have no losses/ties columns, so count them once here
+            if stats_row.get('ties') is None:
+                counts = np.bincount(self.history.results, minlength=len(RESULTS))
+                self.stats['ties'] = int(counts[RESULT_CODES['ties']])
+                self.stats['losses'] = self.stats['total_games'] - self.stats['wins'] - self.stats['ties']
+
+    def replay_journal(self):
+        for record in self.journal.replay():
+            if 'session' in record:
+                if record['session'] not in self.session_log:
+                    self.session_log.append(record['session'])
+                continue
+            if 'run' in record:
+                self._add_run(record['run'])
+                continue
+            # Rounds already compacted into the Excel file are skipped
+            if record.get('seq', 0) <= self.stats['total_games']:
+                continue
+            game = {k: v for k, v in record.items() if k != 'seq'}
+            self.history.append(game)
+            update_stats(self.stats, game)
+
+    def _history_rows(self, chunk_size=50000):
+        # Decode the history a chunk at a time, keeping the running win
+        # count next to each round so the trend loads without a replay
+        cumulative_wins = self.cumulative_wins()[self.archive.rounds:]
+        for start in range(0, len(self.history), chunk_size):
+            chunk_df = self.history.to_polars(start, start + chunk_size).with_columns(
+                pl.Series('cum_wins', cumulative_wins[start:start + chunk_size])
+            )
+            yield from chunk_df.iter_rows()
+
+    def save_to_excel(self):
+        stats = self.stats
+        stats_row = {
+            **stats,
+            'win_rate': (stats['wins'] / stats['total_games'] * 100) if stats['total_games'] > 0 else 0.0
+        }
+
+        # Stream rows with openpyxl's write-only mode, replacing the old file
+        # only once the new one is complete
+        tmp_path = os.path.splitext(self.excel_path)[0] + '.tmp.xlsx'
+        with EXCEL_SAVE_SECONDS.time():
+            write_workbook(tmp_path, {
+                'History': (EXCEL_HISTORY_COLUMNS, self._history_rows()),
+                'Stats': (list(stats_row), [list(stats_row.values())]),
+                'Sessions': (EXCEL_SESSION_COLUMNS, [[session.get(column) for column in EXCEL_SESSION_COLUMNS]
+                                                     for session in self.session_log]),
+                'Runs': (RUN_COLUMNS, [[run[column] for column in RUN_COLUMNS] for run in self.run_log]),
+                'Archive': (ARCHIVE_COLUMNS, self.archive.to_rows())
+            })
+            os.replace(tmp_path, self.excel_path)
+
+    def append(self, game, stats):
+        self.append_batch([game], stats)
+
+    def append_batch(self, games, stats):
+        run = self._start_run(stats['total_games'] - len(games))
+        self.history.extend(games)
+        self.stats = dict(stats)
+
+        # Append to the journal, or save to Excel once for the whole batch
+        if self.journal is not None:
+            self.journal.append_many(run + journal_records(games, stats))
+        else:
+            self.save_to_excel()
+
+    def _add_run(self, run):
+        if run not in self.run_log:
+            self.run_log.append(dict(run))
+
+    def _start_run(self, first_round):
+        # Run record to store ahead of rounds from first_round on, if the
+        # rounds stored last were another instance's
+        last = self.run_log[-1]['instance'] if self.run_log else None
+        if last == self.instance:
+            return []
+        run = {'first_round': first_round, 'instance': self.instance}
+        self._add_run(run)
+        return [{'run': run}]
+
+    def add_session(self, session):
+        session = {**session, 'instance': self.instance}
+        self.session_log.append(session)
+        if self.journal is not None:
+            self.journal.append({'session': dict(session)})
+        else:
+            self.save_to_excel()
+
+    def sessions(self):
+        return list(self.session_log)
+
+    def runs(self):
+        return list(self.run_log)
+
+    def archived(self):
+        return self.archive
+
+    def _archive_rounds(self, cut, rows):
+        # Move the first `cut` rounds of the history into the archive as
+        # `rows`, built by a RetentionJob from those same rounds
+        cumulative_wins = self.cumulative_wins()
+        self.archive.extend(rows)
+        self.history.drop_front(cut)
+        # Stored running counts are lifetime counts, so they carry over
+        self.stored_cumulative_wins = cumulative_wins[self.archive.rounds:]
+
+    def apply_retention(self, cut, rows):
+        # Returns False if the rows don't follow on from the archive (a
+        # job started before another one was applied)
+        if rows and rows[0]['first_round'] != self.archive.rounds:
+            print("Error applying retention: the history was archived since the job started")
+            return False
+        self._archive_rounds(cut, rows)
+        self.compact()
+        return True
+
+    def compact(self):
+        # Fold journaled rounds into the Excel file and start a fresh log
+        self.save_to_excel()
+        if self.journal is not None:
+            self.journal.truncate()
+
+    def close(self):
+        if self.journal is not None:
+            self.compact()
+            self.journal.close()
+
+    def cumulative_wins(self):
+        # Use the column loaded from the workbook, extended over rounds
+        # recorded since; older workbooks without it are summed once.
+        # Archived rounds come first, from their win flags.
+        stored = self.stored_cumulative_wins
+        if stored is None:
+            stored = np.zeros(0, dtype=np.int64)
+        won = self.history.results[len(stored):] == RESULT_CODES['wins']
+        base = stored[-1] if len(stored) else self.archive.wins
+        return np.concatenate([self.archive.cumulative_wins(), stored, base + np.cumsum(won, dtype=np.int64)])
+
+    def count_results(self, start=None, end=None):
+        if start is None and end is None:
+            return {k: self.stats[k] for k in ('wins', 'losses', 'ties')}
+
+        mask = self.history.window_mask(start, end)
+        counts = np.bincount(self.history.results[mask], minlength=len(RESULTS))
+        return {result: int(counts[code]) for code, result in enumerate(RESULTS)}
+
+    def count_moves(self, start=None, end=None):
+        if start is None and end is None:
+            return {move: self.stats[f'{move}_count'] for move in ('rock', 'paper', 'scissors')}
+
+        mask = self.history.window_mask(start, end)
+        counts = np.bincount(self.history.players[mask], minlength=len(MOVES))
+        return {move: int(counts[code]) for code, move in enumerate(MOVES)}
+
+    def recent(self, n):
+        return self.history[-n:] if n > 0 else []
+
+
+def migrate_excel(excel_path):
+    # Rewrite a workbook from before epoch timestamps with the timestamp
+    # column, folding in its journal. Returns False if there was nothing to do.
+    workbook = open_workbook(excel_path)
+    try:
+        first = read_first_row(workbook, 'History')
+    finally:
+        workbook.close()
+    if first is None or 'timestamp' in first:
+        return False
+    storage = ExcelStorage(excel_path, journal=True)
+    storage.load()
+    storage.close()
+    return True
+
+def main():
+    parser = argparse.ArgumentParser(description='Migrate an RPS workbook from before epoch timestamps in place')
+    parser.add_argument('excel_path', nargs='?',
+                        default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'game_history.xlsx'))
+    args = parser.parse_args()
+
+    if migrate_excel(args.excel_path):
+        print(f"Migrated {args.excel_path} to epoch timestamps")
+    else:
+        print(f"{args.excel_path} is already up to date")
+
+
+class SharedExcelStorage(ExcelStorage):
+    # Journal-mode ExcelStorage that several processes can use at once.
+    #
+    # Every instance appends its rounds to the same journal under an
+    # exclusive file lock and tails the journal from the byte offset it has
+    # read up to, so rounds from other instances are merged into its history
+    # and stats one record at a time instead of reloading the workbook.
+    # Sequence numbers are assigned under the lock, so all instances agree on
+    # the order of rounds.
+    #
+    # The workbook is only rewritten on compact() by the last instance still
+    # open (each one holds a shared lock on a presence file while it runs).
+    # A compaction starts the journal with a new generation header; an
+    # instance that finds the generation changed under it (a crash, or
+    # platforms without shared locks) catches up from the workbook instead.
+    def __init__(self, excel_path):
+        super().__init__(excel_path, journal=True)
+        base = os.path.splitext(excel_path)[0]
+        self.file_lock = FileLock(base + '.lock')
+        self.presence = FileLock(base + '.instances')
+        # Serializes the writer thread and UI-thread syncs in this process
+        self.mutex = threading.RLock()
+        self.offset = 0
+        self.generation = None
+        self.foreign = []
+        self.instance = uuid.uuid4().hex
+
+    def load(self):
+        self.presence.acquire(shared=True, blocking=False)
+        with self.mutex, self.file_lock:
+            self._reload()
+        self.foreign = []
+        return self.history, dict(self.stats)
+
+    def _reload(self):
+        # Catch up from the workbook, keeping the history object (and the
+        # rounds it already has) so views of it stay valid
+        current = self.history if len(self.history) else None
+        if os.path.exists(self.excel_path):
+            self.load_history_from_excel()
+        else:
+            self.init_excel_file()
+        if current is not None:
+            current.extend_from(self.history, len(current))
+            self.history = current
+        self.offset = 0
+        self.generation = None
+        self._tail()
+
+    def _read_generation(self):
+        with open(self.journal.path, 'rb') as journal_file:
+            first = journal_file.readline()
+        try:
+            return json.loads(first).get('generation')
+        except ValueError:
+            return None
+
+    def _tail(self):
+        # Merge records appended since self.offset; rounds this instance
+        # doesn't have yet are queued in self.foreign for sync()
+        path = self.journal.path
+        if not os.path.exists(path):
+            return
+        size = os.path.getsize(path)
+        if self.offset and (size < self.offset or self._read_generation() != self.generation):
+            known, queued = len(self.history), len(self.foreign)
+            self._reload()
+            del self.foreign[queued:]
+            self.foreign.extend(dict(game) for game in self.history[known:])
+            return
+
+        with open(path, 'rb') as journal_file:
+            journal_file.seek(self.offset)
+            data = journal_file.read()
+        # Only whole lines; a record still being written is read next time
+        data = data[:data.rfind(b'\n') + 1]
+        self.offset += len(data)
+
+        for line in data.splitlines():
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if 'generation' in record:
+                self.generation = record['generation']
+            elif 'session' in record:
+                if record['session'] not in self.session_log:
+                    self.session_log.append(record['session'])
+            elif 'run' in record:
+                self._add_run(record['run'])
+            elif record.get('seq', 0) > self.stats['total_games']:
+                game = {k: v for k, v in record.items() if k != 'seq'}
+                self.history.append(game)
+                update_stats(self.stats, game)
+                self.foreign.append(game)
+
+    def _append_records(self, records):
+        # Called with the file lock held and the journal tailed to its end
+        self.journal.append_many(records)
+        self.offset = os.path.getsize(self.journal.path)
+
+    def append_batch(self, games, stats):
+        # The merged stats are authoritative; the caller's row only counts
+        # this instance's rounds
+        with self.mutex, self.file_lock:
+            self._tail()
+            run = self._start_run(self.stats['total_games'])
+            self.history.extend(games)
+            for game in games:
+                update_stats(self.stats, game)
+            self._append_records(run + journal_records(games, self.stats))
+
+    def add_session(self, session):
+        session = {**session, 'instance': self.instance}
+        with self.mutex, self.file_lock:
+            self._tail()
+            if session not in self.session_log:
+                self.session_log.append(session)
+            self._append_records([{'session': dict(session)}])
+
+    def sync(self):
+        # Rounds other instances recorded since the last sync()
+        with self.mutex:
+            self.file_lock.acquire(shared=True)
+            try:
+                self._tail()
+            finally:
+                self.file_lock.release()
+            foreign, self.foreign = self.foreign, []
+        return foreign
+
+    def _alone(self):
+        # True if no other instance holds the presence lock
+        self.presence.release()
+        alone = self.presence.acquire(blocking=False)
+        if alone:
+            self.presence.release()
+        self.presence.acquire(shared=True, blocking=False)
+        return alone
+
+    def _rewrite(self):
+        # Called with the file lock held and no other instance open
+        self.save_to_excel()
+        self.journal.truncate()
+        self.generation = uuid.uuid4().hex
+        self._append_records([{'generation': self.generation}])
+
+    def compact(self):
+        with self.mutex, self.file_lock:
+            self._tail()
+            if not self._alone():
+                return
+            self._rewrite()
+
+    def apply_retention(self, cut, rows):
+        # Other instances index the same rounds, so rounds are only archived
+        # by the last one open; until then this returns False
+        with self.mutex, self.file_lock:
+            self._tail()
+            if not self._alone():
+                return False
+            if rows and rows[0]['first_round'] != self.archive.rounds:
+                print("Error applying retention: the history was archived since the job started")
+                return False
+            self._archive_rounds(cut, rows)
+            self._rewrite()
+        return True
+
+    def close(self):
+        self.compact()
+        self.journal.close()
+        self.presence.release()
+
+
+class MemoryStorage(ExcelStorage):
+    # ExcelStorage's in-memory side without the workbook, for headless runs
+    # such as replays and simulations; nothing is written anywhere
+    def __init__(self, history=None):
+        super().__init__(excel_path=None)
+        if history is not None:
+            self.history = history
+            self.stats = history_stats(history)
+
+    def load(self):
+        return self.history, dict(self.stats)
+
+    def append_batch(self, games, stats):
+        self.history.extend(games)
+        self.stats = dict(stats)
+
+    def add_session(self, session):
+        self.session_log.append(dict(session))
+
+    def compact(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class MmapStorage(ExcelStorage):
+    # Stores history in a fixed-width binary file (game_history.rpsh) that
+    # is memory-mapped instead of read. load() only maps the file and reads
+    # the header, so startup costs the same for any history length, and
+    # only the pages the UI touches (the last few rounds, say) come off disk.
+    # Rounds are written into the mapping and published by updating the
+    # header after them. Sessions and runs are kept in a small side log.
+    #
+    # excel_path is a workbook to import when the file doesn't exist yet;
+    # save_to_excel() exports back to it.
+    def __init__(self, history_path, excel_path=None):
+        super().__init__(excel_path)
+        self.history_path = history_path
+        self.session_journal = GameJournal(os.path.splitext(history_path)[0] + '.sessions')
+
+    def load(self):
+        new = not os.path.exists(self.history_path)
+        self.history = MappedHistory(self.history_path)
+        if new and self.excel_path is not None and os.path.exists(self.excel_path):
+            self._import_excel()
+        self.stats = dict(zip(empty_stats(), self.history.stats))
+        records = list(self.session_journal.replay())
+        self.session_log = [record for record in records if 'run' not in record]
+        self.run_log = [record['run'] for record in records if 'run' in record]
+        return self.history, dict(self.stats)
+
+    def _import_excel(self):
+        source = ExcelStorage(self.excel_path, journal=True)
+        history, stats = source.load()
+        source.journal.close()
+        self.history.extend_from(history)
+        self.history.commit(list(stats.values()))
+        self.history.flush()
+        self.session_journal.append_many(source.sessions() + [{'run': run} for run in source.runs()])
+
+    def append_batch(self, games, stats):
+        run = self._start_run(stats['total_games'] - len(games))
+        if run:
+            self.session_journal.append_many(run)
+        self.history.extend(games)
+        self.stats = dict(stats)
+        self.history.commit([stats[key] for key in empty_stats()])
+
+    def add_session(self, session):
+        session = {**session, 'instance': self.instance}
+        self.session_log.append(session)
+        self.session_journal.append(dict(session))
+
+    def compact(self):
+        # Nothing to fold; just push the mapped pages to disk
+        self.history.flush()
+
+    def close(self):
+        self.compact()
+        self.session_journal.close()
+
+    def cumulative_wins(self):
+        return np.array(self.history.cumulative_wins)
+
+    def archived(self):
+        # The mapped file can't drop rounds from its front, so there is no
+        # archive and no retention
+        return None
+
+
+class SQLiteHistory:
+    # Read-only sequence view over the games table, so callers can use
+    # len(), indexing, slicing and reversed() without loading every row.
+    # Rows are append-only, so the rowid of position i is i + 1.
+    def __init__(self, storage, length, chunk_size=10000):
+        self.storage = storage
+        self.length = length
+        self.chunk_size = chunk_size
+
+    def _rows(self, first, last):
+        rows = self.storage.query(
+            'SELECT timestamp, player, computer, result FROM games '
+            'WHERE id > ? AND id <= ? ORDER BY id',
+            (first, last)
+        )
+        return [dict(zip(ROUND_COLUMNS, row)) for row in rows]
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self.length)
+            if step != 1:
+                return [self[i] for i in range(start, stop, step)]
+            return self._rows(start, max(start, stop))
+
+        if index < 0:
+            index += self.length
+        if not 0 <= index < self.length:
+            raise IndexError('game history index out of range')
+        return self._rows(index, index + 1)[0]
+
+    def __iter__(self):
+        for start in range(0, self.length, self.chunk_size):
+            yield from self._rows(start, min(start + self.chunk_size, self.length))
+
+    def __reversed__(self):
+        for stop in range(self.length, 0, -self.chunk_size):
+            yield from reversed(self._rows(max(0, stop - self.chunk_size), stop))
+
+
+class SQLiteStorage:
+    # Stores every round as a row in an indexed games table, with a single
+    # stats row updated in the same transaction. The connection may be
+    # shared with a background writer, so every statement runs under a lock.
+    GAMES_TABLE = (
+        'CREATE TABLE IF NOT EXISTS {name} ('
+        'id INTEGER PRIMARY KEY, timestamp INTEGER NOT NULL, player TEXT NOT NULL, '
+        'computer TEXT NOT NULL, result TEXT NOT NULL, cum_wins INTEGER NOT NULL)'
+    )
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        with self.conn:
+            self.conn.execute(self.GAMES_TABLE.format(name='games'))
+            self._migrate_datetime()
+            self.conn.execute('CREATE INDEX IF NOT EXISTS games_timestamp ON games (timestamp)')
+            self.conn.execute('CREATE INDEX IF NOT EXISTS games_result ON games (result, timestamp)')
+
+            columns = ', '.join(f'{column} INTEGER NOT NULL DEFAULT 0' for column in empty_stats())
+            self.conn.execute(f'CREATE TABLE IF NOT EXISTS stats (id INTEGER PRIMARY KEY CHECK (id = 1), {columns})')
+            self.conn.execute('INSERT OR IGNORE INTO stats (id) VALUES (1)')
+            self.conn.execute(
+                'CREATE TABLE IF NOT EXISTS sessions ('
+                'first_round INTEGER NOT NULL, seed INTEGER NOT NULL, strategy TEXT NOT NULL)'
+            )
+        self.history = None
+
+    def _migrate_datetime(self):
+        # Databases from before epoch timestamps keep a datetime string per
+        # round; the table is rebuilt with the timestamp in its place
+        columns = [row[1] for row in self.conn.execute('PRAGMA table_info(games)')]
+        if 'datetime' not in columns:
+            return
+        self.conn.execute(self.GAMES_TABLE.format(name='games_migrated'))
+        self.conn.execute(
+            'INSERT INTO games_migrated (id, timestamp, player, computer, result, cum_wins) '
+            "SELECT id, CAST(strftime('%s', datetime) AS INTEGER) * 1000, player, computer, result, cum_wins "
+            'FROM games ORDER BY id'
+        )
+        self.conn.execute('DROP TABLE games')
+        self.conn.execute('ALTER TABLE games_migrated RENAME TO games')
+
+    def query(self, sql, params=()):
+        with self.lock:
+            return self.conn.execute(sql, params).fetchall()
+
+    def _read_stats(self):
+        columns = list(empty_stats())
+        row = self.query(f"SELECT {', '.join(columns)} FROM stats WHERE id = 1")[0]
+        return dict(zip(columns, row))
+
+    def load(self):
+        stats = self._read_stats()
+        self.history = SQLiteHistory(self, stats['total_games'])
+        return self.history, stats
+
+    def append(self, game, stats):
+        self.append_batch([game], stats)
+
+    def append_batch(self, games, stats):
+        assignments = ', '.join(f'{column} = ?' for column in stats)
+
+        # Running win count for each round, working forward from the count
+        # before this batch
+        cum_wins = stats['wins'] - sum(1 for game in games if game['result'] == 'wins')
+        rows = []
+        for game in games:
+            cum_wins += game['result'] == 'wins'
+            rows.append(tuple(history_row(game).values()) + (cum_wins,))
+
+        with self.lock, self.conn:
+            self.conn.executemany(
+                'INSERT INTO games (timestamp, player, computer, result, cum_wins) VALUES (?, ?, ?, ?, ?)',
+                rows
+            )
+            self.conn.execute(f'UPDATE stats SET {assignments} WHERE id = 1', tuple(stats.values()))
+        self.history.length = stats['total_games']
+
+    def add_session(self, session):
+        with self.lock, self.conn:
+            self.conn.execute(
+                'INSERT INTO sessions (first_round, seed, strategy) VALUES (?, ?, ?)',
+                tuple(session[column] for column in SESSION_COLUMNS)
+            )
+
+    def sessions(self):
+        rows = self.query(f"SELECT {', '.join(SESSION_COLUMNS)} FROM sessions ORDER BY rowid")
+        return [dict(zip(SESSION_COLUMNS, row)) for row in rows]
+
+    def compact(self):
+        # Every round is already committed; fold the WAL into the database
+        self.query('PRAGMA wal_checkpoint(TRUNCATE)')
+
+    def close(self):
+        self.compact()
+        with self.lock:
+            self.conn.close()
+
+    def cumulative_wins(self):
+        rows = self.query('SELECT cum_wins FROM games ORDER BY id')
+        return np.array([row[0] for row in rows], dtype=np.int64)
+
+    def _window(self, start, end):
+        # Bounds may be datetime strings, datetimes or epoch milliseconds
+        conditions, params = [], []
+        if start is not None:
+            conditions.append('timestamp >= ?')
+            params.append(to_timestamp(start))
+        if end is not None:
+            conditions.append('timestamp < ?')
+            params.append(to_timestamp(end))
+        return ' AND '.join(conditions), params
+
+    def count_results(self, start=None, end=None):
+        if start is None and end is None:
+            stats = self._read_stats()
+            return {k: stats[k] for k in ('wins', 'losses', 'ties')}
+
+        where, params = self._window(start, end)
+        counts = {'wins': 0, 'losses': 0, 'ties': 0}
+        counts.update(dict(self.query(f'SELECT result, COUNT(*) FROM games WHERE {where} GROUP BY result', params)))
+        return counts
+
+    def count_moves(self, start=None, end=None):
+        if start is None and end is None:
+            stats = self._read_stats()
+            return {move: stats[f'{move}_count'] for move in ('rock', 'paper', 'scissors')}
+
+        where, params = self._window(start, end)
+        counts = {'rock': 0, 'paper': 0, 'scissors': 0}
+        counts.update(dict(self.query(
+            f'SELECT lower(player), COUNT(*) FROM games WHERE {where} GROUP BY lower(player)', params
+        )))
+        return counts
+
+    def recent(self, n):
+        return self.history[-n:] if n > 0 else []
+
+
+class ParquetHistory:
+    # Read-only sequence view over a ParquetStorage; slices are served by
+    # lazy polars queries so only the requested rows are materialized
+    def __init__(self, storage, chunk_size=10000):
+        self.storage = storage
+        self.chunk_size = chunk_size
+
+    def __len__(self):
+        return self.storage.stats['total_games']
+
+    def __getitem__(self, index):
+        length = len(self)
+        if isinstance(index, slice):
+            start, stop, step = index.indices(length)
+            if step != 1:
+                return [self[i] for i in range(start, stop, step)]
+            if stop <= start:
+                return []
+            return self.storage.scan().slice(start, stop - start).collect().to_dicts()
+
+        if index < 0:
+            index += length
+        if not 0 <= index < length:
+            raise IndexError('game history index out of range')
+        return self.storage.scan().slice(index, 1).collect().to_dicts()[0]
+
+    def __iter__(self):
+        for start in range(0, len(self), self.chunk_size):
+            yield from self[start:start + self.chunk_size]
+
+    def __reversed__(self):
+        for stop in range(len(self), 0, -self.chunk_size):
+            yield from reversed(self[max(0, stop - self.chunk_size):stop])
+
+
+class ParquetStorage:
+    # Columnar history store with one Parquet file per day. New rounds are
+    # journaled and buffered, then merged into their day files every
+    # flush_every rounds or on compact()/close(). Aggregations run as lazy
+    # polars queries over pl.scan_parquet, pruning day files outside the
+    # requested datetime window.
+    def __init__(self, history_dir, flush_every=1000):
+        self.history_dir = history_dir
+        self.flush_every = flush_every
+        os.makedirs(history_dir, exist_ok=True)
+        self.journal = GameJournal(os.path.join(history_dir, 'pending.journal'))
+        # Sessions are few, so they stay in their own append-only log
+        self.session_journal = GameJournal(os.path.join(history_dir, 'sessions.journal'))
+        self.pending = []
+        self.history = None
+        self.stats = empty_stats()
+        self._migrate_datetime()
+
+    def _migrate_datetime(self):
+        # Day files from before epoch timestamps keep a datetime string per
+        # round; each is rewritten once with the timestamp in its place
+        for day_path in self._day_files():
+            if 'timestamp' in pl.read_parquet_schema(day_path):
+                continue
+            day_df = pl.read_parquet(day_path).with_columns(
+                pl.col('datetime').str.strptime(pl.Datetime('ms'), DATETIME_FORMAT).dt.epoch('ms').alias('timestamp')
+            ).select(ROUND_COLUMNS + ['cum_wins'])
+            tmp_path = day_path + '.tmp'
+            day_df.write_parquet(tmp_path)
+            os.replace(tmp_path, day_path)
+
+    def _day_path(self, day):
+        return os.path.join(self.history_dir, f'{day}.parquet')
+
+    def _day_files(self, start=None, end=None):
+        # Day files are named YYYY-MM-DD so lexical order is chronological;
+        # bounds may be datetime strings, datetimes or epoch milliseconds
+        files = sorted(glob.glob(os.path.join(self.history_dir, '*.parquet')))
+        if start is not None:
+            first = format_timestamp(to_timestamp(start))[:10]
+            files = [f for f in files if os.path.basename(f)[:10] >= first]
+        if end is not None:
+            last = format_timestamp(to_timestamp(end))[:10]
+            files = [f for f in files if os.path.basename(f)[:10] <= last]
+        return files
+
+    def scan(self, start=None, end=None):
+        frames = []
+        files = self._day_files(start, end)
+        if files:
+            frames.append(pl.scan_parquet(files).select(ROUND_COLUMNS))
+        if self.pending:
+            frames.append(pl.LazyFrame(self.pending, schema=ROUND_SCHEMA))
+        lazy = pl.concat(frames) if frames else pl.LazyFrame(schema=ROUND_SCHEMA)
+
+        if start is not None:
+            lazy = lazy.filter(pl.col('timestamp') >= to_timestamp(start))
+        if end is not None:
+            lazy = lazy.filter(pl.col('timestamp') < to_timestamp(end))
+        return lazy
+
+    def _aggregate_stats(self, lazy):
+        result = pl.col('result')
+        player = pl.col('player').str.to_lowercase()
+        return lazy.select(
+            pl.len().alias('total_games'),
+            (result == 'wins').sum().alias('wins'),
+            (result == 'losses').sum().alias('losses'),
+            (result == 'ties').sum().alias('ties'),
+            (player == 'rock').sum().alias('rock_count'),
+            (player == 'paper').sum().alias('paper_count'),
+            (player == 'scissors').sum().alias('scissors_count')
+        ).collect().row(0, named=True)
+
+    def load(self):
+        self.stats = self._aggregate_stats(self.scan())
+
+        # Recover rounds recorded since the last flush
+        self.pending = []
+        for record in self.journal.replay():
+            if record.get('seq', 0) <= self.stats['total_games']:
+                continue
+            game = {k: v for k, v in record.items() if k != 'seq'}
+            self.pending.append(history_row(game))
+            update_stats(self.stats, game)
+
+        self.history = ParquetHistory(self)
+        return self.history, dict(self.stats)
+
+    def append(self, game, stats):
+        self.append_batch([game], stats)
+
+    def append_batch(self, games, stats):
+        self.pending.extend(history_row(game) for game in games)
+        self.stats = dict(stats)
+        self.journal.append_many(journal_records(games, stats))
+
+        if len(self.pending) >= self.flush_every:
+            self.compact()
+
+    def add_session(self, session):
+        self.session_journal.append(dict(session))
+
+    def sessions(self):
+        return list(self.session_journal.replay())
+
+    def compact(self):
+        # Merge buffered rounds into their day files, then clear the journal
+        if self.pending:
+            # Running win count continues from the rounds already on disk
+            pending_df = pl.DataFrame(self.pending, schema=ROUND_SCHEMA)
+            stored_wins = self.stats['wins'] - int((pending_df['result'] == 'wins').sum())
+            pending_df = pending_df.with_columns(
+                ((pl.col('result') == 'wins').cum_sum().cast(pl.Int64) + stored_wins).alias('cum_wins')
+            )
+            days = pl.from_epoch('timestamp', time_unit='ms').dt.strftime('%Y-%m-%d')
+            for day, day_df in pending_df.group_by(days, maintain_order=True):
+                day_path = self._day_path(day[0])
+                if os.path.exists(day_path):
+                    day_df = pl.concat([pl.read_parquet(day_path), day_df])
+                tmp_path = day_path + '.tmp'
+                day_df.write_parquet(tmp_path)
+                os.replace(tmp_path, day_path)
+            self.pending = []
+        self.journal.truncate()
+
+    def close(self):
+        self.compact()
+        self.journal.close()
+        self.session_journal.close()
+
+    def cumulative_wins(self):
+        stored = np.zeros(0, dtype=np.int64)
+        files = self._day_files()
+        if files:
+            stored = pl.scan_parquet(files).select('cum_wins').collect()['cum_wins'].to_numpy().astype(np.int64)
+
+        # Buffered rounds continue the count from the last stored round
+        won = np.array([game['result'] == 'wins' for game in self.pending], dtype=np.int64)
+        base = stored[-1] if len(stored) else 0
+        return np.concatenate([stored, base + np.cumsum(won)])
+
+    def count_results(self, start=None, end=None):
+        if start is None and end is None:
+            return {k: self.stats[k] for k in ('wins', 'losses', 'ties')}
+
+        counts = {'wins': 0, 'losses': 0, 'ties': 0}
+        grouped = self.scan(start, end).group_by('result').len().collect()
+        counts.update(dict(grouped.iter_rows()))
+        return counts
+
+    def count_moves(self, start=None, end=None):
+        if start is None and end is None:
+            return {move: self.stats[f'{move}_count'] for move in ('rock', 'paper', 'scissors')}
+
+        counts = {'rock': 0, 'paper': 0, 'scissors': 0}
+        grouped = self.scan(start, end).group_by(pl.col('player').str.to_lowercase()).len().collect()
+        counts.update(dict(grouped.iter_rows()))
+        return counts
+
+    def recent(self, n):
+        return self.history[-n:] if n > 0 else []
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+import random
+from collections import deque
+from history_utils import MOVES, MOVE_CODES
+from rules_utils import RPS
+
+NUM_MOVES = len(MOVES)
+
+# COUNTER[m] is the move that beats m, read from the rules' outcome table
+COUNTER = [counters[0] for counters in RPS.counters]
+
+def predict(counts, rng):
+    # Most frequent next move, breaking ties randomly so a strategy isn't
+    # trivially exploitable; None when nothing has been observed
+    best = max(counts)
+    if best == 0:
+        return None
+    return rng.choice([move for move, count in enumerate(counts) if count == best])
+
+# Computer strategies share two methods:
+#   next_move()                 -> move code for the coming round
+#   update(player, computer)    record a finished round, in O(1)
+# The predicting strategies guess the player's next move and play its counter.
+
+class RandomStrategy:
+    name = 'random'
+
+    def __init__(self, rng=None):
+        self.rng = rng or random.Random()
+
+    def next_move(self):
+        return self.rng.randrange(NUM_MOVES)
+
+    def update(self, player, computer):
+        pass
+
+
+class FrequencyStrategy(RandomStrategy):
+    # Counters the player's most frequent move so far
+    name = 'frequency'
+
+    def __init__(self, rng=None):
+        super().__init__(rng)
+        self.counts = [0] * NUM_MOVES
+
+    def next_move(self):
+        predicted = predict(self.counts, self.rng)
+        return super().next_move() if predicted is None else COUNTER[predicted]
+
+    def update(self, player, computer):
+        self.counts[player] += 1
+
+
+class MarkovStrategy(RandomStrategy):
+    # Order-k Markov model of the player's moves: counts of the next move for
+    # each context of the last k moves. The context is kept as a rolling
+    # base-3 integer, so an update touches one counter.
+    name = 'markov'
+
+    def __init__(self, rng=None, order=2):
+        super().__init__(rng)
+        self.order = order
+        self.contexts = NUM_MOVES ** order
+        self.table = [[0] * NUM_MOVES for _ in range(self.contexts)]
+        self.context = 0
+        self.seen = 0
+
+    def next_move(self):
+        predicted = None
+        if self.seen >= self.order:
+            predicted = predict(self.table[self.context], self.rng)
+        return super().next_move() if predicted is None else COUNTER[predicted]
+
+    def update(self, player, computer):
+        if self.seen >= self.order:
+            self.table[self.context][player] += 1
+        self.context = (self.context * NUM_MOVES + player) % self.contexts
+        self.seen += 1
+
+
+class PatternStrategy(RandomStrategy):
+    # Variable-length n-gram matcher over (player, computer) round pairs.
+    # For every length up to max_length it counts what the player did after
+    # the last rounds; the prediction backs off from the longest context that
+    # has been seen before to shorter ones. Each update is O(max_length).
+    name = 'pattern'
+
+    def __init__(self, rng=None, max_length=4):
+        super().__init__(rng)
+        self.max_length = max_length
+        self.tables = [{} for _ in range(max_length + 1)]
+        self.recent = deque(maxlen=max_length)
+
+    def _contexts(self):
+        # Context keys for lengths 0..len(recent), built from the most
+        # recent round backwards
+        key = 0
+        keys = [0]
+        for pair in reversed(self.recent):
+            key = key * NUM_MOVES * NUM_MOVES + pair
+            keys.append(key)
+        return keys
+
+    def next_move(self):
+        keys = self._contexts()
+        for length in range(len(keys) - 1, -1, -1):
+            counts = self.tables[length].get(keys[length])
+            if counts is not None:
+                predicted = predict(counts, self.rng)
+                if predicted is not None:
+                    return COUNTER[predicted]
+        return super().next_move()
+
+    def update(self, player, computer):
+        for length, key in enumerate(self._contexts()):
+            counts = self.tables[length].setdefault(key, [0] * NUM_MOVES)
+            counts[player] += 1
+
+        self.recent.append(player * NUM_MOVES + computer)
+
+
+STRATEGIES = {
+    strategy.name: strategy
+    for strategy in (RandomStrategy, FrequencyStrategy, MarkovStrategy, PatternStrategy)
+}
+
+def make_strategy(strategy='random', rng=None, **options):
+    # Build a strategy from its name, or pass an existing instance through
+    if not isinstance(strategy, str):
+        return strategy
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown strategy: {strategy}")
+    return STRATEGIES[strategy](rng=rng, **options)
+
+def warm_up(strategy, games):
+    # Feed past rounds (history records) into a strategy's model
+    for game in games:
+        strategy.update(MOVE_CODES[game['player'].lower()], MOVE_CODES[game['computer'].lower()])
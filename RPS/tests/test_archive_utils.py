@@ -0,0 +1,82 @@
+# .rpsa export/import round trips, including rounds a retention policy has
+# already moved out of the history into the workbook's Archive sheet.
+#
+#   python -m pytest tests
+import os
+import sys
+import time
+
+RPS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RPS_DIR)
+
+import numpy as np
+from archive_utils import ArchiveReader, export_excel, import_archive
+from game_utils import RPSGame
+from history_utils import CompactHistory
+from retention_utils import RetentionPolicy
+from rules_utils import resolve_codes
+from storage_utils import ExcelStorage, history_stats
+
+DAY_MS = 24 * 60 * 60 * 1000
+ROUNDS = 3000
+KEPT = 500
+
+
+def build_workbook(path):
+    # ROUNDS seeded rounds spread over the last 30 days
+    rng = np.random.default_rng(7)
+    now = int(time.time() * 1000)
+    timestamps = np.sort(rng.integers(now - 30 * DAY_MS, now, ROUNDS))
+    players = rng.integers(0, 3, ROUNDS).astype(np.uint8)
+    computers = rng.integers(0, 3, ROUNDS).astype(np.uint8)
+    history = CompactHistory.from_arrays(timestamps, players, computers, resolve_codes(players, computers))
+    storage = ExcelStorage(path)
+    storage.history = history
+    storage.stats = history_stats(history)
+    storage.save_to_excel()
+
+
+def state(path):
+    game = RPSGame(storage=ExcelStorage(path))
+    try:
+        return {
+            'stats': dict(game.storage.load()[1]),
+            'rounds': len(game.game_history),
+            'archived': game.storage.archived().to_rows(),
+            'trend': game.get_winrate_trend().tolist(),
+            'rolling': game.get_rolling_stats(),
+            'rollups': game.get_rollups('day'),
+        }
+    finally:
+        game.close()
+
+
+def test_round_trip_keeps_archived_rounds(tmp_path):
+    source = str(tmp_path / 'source.xlsx')
+    build_workbook(source)
+    game = RPSGame(storage=ExcelStorage(source), retention=RetentionPolicy(rounds=KEPT))
+    game.start_compaction().wait()
+    assert game.finish_compaction()
+    game.close()
+    before = state(source)
+    assert before['rounds'] == KEPT
+    assert before['stats']['total_games'] == ROUNDS
+
+    archive_path = str(tmp_path / 'history.rpsa')
+    assert export_excel(source, archive_path)[0] == ROUNDS
+    assert ArchiveReader(archive_path).archived().rounds == ROUNDS - KEPT
+    target = str(tmp_path / 'target.xlsx')
+    assert import_archive(archive_path, target) == ROUNDS
+
+    assert state(target) == before
+
+
+def test_round_trip_without_archive(tmp_path):
+    source = str(tmp_path / 'source.xlsx')
+    build_workbook(source)
+    archive_path = str(tmp_path / 'history.rpsa')
+    export_excel(source, archive_path)
+    assert len(ArchiveReader(archive_path).archived()) == 0
+    target = str(tmp_path / 'target.xlsx')
+    import_archive(archive_path, target)
+    assert state(target) == state(source)
@@ -0,0 +1,52 @@
+# Protocol errors in GameServer come back as {"error": ...} and leave the
+# connection open, against a real server on localhost.
+#
+#   python -m pytest tests
+import asyncio
+import json
+import os
+import sys
+
+RPS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RPS_DIR)
+
+import pytest
+from server_utils import GameServer
+from storage_utils import SQLiteStorage
+
+
+async def converse(db_path, lines):
+    # Send each line on one connection and collect the replies
+    server = GameServer(SQLiteStorage(db_path), strategy='random', debounce=0.0)
+    port = await server.start(port=0)
+    try:
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        hello = json.loads(await reader.readline())
+        replies = []
+        for line in lines:
+            writer.write(line.encode() + b'\n')
+            await writer.drain()
+            replies.append(json.loads(await reader.readline()))
+        writer.close()
+        await writer.wait_closed()
+    finally:
+        await server.close()
+    return hello, replies
+
+
+@pytest.mark.parametrize('line', ['[1, 2]', '3', '"x"', 'null'])
+def test_non_object_message_keeps_the_connection_open(tmp_path, line):
+    _, replies = asyncio.run(converse(str(tmp_path / 'server.db'), [line, '{"op": "play", "move": "rock"}']))
+    assert replies[0] == {'error': 'expected a JSON object'}
+    assert replies[1]['total_games'] == 1
+    assert replies[1]['result'] in ('wins', 'losses', 'ties')
+
+
+@pytest.mark.parametrize('line', ['{"op": "strategy", "name": ["markov"]}',
+                                  '{"op": "strategy", "name": {"a": 1}}',
+                                  '{"op": "play", "move": ["rock"]}',
+                                  'not json'])
+def test_bad_arguments_are_reported_and_play_continues(tmp_path, line):
+    _, replies = asyncio.run(converse(str(tmp_path / 'server.db'), [line, '{"op": "play", "move": "paper"}']))
+    assert 'error' in replies[0]
+    assert replies[1]['total_games'] == 1
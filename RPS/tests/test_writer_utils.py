@@ -0,0 +1,166 @@
+# Durability guarantees of BackgroundWriter, against an in-memory backend
+# that records every call.
+#
+#   python -m pytest tests
+import os
+import subprocess
+import sys
+import textwrap
+import threading
+import time
+
+RPS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RPS_DIR)
+
+import pytest
+from writer_utils import BackgroundWriter
+
+
+class RecordingStorage:
+    # Storage duck type that logs calls; fail_next makes the next
+    # append_batch raise, and `gate` can hold writes back
+    def __init__(self):
+        self.history = []
+        self.calls = []
+        self.batches = []
+        self.fail_next = 0
+        self.gate = threading.Event()
+        self.gate.set()
+
+    def load(self):
+        return self.history, {'total_games': 0}
+
+    def append_batch(self, games, stats):
+        self.gate.wait()
+        if self.fail_next:
+            self.fail_next -= 1
+            self.calls.append('failed_batch')
+            raise OSError('disk full')
+        self.calls.append('append_batch')
+        self.batches.append(list(games))
+        self.history.extend(games)
+
+    def add_session(self, session):
+        self.calls.append('add_session')
+
+    def sessions(self):
+        return []
+
+    def compact(self):
+        self.calls.append('compact')
+
+    def close(self):
+        self.calls.append('close')
+
+
+def game(i):
+    return {'round': i}
+
+
+def stats(i):
+    return {'total_games': i + 1}
+
+
+def make_writer(storage, debounce=0.0):
+    writer = BackgroundWriter(storage, debounce=debounce)
+    writer.load()
+    return writer
+
+
+def test_flush_waits_for_every_queued_round():
+    storage = RecordingStorage()
+    writer = make_writer(storage)
+    storage.gate.clear()
+    for i in range(5):
+        writer.append(game(i), stats(i))
+    assert writer.pending() == 5
+
+    storage.gate.set()
+    writer.flush()
+    assert storage.history == [game(i) for i in range(5)]
+    assert writer.pending() == 0
+    writer.close()
+
+
+def test_close_writes_pending_rounds_before_closing_the_backend():
+    storage = RecordingStorage()
+    writer = make_writer(storage, debounce=0.2)
+    for i in range(3):
+        writer.append(game(i), stats(i))
+    writer.close()
+
+    assert storage.history == [game(i) for i in range(3)]
+    assert storage.calls[-1] == 'close'
+    assert 'close' not in storage.calls[:-1]
+    with pytest.raises(RuntimeError):
+        writer.append(game(3), stats(3))
+
+
+def test_failed_batch_is_reported_and_retried_first():
+    storage = RecordingStorage()
+    storage.fail_next = 1
+    writer = make_writer(storage)
+    writer.append(game(0), stats(0))
+    with pytest.raises(OSError):
+        writer.flush()
+    # The round is still visible while it waits for the retry
+    assert len(writer.history) == 1
+    assert storage.history == []
+
+    writer.append(game(1), stats(1))
+    writer.flush()
+    assert storage.calls == ['failed_batch', 'append_batch']
+    assert storage.batches == [[game(0), game(1)]]
+    assert writer.pending() == 0
+    writer.close()
+
+
+def test_debounce_merges_a_burst_into_one_batch():
+    storage = RecordingStorage()
+    writer = make_writer(storage, debounce=0.3)
+    for i in range(20):
+        writer.append(game(i), stats(i))
+    writer.flush()
+    assert storage.batches == [[game(i) for i in range(20)]]
+
+    # A round after the burst is written on its own
+    time.sleep(0.05)
+    writer.append(game(20), stats(20))
+    writer.flush()
+    assert len(storage.batches) == 2
+    writer.close()
+
+
+def test_rounds_are_written_and_backend_closed_at_exit(tmp_path):
+    # The interpreter exits without close(); the atexit hook must flush the
+    # queued rounds and close the backend
+    log_path = tmp_path / 'log.txt'
+    script = textwrap.dedent(f"""
+        import sys
+        sys.path.insert(0, {RPS_DIR!r})
+        from writer_utils import BackgroundWriter
+
+        class FileStorage:
+            def __init__(self, path):
+                self.path = path
+                self.history = []
+
+            def load(self):
+                return self.history, {{'total_games': 0}}
+
+            def append_batch(self, games, stats):
+                self.history.extend(games)
+                with open(self.path, 'a') as log:
+                    log.writelines(f"round {{game['round']}}\\n" for game in games)
+
+            def close(self):
+                with open(self.path, 'a') as log:
+                    log.write("close\\n")
+
+        writer = BackgroundWriter(FileStorage({str(log_path)!r}), debounce=5.0)
+        writer.load()
+        for i in range(3):
+            writer.append({{'round': i}}, {{'total_games': i + 1}})
+    """)
+    subprocess.run([sys.executable, '-c', script], check=True, timeout=60)
+    assert log_path.read_text().splitlines() == ['round 0', 'round 1', 'round 2', 'close']
@@ -0,0 +1,135 @@
+import json
+import time
+from contextlib import nullcontext
+import numpy as np
+
+# Histogram bucket upper edges in milliseconds; the last bucket is open
+HISTOGRAM_EDGES_MS = (0.01, 0.05, 0.1, 0.5, 1, 5, 10, 50, 100, 500)
+
+_NO_PHASE = nullcontext()
+
+def timed(timer, name):
+    # timer.phase(name), or a shared no-op context when timing is off
+    return _NO_PHASE if timer is None else timer.phase(name)
+
+
+class _Phase:
+    # Context manager timing one phase into a PhaseTimer
+    __slots__ = ('timer', 'name', 'start')
+
+    def __init__(self, timer, name):
+        self.timer = timer
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        self.timer.record(self.name, time.perf_counter() - self.start)
+
+
+class PhaseTimer:
+    # Per-round phase durations kept in a fixed-size ring buffer: one row per
+    # round and one column per phase (NaN where a phase didn't run), so
+    # memory stays bounded however long the session is.
+    #
+    # begin_round() opens a round and phase()/record() add to it; the round
+    # is written to the buffer by end_round() or the next begin_round().
+    # Durations recorded while no round is open are dropped, so redraws
+    # outside a round don't pollute the last one.
+    def __init__(self, phases=(), capacity=1000):
+        self.capacity = capacity
+        self.phases = list(phases)
+        self.columns = {name: i for i, name in enumerate(self.phases)}
+        self.durations = np.full((capacity, len(self.phases)), np.nan)
+        self.rounds = 0
+        self.current = None
+
+    def begin_round(self):
+        self.end_round()
+        self.current = [None] * len(self.phases)
+
+    def end_round(self):
+        if self.current is None:
+            return
+        row = [np.nan] * len(self.phases)
+        for column, seconds in enumerate(self.current):
+            if seconds is not None:
+                row[column] = seconds
+        self.durations[self.rounds % self.capacity] = row
+        self.rounds += 1
+        self.current = None
+
+    def phase(self, name):
+        return _Phase(self, name)
+
+    def record(self, name, seconds):
+        current = self.current
+        if current is None:
+            return
+        column = self.columns.get(name)
+        if column is None:
+            column = self.columns[name] = len(self.phases)
+            self.phases.append(name)
+            self.durations = np.hstack([self.durations, np.full((self.capacity, 1), np.nan)])
+        if column >= len(current):
+            current.extend([None] * (column + 1 - len(current)))
+        # A phase that runs more than once in a round is summed
+        previous = current[column]
+        current[column] = seconds if previous is None else previous + seconds
+
+    def _filled(self):
+        # Rows in round order, oldest first
+        if self.rounds <= self.capacity:
+            return self.durations[:self.rounds]
+        start = self.rounds % self.capacity
+        return np.concatenate([self.durations[start:], self.durations[:start]])
+
+    def samples(self, name):
+        # Recorded durations of one phase, in milliseconds
+        values = self._filled()[:, self.columns[name]] * 1000
+        return values[~np.isnan(values)]
+
+    def histogram(self, name):
+        # Counts per HISTOGRAM_EDGES_MS bucket, plus the overflow bucket
+        edges = np.asarray(HISTOGRAM_EDGES_MS)
+        return np.bincount(np.searchsorted(edges, self.samples(name)), minlength=len(edges) + 1)
+
+    def summary(self):
+        # Percentiles per phase, in milliseconds
+        summary = {}
+        for name in self.phases:
+            values = self.samples(name)
+            if len(values) == 0:
+                continue
+            p50, p90, p99 = np.percentile(values, [50, 90, 99])
+            summary[name] = {
+                'count': int(len(values)),
+                'mean': float(values.mean()),
+                'p50': float(p50),
+                'p90': float(p90),
+                'p99': float(p99),
+                'max': float(values.max())
+            }
+        return summary
+
+    def format_summary(self):
+        lines = [f"{'phase':<16}{'n':>6}{'p50':>9}{'p90':>9}{'p99':>9}{'max':>9}  (ms)"]
+        for name, s in self.summary().items():
+            lines.append(f"{name:<16}{s['count']:>6}{s['p50']:>9.3f}{s['p90']:>9.3f}{s['p99']:>9.3f}{s['max']:>9.3f}")
+        return '\n'.join(lines)
+
+    def dump(self, path):
+        # Write the summary, histograms and raw per-round rows as JSON
+        rows = self._filled() * 1000
+        data = {
+            'rounds': self.rounds,
+            'capacity': self.capacity,
+            'phases': self.phases,
+            'summary': self.summary(),
+            'histogram_edges_ms': list(HISTOGRAM_EDGES_MS),
+            'histograms': {name: self.histogram(name).tolist() for name in self.phases},
+            'rounds_ms': [[None if np.isnan(value) else float(value) for value in row] for row in rows]
+        }
+        with open(path, 'w') as f:
+            json.dump(data, f, indent=2)
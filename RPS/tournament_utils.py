@@ -0,0 +1,165 @@
+import argparse
+import multiprocessing
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from history_utils import MOVES, RESULTS, RESULT_CODES
+from rules_utils import OUTCOMES, resolve_codes
+from simulation_utils import strategy_moves
+from strategy_utils import STRATEGIES, make_strategy
+
+# A tournament entry is either
+#   - a move-generator spec understood by simulation_utils.strategy_moves
+#     ('random', 'cycle', 'rock', [p_rock, p_paper, p_scissors] or a
+#     module-level callable(n, rng, offset)), played in vectorised chunks, or
+#   - the name of an adaptive strategy in strategy_utils ('frequency',
+#     'markov', 'pattern'), played round by round through next_move()/update().
+# Entries are sent to worker processes, so callables must be importable.
+
+def reverse_cycle(n, rng, offset=0):
+    # rock, scissors, paper, rock, ...
+    return ((-(np.arange(n) + offset)) % len(MOVES)).astype(np.uint8)
+
+BASELINES = {
+    'random': 'random',
+    'cycle': 'cycle',
+    'reverse-cycle': reverse_cycle,
+    'frequency': 'frequency'
+}
+
+def is_adaptive(entry):
+    return isinstance(entry, str) and entry in STRATEGIES and entry != 'random'
+
+def _play_leg(entry_a, entry_b, rounds, seed, chunk_size=100000):
+    # Play one independently seeded leg of a match; returns result counts
+    # from entry_a's side as [ties, wins, losses]
+    seeds = np.random.SeedSequence(seed).spawn(2)
+    rng_a, rng_b = (np.random.default_rng(s) for s in seeds)
+    counts = np.zeros(len(RESULTS), dtype=np.int64)
+
+    if not is_adaptive(entry_a) and not is_adaptive(entry_b):
+        for offset in range(0, rounds, chunk_size):
+            size = min(chunk_size, rounds - offset)
+            results = resolve_codes(strategy_moves(entry_a, size, rng_a, offset),
+                                    strategy_moves(entry_b, size, rng_b, offset))
+            counts += np.bincount(results, minlength=len(RESULTS))
+        return counts
+
+    # At least one side learns from each round: play them one at a time.
+    # Vectorisable sides still generate their moves a chunk at a time.
+    def adaptive(entry, seq):
+        if is_adaptive(entry):
+            return make_strategy(entry, rng=random.Random(int(seq.generate_state(1)[0])))
+        return None
+
+    adaptive_a, adaptive_b = adaptive(entry_a, seeds[0]), adaptive(entry_b, seeds[1])
+    outcomes = OUTCOMES.tolist()
+    tally = [0] * len(RESULTS)
+    for offset in range(0, rounds, chunk_size):
+        size = min(chunk_size, rounds - offset)
+        moves_a = None if adaptive_a else strategy_moves(entry_a, size, rng_a, offset).tolist()
+        moves_b = None if adaptive_b else strategy_moves(entry_b, size, rng_b, offset).tolist()
+        for i in range(size):
+            a = adaptive_a.next_move() if adaptive_a else moves_a[i]
+            b = adaptive_b.next_move() if adaptive_b else moves_b[i]
+            tally[outcomes[a][b]] += 1
+            # Each side models the other as "the player"
+            if adaptive_a:
+                adaptive_a.update(b, a)
+            if adaptive_b:
+                adaptive_b.update(a, b)
+    counts += tally
+    return counts
+
+def _run_leg(job):
+    i, j, entry_a, entry_b, rounds, seed = job
+    return i, j, rounds, _play_leg(entry_a, entry_b, rounds, seed)
+
+def run_tournament(strategies=None, rounds=1_000_000, seed=None, workers=None, legs=None):
+    # Play every pair of strategies (including each against itself) for
+    # `rounds` rounds under the RPSGame outcome table, spread across a
+    # process pool. Each match is split into `legs` independently seeded
+    # legs (by default enough to keep every worker busy); adaptive
+    # strategies start each leg with a fresh model. Every leg gets its own
+    # seed derived from `seed`, so with `legs` fixed the results do not
+    # depend on how many workers play them.
+    #
+    # Returns the strategy names, row-vs-column win and tie rate matrices,
+    # and throughput in rounds per second.
+    strategies = dict(BASELINES if strategies is None else strategies)
+    names = list(strategies)
+    workers = workers or os.cpu_count() or 1
+    pairs = [(i, j) for i in range(len(names)) for j in range(i, len(names))]
+    if legs is None:
+        legs = max(1, -(-2 * workers // len(pairs)))
+    legs = max(1, min(legs, rounds))
+
+    seeds = np.random.SeedSequence(seed).spawn(len(pairs) * legs)
+    jobs = []
+    for p, (i, j) in enumerate(pairs):
+        for leg in range(legs):
+            leg_rounds = rounds // legs + (1 if leg < rounds % legs else 0)
+            leg_seed = seeds[p * legs + leg].generate_state(4)
+            jobs.append((i, j, strategies[names[i]], strategies[names[j]], leg_rounds, leg_seed))
+
+    counts = np.zeros((len(names), len(names), len(RESULTS)), dtype=np.int64)
+    played = np.zeros((len(names), len(names)), dtype=np.int64)
+    start = time.perf_counter()
+    # Spawned workers: polars' thread pool does not survive a fork
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+        for i, j, leg_rounds, leg_counts in pool.map(_run_leg, jobs):
+            counts[i, j] += leg_counts
+            played[i, j] += leg_rounds
+            if i != j:
+                # The same rounds seen from the other side
+                counts[j, i] += leg_counts[[RESULT_CODES['ties'], RESULT_CODES['losses'], RESULT_CODES['wins']]]
+                played[j, i] += leg_rounds
+    elapsed = time.perf_counter() - start
+
+    total_rounds = int(sum(job[4] for job in jobs))
+    return {
+        'strategies': names,
+        'rounds': rounds,
+        'wins': counts[:, :, RESULT_CODES['wins']] / np.maximum(played, 1),
+        'ties': counts[:, :, RESULT_CODES['ties']] / np.maximum(played, 1),
+        'total_rounds': total_rounds,
+        'elapsed': elapsed,
+        'rounds_per_second': total_rounds / elapsed if elapsed else 0.0,
+        'workers': workers,
+        'legs': legs
+    }
+
+def format_matrix(names, matrix):
+    width = max(len(name) for name in names) + 2
+    lines = [' ' * width + ''.join(f"{name:>{width}}" for name in names)]
+    for name, row in zip(names, matrix):
+        lines.append(f"{name:<{width}}" + ''.join(f"{value * 100:>{width - 1}.1f}%" for value in row))
+    return '\n'.join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(description='Round-robin tournament between computer strategies')
+    parser.add_argument('strategies', nargs='*', help='strategy names (default: the baselines)')
+    parser.add_argument('--rounds', type=int, default=1_000_000)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--legs', type=int, default=None)
+    args = parser.parse_args()
+
+    strategies = None
+    if args.strategies:
+        strategies = {name: BASELINES.get(name, name) for name in args.strategies}
+    summary = run_tournament(strategies, args.rounds, args.seed, args.workers, args.legs)
+
+    print("Win rate (row vs column)")
+    print(format_matrix(summary['strategies'], summary['wins']))
+    print()
+    print("Tie rate")
+    print(format_matrix(summary['strategies'], summary['ties']))
+    print()
+    print(f"{summary['total_rounds']} rounds in {summary['elapsed']:.2f} s on {summary['workers']} workers "
+          f"({summary['rounds_per_second']:.0f} rounds/s)")
+
+if __name__ == '__main__':
+    main()
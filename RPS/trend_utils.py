@@ -0,0 +1,151 @@
+import numpy as np
+
+class WinRateTrend:
+    # Cumulative win-rate series backed by a growable int64 array of running
+    # win counts (cumulative_wins[i] = wins after i + 1 games). Each round is
+    # one O(1) append, and win rates are derived on demand for any slice, so
+    # nothing has to replay history to rebuild the trend.
+    #
+    # Point k of the series is the win rate after k games; point 0 is 0 so
+    # the series matches the original win_rates list layout.
+    def __init__(self, cumulative_wins=(), capacity=1024):
+        cumulative_wins = np.asarray(cumulative_wins, dtype=np.int64)
+        self._length = len(cumulative_wins)
+        self._cumulative = np.empty(max(capacity, 2 * self._length), dtype=np.int64)
+        self._cumulative[:self._length] = cumulative_wins
+
+    @classmethod
+    def from_results(cls, won):
+        return cls(np.cumsum(np.asarray(won, dtype=np.int64)))
+
+    def append(self, won):
+        if self._length == len(self._cumulative):
+            grown = np.empty(2 * len(self._cumulative), dtype=np.int64)
+            grown[:self._length] = self._cumulative
+            self._cumulative = grown
+
+        previous = self._cumulative[self._length - 1] if self._length else 0
+        self._cumulative[self._length] = previous + (1 if won else 0)
+        self._length += 1
+
+    @property
+    def cumulative_wins(self):
+        return self._cumulative[:self._length]
+
+    @property
+    def games(self):
+        return self._length
+
+    @property
+    def wins(self):
+        return int(self._cumulative[self._length - 1]) if self._length else 0
+
+    def __len__(self):
+        return self._length + 1
+
+    def rates(self, start=0, stop=None):
+        # Win rate (in %) at points [start, stop) of the series
+        start, stop, _ = slice(start, stop).indices(len(self))
+        points = np.arange(start, stop)
+        rates = np.zeros(len(points), dtype=np.float64)
+        played = points > 0
+        rates[played] = self._cumulative[points[played] - 1] * 100 / points[played]
+        return rates
+
+    def window_rate(self, n):
+        # Win rate (in %) over the last n games
+        n = min(n, self._length)
+        if n == 0:
+            return 0.0
+        before = self._cumulative[self._length - n - 1] if n < self._length else 0
+        return float((self._cumulative[self._length - 1] - before) * 100 / n)
+
+
+class TrendDownsampler:
+    # Incremental min/max bucketing of a series for plotting. Points are fed
+    # in order; each bucket keeps its first, lowest, highest and last point,
+    # so peaks, dips and both ends of the series survive. When the bucket
+    # count reaches twice the budget, neighbouring buckets are merged and the
+    # bucket width doubles, so feeding a point is amortized O(1) and the
+    # output never exceeds max_points (up to 2 * max_buckets buckets of 4).
+    def __init__(self, max_points=500):
+        # Two buckets of four points is the smallest output
+        if max_points < 8:
+            raise ValueError('max_points must be at least 8')
+        self.max_buckets = max_points // 8
+        self.width = 1
+        self.count = 0
+        # Each bucket is [first_x, first_y, min_x, min_y, max_x, max_y, last_x, last_y, size]
+        self.buckets = []
+
+    def extend(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        x = self.count
+        i = 0
+
+        # Top up the last bucket if it is partially filled
+        if self.buckets and self.buckets[-1][8] < self.width:
+            bucket = self.buckets[-1]
+            take = min(self.width - bucket[8], len(values))
+            for offset in range(take):
+                self._add_to_bucket(bucket, x + offset, values[offset])
+            i = take
+
+        # Whole buckets at once: argmin/argmax over each row of a reshape
+        while i < len(values):
+            full = (len(values) - i) // self.width
+            full = min(full, max(0, 2 * self.max_buckets - len(self.buckets)))
+            if full:
+                block = values[i:i + full * self.width].reshape(full, self.width)
+                rows = np.arange(full)
+                lows, highs = block.argmin(axis=1), block.argmax(axis=1)
+                starts = x + i + rows * self.width
+                for row in range(full):
+                    self.buckets.append([
+                        starts[row], block[row, 0],
+                        starts[row] + lows[row], block[row, lows[row]],
+                        starts[row] + highs[row], block[row, highs[row]],
+                        starts[row] + self.width - 1, block[row, -1],
+                        self.width
+                    ])
+                i += full * self.width
+            elif len(self.buckets) < 2 * self.max_buckets:
+                # Leftover points start a new partial bucket
+                bucket = [x + i, values[i], x + i, values[i], x + i, values[i], x + i, values[i], 1]
+                self.buckets.append(bucket)
+                for offset in range(i + 1, len(values)):
+                    self._add_to_bucket(bucket, x + offset, values[offset])
+                i = len(values)
+            self._merge_if_full()
+
+        self.count += len(values)
+
+    def _add_to_bucket(self, bucket, x, y):
+        if y < bucket[3]:
+            bucket[2], bucket[3] = x, y
+        if y > bucket[5]:
+            bucket[4], bucket[5] = x, y
+        bucket[6], bucket[7] = x, y
+        bucket[8] += 1
+
+    def _merge_if_full(self):
+        if len(self.buckets) < 2 * self.max_buckets or self.buckets[-1][8] < self.width:
+            return
+
+        merged = []
+        for left, right in zip(self.buckets[0::2], self.buckets[1::2]):
+            low = left[2:4] if left[3] <= right[3] else right[2:4]
+            high = left[4:6] if left[5] >= right[5] else right[4:6]
+            merged.append(left[0:2] + low + high + right[6:8] + [left[8] + right[8]])
+        self.buckets = merged
+        self.width *= 2
+
+    def points(self):
+        # Downsampled (x, y) arrays in series order
+        xs, ys = [], []
+        for bucket in self.buckets:
+            for x, y in sorted({(bucket[0], bucket[1]), (bucket[2], bucket[3]),
+                                (bucket[4], bucket[5]), (bucket[6], bucket[7])}):
+                xs.append(x)
+                ys.append(y)
+        return np.array(xs, dtype=np.int64), np.array(ys, dtype=np.float64)
@@ -0,0 +1,291 @@
+import atexit
+import queue
+import threading
+import time
+from metrics_utils import PERSIST_ERRORS, PERSIST_SECONDS
+
+_STOP = object()
+# Marks a queued session record, as opposed to a (game, stats) round
+_SESSION = object()
+
+class BufferedHistory:
+    # Sequence view that joins the rounds the backend has persisted with the
+    # rounds still waiting in the writer queue, so the UI sees every round
+    # immediately. Rows are append-only, so position i is the same game on
+    # either side of a flush.
+    def __init__(self, writer, persisted):
+        self.writer = writer
+        self.persisted = persisted
+
+    def split(self):
+        # (rounds persisted, rounds still queued), read together
+        with self.writer.lock:
+            return self.writer.persisted_count, list(self.writer.unflushed)
+
+    def __len__(self):
+        with self.writer.lock:
+            return self.writer.persisted_count + len(self.writer.unflushed)
+
+    def __getitem__(self, index):
+        persisted_count, unflushed = self.split()
+        length = persisted_count + len(unflushed)
+
+        if isinstance(index, slice):
+            start, stop, step = index.indices(length)
+            if step != 1:
+                return [self[i] for i in range(start, stop, step)]
+            rows = []
+            if start < persisted_count:
+                rows.extend(self.persisted[start:min(stop, persisted_count)])
+            if stop > persisted_count:
+                rows.extend(unflushed[max(start, persisted_count) - persisted_count:stop - persisted_count])
+            return rows
+
+        if index < 0:
+            index += length
+        if not 0 <= index < length:
+            raise IndexError('game history index out of range')
+        if index < persisted_count:
+            return self.persisted[index]
+        return unflushed[index - persisted_count]
+
+    def __iter__(self):
+        persisted_count, unflushed = self.split()
+        for i, game in enumerate(self.persisted):
+            if i >= persisted_count:
+                break
+            yield game
+        yield from unflushed
+
+    def __reversed__(self):
+        persisted_count, unflushed = self.split()
+        yield from reversed(unflushed)
+        yield from reversed(self.persisted[:persisted_count])
+
+
+class BackgroundWriter:
+    # Wraps a storage backend and moves its writes onto a worker thread.
+    #
+    # append() only queues the round and returns; the worker waits `debounce`
+    # seconds after the first queued round, collects everything that arrived
+    # in the meantime (up to `max_batch`) and hands it to the backend's
+    # append_batch() as one flush. The queue is bounded by `max_queue`, so a
+    # stalled disk eventually applies back-pressure instead of growing memory.
+    #
+    # Durability: a round is only as durable as the backend makes it once it
+    # has been flushed. flush() blocks until every round queued before the
+    # call has been written; close() flushes, stops the worker and closes the
+    # backend, and is also registered to run at interpreter exit. Rounds still
+    # queued when the process is killed are lost, so at most `debounce`
+    # seconds (plus one write) of play is at risk.
+    #
+    # Backends shared between processes (SharedExcelStorage) have a sync()
+    # that returns rounds other processes recorded. The worker calls it
+    # every `sync_interval` seconds and after each write, so the UI thread
+    # never touches the backend; sync() here hands over what it collected.
+    def __init__(self, storage, debounce=0.5, max_batch=1000, max_queue=10000, sync_interval=1.0):
+        self.storage = storage
+        self.debounce = debounce
+        self.max_batch = max_batch
+        self.sync_storage = getattr(storage, 'sync', None)
+        self.sync_interval = sync_interval if self.sync_storage is not None else None
+        self.foreign = []
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.lock = threading.Lock()
+        self.unflushed = []
+        self.failed = []
+        self.failed_stats = None
+        self.failed_sessions = []
+        self.persisted_count = 0
+        self.stats = None
+        self.error = None
+        self.history = None
+        self.closed = False
+        self.thread = threading.Thread(target=self._run, name='rps-writer', daemon=True)
+
+    def load(self):
+        persisted, stats = self.storage.load()
+        self.persisted_count = len(persisted)
+        self.stats = dict(stats)
+        self.history = BufferedHistory(self, persisted)
+        self.thread.start()
+        atexit.register(self.close)
+        return self.history, stats
+
+    def append(self, game, stats):
+        if self.closed:
+            raise RuntimeError('writer is closed')
+        with self.lock:
+            self.unflushed.append(game)
+            self.stats = dict(stats)
+        self.queue.put((game, dict(stats)))
+
+    def add_session(self, session):
+        # Queued with the rounds, so the worker is the only thread that
+        # writes to the backend
+        if self.closed:
+            raise RuntimeError('writer is closed')
+        self.queue.put((_SESSION, dict(session)))
+
+    def sessions(self):
+        self.flush()
+        return self.storage.sessions()
+
+    def _run(self):
+        while True:
+            try:
+                item = self.queue.get(timeout=self.sync_interval)
+            except queue.Empty:
+                self._sync()
+                continue
+            if item is _STOP:
+                self.queue.task_done()
+                return
+
+            # Coalesce the burst that arrives within the debounce interval
+            batch = [item]
+            stop = False
+            deadline = time.monotonic() + self.debounce
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self.queue.get(timeout=remaining) if remaining > 0 else self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+
+            self._write(batch)
+            if self.sync_storage is not None:
+                self._sync()
+            for _ in batch:
+                self.queue.task_done()
+            if stop:
+                self.queue.task_done()
+                return
+
+    def _write(self, batch):
+        # Rounds and sessions from a failed flush are retried ahead of the
+        # new ones; the stats row is the one queued with the latest round
+        games = list(self.failed)
+        sessions = list(self.failed_sessions)
+        stats = self.failed_stats
+        for item, value in batch:
+            if item is _SESSION:
+                sessions.append(value)
+            else:
+                games.append(item)
+                stats = value
+
+        try:
+            if games:
+                with PERSIST_SECONDS.time():
+                    self.storage.append_batch(games, stats)
+        except Exception as e:
+            # Keep the rounds visible in memory and report on the next flush()
+            print(f"Error writing game history: {e}")
+            PERSIST_ERRORS.inc()
+            self.failed = games
+            self.failed_stats = stats
+            self.failed_sessions = sessions
+            self.error = e
+            return
+
+        self.failed = []
+        self.failed_stats = None
+        with self.lock:
+            del self.unflushed[:len(games)]
+            # A shared backend may also have merged other processes' rounds
+            self.persisted_count = len(self.history.persisted)
+
+        written = 0
+        try:
+            for session in sessions:
+                self.storage.add_session(session)
+                written += 1
+        except Exception as e:
+            print(f"Error writing game session: {e}")
+            PERSIST_ERRORS.inc()
+            self.error = e
+        self.failed_sessions = sessions[written:]
+
+    def _sync(self):
+        try:
+            foreign = self.sync_storage()
+        except Exception as e:
+            print(f"Error reading shared game history: {e}")
+            return
+        with self.lock:
+            self.foreign.extend(foreign)
+            self.persisted_count = len(self.history.persisted)
+
+    def sync(self):
+        # Rounds other processes recorded since the last call
+        with self.lock:
+            foreign, self.foreign = self.foreign, []
+        return foreign
+
+    def pending(self):
+        # Rounds recorded but not yet written by the backend
+        with self.lock:
+            return len(self.unflushed)
+
+    def flush(self):
+        if self.thread.is_alive():
+            self.queue.join()
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error
+
+    def compact(self):
+        self.flush()
+        self.storage.compact()
+
+    def archived(self):
+        archived = getattr(self.storage, 'archived', None)
+        return archived() if archived is not None else None
+
+    def apply_retention(self, cut, rows):
+        # Runs on the caller's thread once pending rounds are written; the
+        # backend's history shrinks, so the persisted count is re-read
+        self.flush()
+        applied = self.storage.apply_retention(cut, rows)
+        with self.lock:
+            self.persisted_count = len(self.history.persisted)
+        return applied
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        if self.thread.is_alive():
+            self.queue.put(_STOP)
+            self.thread.join()
+        atexit.unregister(self.close)
+        self.storage.close()
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error
+
+    # Queries that need the persisted rows wait for pending writes first
+
+    def cumulative_wins(self):
+        self.flush()
+        return self.storage.cumulative_wins()
+
+    def count_results(self, start=None, end=None):
+        if start is None and end is None:
+            return {k: self.stats[k] for k in ('wins', 'losses', 'ties')}
+        self.flush()
+        return self.storage.count_results(start, end)
+
+    def count_moves(self, start=None, end=None):
+        if start is None and end is None:
+            return {move: self.stats[f'{move}_count'] for move in ('rock', 'paper', 'scissors')}
+        self.flush()
+        return self.storage.count_moves(start, end)
+
+    def recent(self, n):
+        return self.history[-n:] if n > 0 else []